@@ -0,0 +1,43 @@
+"""Tests of the Monte-Carlo centering accuracy harness
+
+Run with pytest (python -m pytest code_testing/accuracy_test.py)
+"""
+import numpy as np
+from fiber_properties import (centering_accuracy, accuracy_summary,
+                              accuracy_report)
+
+METHODS = ['edge', ('edge k5', 'edge', {'kernel_size': 5}), 'no_method']
+
+def test_centering_accuracy_is_independent_of_processes():
+    kwargs = dict(methods=METHODS, noise_levels=(5.0, 20.0), trials=3,
+                  size=120, threshold=100, kernel_size=3, seed=1)
+    info = centering_accuracy(processes=1, **kwargs)
+    pooled = centering_accuracy(processes=2, **kwargs)
+
+    assert info.methods == ['edge', 'edge k5', 'no_method']
+    assert info.noise_levels == [5.0, 20.0]
+    for label in ['edge', 'edge k5']:
+        for errors, pooled_errors in [(info.x_error, pooled.x_error),
+                                      (info.y_error, pooled.y_error),
+                                      (info.diameter_error,
+                                       pooled.diameter_error)]:
+            assert errors[label].shape == (2, 3)
+            assert np.array_equal(errors[label], pooled_errors[label])
+        assert np.all(np.abs(info.x_error[label]) < 1.0)
+        assert np.all(np.abs(info.y_error[label]) < 1.0)
+        assert np.all(info.time[label] > 0.0)
+    # A method that fails is recorded as NaN
+    assert np.isnan(info.x_error['no_method']).all()
+
+    summary = accuracy_summary(info)
+    assert np.allclose(summary['edge']['x_bias'],
+                       info.x_error['edge'].mean(axis=1))
+    assert np.allclose(summary['edge']['center_rms'],
+                       np.sqrt((info.x_error['edge']**2
+                                + info.y_error['edge']**2).mean(axis=1)))
+    assert list(summary['no_method']['failures']) == [3, 3]
+    assert list(summary['edge']['failures']) == [0, 0]
+
+    report = accuracy_report(info).splitlines()
+    assert len(report) == 1 + 3 * 2
+    assert report[1].split()[:2] == ['edge', '5.00']
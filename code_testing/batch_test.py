@@ -0,0 +1,116 @@
+"""Tests of the batch runner on synthetic images
+
+Run with pytest (python -m pytest code_testing/batch_test.py)
+"""
+import json
+import os
+import sqlite3
+from fiber_properties import (run_batch, build_tasks, load_manifest,
+                              synthetic_image, synthetic_dark,
+                              save_synthetic_image)
+
+CAMERAS = [('in', 40), ('nf', 60)]
+
+def make_manifest(folder):
+    """Writes two tests of synthetic images and their manifest"""
+    for test, shift in [('Shift_00', 0), ('Shift_01', 3)]:
+        for camera, radius in CAMERAS:
+            for i in xrange(2):
+                image = synthetic_image((120, 120), (60 + shift, 60), radius,
+                                        read_noise=5.0, dark_level=100.0,
+                                        seed=i)
+                image_file = os.path.join(folder, test,
+                                          '%s_%03d.fit' % (camera, i))
+                save_synthetic_image(image, image_file, camera=camera,
+                                     exp_time=1.0, pixel_size=3.45)
+    for camera, _ in CAMERAS:
+        save_synthetic_image(synthetic_dark((120, 120), 100.0, 5.0, seed=10),
+                             os.path.join(folder, 'dark', camera + '_000.fit'),
+                             camera=camera, exp_time=1.0, pixel_size=3.45)
+
+    manifest = {'results': 'results.db', 'processes': 1,
+                'cameras': [camera for camera, _ in CAMERAS],
+                'images': '{camera}_*.fit',
+                'calibration': {'dark': '../dark/{camera}_*.fit'},
+                'parameters': {'threshold': 100, 'kernel_size': 3},
+                'center': {'method': 'edge'},
+                'tests': [{'name': 'Shift_00', 'folder': 'Shift_00/'},
+                          {'name': 'Shift_01', 'folder': 'Shift_01/'}],
+                'scrambling_gain': [{'name': 'shifts',
+                                     'tests': ['Shift_00', 'Shift_01'],
+                                     'input_method': 'edge',
+                                     'output_method': 'edge'}]}
+    manifest_file = os.path.join(folder, 'manifest.json')
+    with open(manifest_file, 'w') as output_file:
+        json.dump(manifest, output_file)
+    return manifest_file
+
+def test_resume_skips_finished_tasks(tmpdir):
+    manifest_file = make_manifest(str(tmpdir))
+    first = run_batch(manifest_file)
+    assert not first.failed
+    assert len(first.finished) == len(build_tasks(load_manifest(manifest_file)))
+
+    # The corrected images written by the first run are not inputs
+    for task in build_tasks(load_manifest(manifest_file)).values():
+        if task.stage == 'calibrate':
+            assert not any(name.endswith('_corrected.fit')
+                           for name in task.spec['images'])
+
+    second = run_batch(manifest_file)
+    assert second.finished == []
+    assert sorted(second.skipped) == sorted(first.finished)
+
+def test_changed_setting_reruns_dependents(tmpdir):
+    manifest_file = make_manifest(str(tmpdir))
+    run_batch(manifest_file)
+    with open(manifest_file) as input_file:
+        manifest = json.load(input_file)
+    manifest['tests'][1]['center'] = {'method': 'radius', 'radius_range': 8,
+                                      'center_range': 8}
+    with open(manifest_file, 'w') as output_file:
+        json.dump(manifest, output_file)
+
+    info = run_batch(manifest_file)
+    assert not info.failed
+    assert sorted(info.finished) == sorted(['center:Shift_01/in',
+                                            'center:Shift_01/nf',
+                                            'aggregate:Shift_01',
+                                            'scrambling_gain:shifts'])
+
+def _recorded_results(folder):
+    connection = sqlite3.connect(os.path.join(folder, 'results.db'))
+    try:
+        return connection.execute('SELECT test, camera, quantity, method, '
+                                  'parameters, units, value, array '
+                                  'FROM results ORDER BY test, camera, '
+                                  'quantity, method').fetchall()
+    finally:
+        connection.close()
+
+def test_pool_matches_serial_run(tmpdir):
+    serial_file = make_manifest(str(tmpdir.mkdir('serial')))
+    pooled_file = make_manifest(str(tmpdir.mkdir('pooled')))
+    serial = run_batch(serial_file, processes=1)
+    pooled = run_batch(pooled_file, processes=3)
+    assert not serial.failed and not pooled.failed
+    assert sorted(pooled.finished) == sorted(serial.finished)
+
+    results = _recorded_results(str(tmpdir.join('serial')))
+    assert results
+    assert _recorded_results(str(tmpdir.join('pooled'))) == results
+    # Nothing published by the pool is left in shared memory
+    assert not [name for name in os.listdir('/dev/shm')
+                if name.startswith('fiber_properties_')]
+
+def _killed_stage(spec, shared=None):
+    os._exit(1)
+
+def test_dead_worker_fails_task(tmpdir, monkeypatch):
+    from fiber_properties import batch
+    manifest_file = make_manifest(str(tmpdir))
+    monkeypatch.setitem(batch.STAGES, 'center', _killed_stage)
+    info = run_batch(manifest_file, processes=2)
+    assert 'worker process' in info.failed['center:Shift_00/nf']
+    assert info.failed['aggregate:Shift_00'] == 'dependency failed'
+    assert 'calibrate:Shift_00/nf' in info.finished
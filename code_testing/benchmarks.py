@@ -0,0 +1,402 @@
+"""benchmarks.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+Times the hot paths of the fiber_properties package on synthetic images
+across image sizes and kernel sizes and writes the results as JSON so that
+runs can be compared to catch performance regressions
+
+Usage
+-----
+python benchmarks.py --output new.json
+python benchmarks.py --sizes 500 1000 2000 --kernels 9 51 --output new.json
+python benchmarks.py --stages centering modal_noise --compare old.json
+python benchmarks.py --compare-files old.json new.json --tolerance 0.25
+"""
+from collections import OrderedDict
+from datetime import datetime
+from timeit import default_timer
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import traceback
+import numpy as np
+import scipy
+from fiber_properties import (FiberImage, filter_image, scrambling_gain,
+                              synthetic_image, synthetic_dark,
+                              save_synthetic_image)
+
+CENTER_METHODS = ['edge', 'radius', 'circle', 'gaussian', 'rectangle']
+MODAL_NOISE_METHODS = ['tophat', 'polynomial', 'gaussian', 'contrast',
+                       'filter', 'gradient', 'fft', 'gini', 'entropy',
+                       'multiscale']
+STAGES = ['filter_image', 'calibration', 'centering', 'modal_noise', 'frd',
+          'scrambling_gain']
+
+# Keyworded arguments that keep the golden section searches bounded
+CENTER_KWARGS = {'radius': {'radius_range': 64, 'center_range': 64,
+                            'radius_tol': .03, 'center_tol': .03},
+                 'circle': {'center_range': 64, 'center_tol': .03}}
+
+#=============================================================================#
+#===== Synthetic Test Images =================================================#
+#=============================================================================#
+
+def fiber_parameters(size, camera='nf', seed=0):
+    """Returns keyworded arguments of synthetic_image() for a test frame
+
+    The fiber face covers half of the frame and is placed off of the pixel
+    grid so that no method is helped by symmetry
+    """
+    random_state = np.random.RandomState(seed)
+    center = (size / 2.0 + random_state.rand(), size / 2.0 + random_state.rand())
+    kwargs = {'shape': (size, size), 'center': center,
+              'radius': size / 4.0 + random_state.rand(),
+              'dark_level': 500.0, 'read_noise': 10.0,
+              'hot_pixels': size // 20, 'shot_noise': True, 'seed': seed}
+    if camera == 'ff':
+        kwargs.update(profile='gaussian', amp=20000.0)
+    else:
+        kwargs.update(profile='tophat', amp=10000.0, speckle_contrast=0.1)
+    return kwargs
+
+def test_image(size, camera='nf', fiber_shape='circle', seed=0):
+    """Returns a synthetic frame and a matching dark frame"""
+    kwargs = fiber_parameters(size, camera, seed)
+    if fiber_shape != 'circle':
+        kwargs.update(fiber_shape=fiber_shape, aspect=0.5, fiber_angle=2.0)
+    image = synthetic_image(**kwargs)
+    dark = synthetic_dark((size, size), 500.0, 10.0, size // 20, seed=seed + 1)
+    return image, dark
+
+def test_object(size, kernel_size, camera='nf', fiber_shape='circle', seed=0):
+    """Returns a FiberImage of a synthetic frame"""
+    image, dark = test_image(size, camera, fiber_shape, seed)
+    return FiberImage(image, dark=dark, camera=camera, pixel_size=3.45,
+                      magnification=1.0, threshold=1000,
+                      kernel_size=kernel_size)
+
+#=============================================================================#
+#===== Benchmarks ============================================================#
+#=============================================================================#
+
+def time_call(func, setup=None, repeat=3):
+    """Returns the wall time of func() for each repeat
+
+    setup() is called (untimed) before every repeat and its return value is
+    passed to func
+    """
+    times = []
+    for _ in xrange(repeat):
+        if setup is None:
+            start = default_timer()
+            func()
+        else:
+            argument = setup()
+            start = default_timer()
+            func(argument)
+        times.append(default_timer() - start)
+    return times
+
+def benchmark_filter_image(size, kernel_size, repeat, folder):
+    image, _ = test_image(size)
+    results = []
+    for name, kwargs in [('filter_image', {}),
+                         ('filter_image_zero_fill', {'zero_fill': True})]:
+        results.append((name, {}, time_call(lambda: filter_image(image,
+                                                                 kernel_size,
+                                                                 **kwargs),
+                                            repeat=repeat)))
+    return results
+
+def benchmark_calibration(size, kernel_size, repeat, folder):
+    """Co-adds and corrects FITS frames stored as a camera subframe"""
+    subframe = (size // 8, size // 8, 3 * size // 4, 3 * size // 4)
+    kwargs = fiber_parameters(size)
+    images = []
+    darks = []
+    for i in xrange(3):
+        kwargs['seed'] = i
+        images.append(os.path.join(folder, 'nf_%03d.fit' % i))
+        save_synthetic_image(synthetic_image(subframe=subframe, **kwargs),
+                             images[-1], subframe=subframe, exp_time=1.0)
+        darks.append(os.path.join(folder, 'dark_%03d.fit' % i))
+        save_synthetic_image(synthetic_dark((size, size), 500.0, 10.0,
+                                            size // 20, seed=10 + i),
+                             darks[-1], exp_time=1.0)
+
+    def calibrate():
+        FiberImage(images, dark=darks, camera='nf', pixel_size=3.45,
+                   kernel_size=kernel_size).get_image()
+    return [('calibration', {'num_images': 3, 'subframe': subframe},
+             time_call(calibrate, repeat=repeat))]
+
+def benchmark_centering(size, kernel_size, repeat, folder):
+    results = []
+    for method in CENTER_METHODS:
+        camera = 'ff' if method == 'gaussian' else 'nf'
+        fiber_shape = 'rectangle' if method == 'rectangle' else 'circle'
+        kwargs = CENTER_KWARGS.get(method, {})
+        image_obj = test_object(size, kernel_size, camera, fiber_shape)
+
+        def setup():
+            # A fresh object with its filtered image (and edges) already
+            # found so only the method itself is timed
+            obj = FiberImage(image_obj.get_image(), camera=camera,
+                             pixel_size=3.45, magnification=1.0,
+                             threshold=1000, kernel_size=kernel_size)
+            obj.get_filtered_image()
+            if method != 'edge':
+                obj.get_fiber_center(method='edge')
+            return obj
+
+        results.append(('center_' + method, kwargs,
+                        time_call(lambda obj: obj.set_fiber_center(method=method,
+                                                                   **kwargs),
+                                  setup, repeat)))
+    return results
+
+def benchmark_modal_noise(size, kernel_size, repeat, folder):
+    results = []
+    nf_obj = test_object(size, kernel_size, 'nf')
+    ff_obj = test_object(size, kernel_size, 'ff')
+    for method in MODAL_NOISE_METHODS:
+        image_obj = ff_obj if method == 'gaussian' else nf_obj
+        fiber_method = 'gaussian' if method == 'gaussian' else 'edge'
+
+        def setup():
+            obj = FiberImage(image_obj.get_image(), camera=image_obj.camera,
+                             pixel_size=3.45, magnification=1.0,
+                             threshold=1000, kernel_size=kernel_size)
+            obj.get_fiber_center(method=fiber_method)
+            return obj
+
+        results.append(('modal_noise_' + method, {'fiber_method': fiber_method},
+                        time_call(lambda obj: obj.set_modal_noise(
+                            method, fiber_method=fiber_method), setup, repeat)))
+    return results
+
+def benchmark_frd(size, kernel_size, repeat, folder):
+    image_obj = test_object(size, kernel_size, 'ff')
+
+    def setup():
+        obj = FiberImage(image_obj.get_image(), camera='ff', pixel_size=3.45,
+                         magnification=1.0, threshold=1000,
+                         kernel_size=kernel_size)
+        obj.get_fiber_centroid(method='full')
+        return obj
+    return [('set_frd_info', {}, time_call(lambda obj: obj.set_frd_info(),
+                                           setup, repeat))]
+
+def benchmark_scrambling_gain(size, kernel_size, repeat, folder):
+    """Scrambling gain of three input and output frames stored as FITS"""
+    files = {'in': [], 'nf': []}
+    for camera in files:
+        for i in xrange(3):
+            kwargs = fiber_parameters(size, 'nf', seed=i)
+            if camera == 'in':
+                kwargs.update(profile='gaussian', radius=size / 8.0,
+                              amp=20000.0, speckle_contrast=0.0)
+            files[camera].append(os.path.join(folder, 'shift_%d' % i,
+                                              camera + '_000.fit'))
+            save_synthetic_image(synthetic_image(**kwargs),
+                                 files[camera][-1], camera=camera,
+                                 pixel_size=3.45, exp_time=1.0)
+
+    def setup():
+        return ([FiberImage(name, threshold=1000, kernel_size=kernel_size)
+                 for name in files['in']],
+                [FiberImage(name, threshold=1000, kernel_size=kernel_size)
+                 for name in files['nf']])
+    return [('scrambling_gain', {'num_images': 3},
+             time_call(lambda objs: scrambling_gain(objs[0], objs[1], 'edge',
+                                                    'edge'), setup, repeat))]
+
+BENCHMARKS = OrderedDict([('filter_image', benchmark_filter_image),
+                          ('calibration', benchmark_calibration),
+                          ('centering', benchmark_centering),
+                          ('modal_noise', benchmark_modal_noise),
+                          ('frd', benchmark_frd),
+                          ('scrambling_gain', benchmark_scrambling_gain)])
+
+def run_benchmarks(sizes=(500, 1000), kernel_sizes=(9, 51), stages=None,
+                   repeat=3, verbose=True):
+    """Runs the benchmarks and returns the machine-readable results
+
+    Args
+    ----
+    sizes : list(int), optional
+        side lengths of the square test images
+    kernel_sizes : list(int), optional
+        filter kernel sizes
+    stages : list(str), optional
+        names in STAGES to run. Runs every stage if None
+    repeat : int, optional
+        number of times each benchmark is timed
+    verbose : bool, optional
+        whether to print each result as it finishes
+
+    Returns
+    -------
+    report : dict
+        'environment' describing the machine and 'results', a list with the
+        stage, name, size, kernel_size, parameters, every time, and the
+        best and mean times (seconds) of each benchmark
+    """
+    if stages is None:
+        stages = STAGES
+    report = {'environment': environment(), 'results': []}
+    folder = tempfile.mkdtemp(prefix='fiber_benchmarks_')
+    try:
+        for stage in stages:
+            for size in sizes:
+                for kernel_size in kernel_sizes:
+                    stage_folder = os.path.join(folder, '%s_%d_%d' % (stage, size,
+                                                                      kernel_size))
+                    os.mkdir(stage_folder)
+                    try:
+                        results = BENCHMARKS[stage](size, kernel_size, repeat,
+                                                    stage_folder + '/')
+                    except Exception:
+                        report['results'].append(_result(stage, stage, size,
+                                                         kernel_size, {}, None))
+                        report['results'][-1]['error'] = traceback.format_exc()
+                        if verbose:
+                            print 'ERROR', stage, size, kernel_size
+                            print traceback.format_exc()
+                        continue
+                    for name, parameters, times in results:
+                        report['results'].append(_result(stage, name, size,
+                                                         kernel_size,
+                                                         parameters, times))
+                        if verbose:
+                            print '%-24s size %5d  kernel %3d  best %9.4f s' % (
+                                name, size, kernel_size, min(times))
+                            sys.stdout.flush()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return report
+
+def _result(stage, name, size, kernel_size, parameters, times):
+    result = {'stage': stage, 'name': name, 'size': size,
+              'kernel_size': kernel_size, 'parameters': parameters,
+              'times': times, 'best': None, 'mean': None}
+    if times:
+        result['best'] = min(times)
+        result['mean'] = sum(times) / len(times)
+    return result
+
+def environment():
+    """Returns a description of the machine running the benchmarks"""
+    try:
+        from fiber_properties.filter_image import median
+        cython = True
+    except ImportError:
+        cython = False
+    return {'date': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': _cpu_count(),
+            'cython_filter': cython}
+
+def _cpu_count():
+    from multiprocessing import cpu_count
+    return cpu_count()
+
+#=============================================================================#
+#===== Regression Checks =====================================================#
+#=============================================================================#
+
+def compare_benchmarks(baseline, report, tolerance=0.2):
+    """Compares two benchmark reports
+
+    Args
+    ----
+    baseline : dict
+        earlier report of run_benchmarks()
+    report : dict
+        new report of run_benchmarks()
+    tolerance : float, optional
+        allowed fractional increase of the best time
+
+    Returns
+    -------
+    comparisons : list(dict)
+        name, size, kernel_size, old and new best times, their ratio, and
+        whether the benchmark regressed, for every benchmark in both reports
+    """
+    old = dict((_key(result), result) for result in baseline['results'])
+    comparisons = []
+    for result in report['results']:
+        key = _key(result)
+        if key not in old or old[key]['best'] is None or result['best'] is None:
+            continue
+        ratio = result['best'] / old[key]['best']
+        comparisons.append({'name': result['name'], 'size': result['size'],
+                            'kernel_size': result['kernel_size'],
+                            'old': old[key]['best'], 'new': result['best'],
+                            'ratio': ratio,
+                            'regression': ratio > 1.0 + tolerance})
+    return comparisons
+
+def _key(result):
+    return (result['name'], result['size'], result['kernel_size'],
+            json.dumps(result['parameters'], sort_keys=True))
+
+def print_comparisons(comparisons):
+    for comparison in comparisons:
+        print '%-24s size %5d  kernel %3d  %9.4f -> %9.4f s  x%.2f%s' % (
+            comparison['name'], comparison['size'], comparison['kernel_size'],
+            comparison['old'], comparison['new'], comparison['ratio'],
+            '  REGRESSION' if comparison['regression'] else '')
+
+def load_report(file_name):
+    with open(file_name) as input_file:
+        return json.load(input_file)
+
+def save_report(report, file_name):
+    with open(file_name, 'w') as output_file:
+        json.dump(report, output_file, indent=2, sort_keys=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the fiber_properties '
+                                     'hot paths on synthetic images')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000])
+    parser.add_argument('--kernels', type=int, nargs='+', default=[9, 51])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None,
+                        help='JSON file for the results')
+    parser.add_argument('--compare', default=None,
+                        help='baseline JSON file to compare the results to')
+    parser.add_argument('--compare-files', nargs=2, default=None,
+                        metavar=('BASELINE', 'NEW'),
+                        help='compare two saved reports without running')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    if args.compare_files is not None:
+        baseline = load_report(args.compare_files[0])
+        report = load_report(args.compare_files[1])
+    else:
+        report = run_benchmarks(args.sizes, args.kernels, args.stages,
+                                args.repeat)
+        if args.output is not None:
+            save_report(report, args.output)
+        if args.compare is None:
+            return 0
+        baseline = load_report(args.compare)
+
+    comparisons = compare_benchmarks(baseline, report, args.tolerance)
+    print_comparisons(comparisons)
+    # Non-zero exit status so the check can fail a build
+    return int(any(comparison['regression'] for comparison in comparisons))
+
+if __name__ == '__main__':
+    sys.exit(main())
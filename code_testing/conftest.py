@@ -0,0 +1,46 @@
+"""pytest configuration and shared fixtures for code_testing
+
+The scripts below predate the pytest tests. They run (and some write
+files) when imported, so they are not collected
+"""
+import pytest
+from fiber_properties import FiberImage, synthetic_image
+
+collect_ignore = ['filter_test.py', 'gaussian_fit_test.py', 'median_test.py',
+                  'noise_test.py', 'polynomial_fit_test.py',
+                  'rectangle_array_test.py', 'setter_test.py']
+
+@pytest.fixture(scope='session')
+def fiber_image():
+    """Near field image of a 100 pixel fiber centered between pixels"""
+    return synthetic_image((150, 150), (75.3, 74.6), 50, read_noise=2.0,
+                           seed=0)
+
+@pytest.fixture
+def new_object(fiber_image):
+    """Returns a function making FiberImage objects with the test settings
+
+    The function takes an image (fiber_image if None) and keyworded
+    arguments passed to FiberImage
+    """
+    def new_object(image=None, **kwargs):
+        if image is None:
+            image = fiber_image
+        return FiberImage(image, threshold=100, kernel_size=3,
+                          pixel_size=3.45, magnification=1.0, **kwargs)
+    return new_object
+
+@pytest.fixture
+def speckle_image():
+    """Returns a function making speckled 80 pixel fiber images by seed"""
+    def speckle_image(seed=0):
+        return synthetic_image((120, 120), (60, 60), 40, read_noise=2.0,
+                               speckle_contrast=0.2, seed=seed)
+    return speckle_image
+
+@pytest.fixture
+def speckle_object(new_object, speckle_image):
+    """Returns a function making FiberImage objects of speckle_image()"""
+    def speckle_object(seed=0, camera='nf'):
+        return new_object(speckle_image(seed), camera=camera)
+    return speckle_object
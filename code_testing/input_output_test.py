@@ -0,0 +1,46 @@
+"""Tests of the columnar object files on synthetic images
+
+Run with pytest (python -m pytest code_testing/input_output_test.py)
+"""
+import numpy as np
+import pytest
+from fiber_properties import save_image_object, load_image_object
+from fiber_properties.input_output import (save_columnar_object,
+                                           load_columnar_object)
+
+class Holder(object):
+    """Object with dict attributes"""
+    def __init__(self):
+        self.counts = {1: 'one', 2.5: 'two and a half', True: 'true',
+                       'a/b': 'slash', '%2F': 'escaped', 'name': 'plain'}
+        self.nested = {'x/y': {3: [1.0, 2.0]}}
+
+def test_object_round_trip(tmpdir, new_object):
+    image_obj = new_object()
+    center = image_obj.get_fiber_center(method='edge').as_tuple()
+    centroid = image_obj.get_fiber_centroid(method='edge').as_tuple()
+    object_file = str(tmpdir.join('object.npz'))
+    save_image_object(image_obj, object_file, include_image=True)
+
+    loaded = load_image_object(object_file)
+    assert loaded._center.edge.as_tuple() == center
+    assert loaded._centroid.edge.as_tuple() == centroid
+    assert np.array_equal(loaded.get_image(), image_obj.get_image())
+    assert load_image_object(object_file, key='_center/edge/_x') == center[0]
+
+def test_dict_keys_keep_their_types(tmpdir):
+    object_file = str(tmpdir.join('holder.npz'))
+    holder = Holder()
+    save_columnar_object(holder, object_file)
+
+    loaded = load_columnar_object(object_file)
+    assert loaded.counts == holder.counts
+    assert loaded.nested == {'x/y': {3: [1.0, 2.0]}}
+    assert load_columnar_object(object_file, 'counts/a%2Fb') == 'slash'
+    assert load_columnar_object(object_file, 'nested/x%2Fy/3') == [1.0, 2.0]
+
+def test_clashing_keys_are_rejected(tmpdir):
+    holder = Holder()
+    holder.counts = {1: 'int', '1': 'str'}
+    with pytest.raises(RuntimeError):
+        save_columnar_object(holder, str(tmpdir.join('holder.npz')))
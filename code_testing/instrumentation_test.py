@@ -0,0 +1,30 @@
+"""Tests of the instrumentation on synthetic images
+
+Run with pytest (python -m pytest code_testing/instrumentation_test.py)
+"""
+import pytest
+from fiber_properties import (get_profile, enable_instrumentation,
+                              disable_instrumentation, reset_instrumentation)
+
+@pytest.fixture
+def profile():
+    reset_instrumentation()
+    enable_instrumentation()
+    yield get_profile
+    disable_instrumentation()
+    reset_instrumentation()
+
+def test_peak_bytes_include_hot_path_arrays(profile, speckle_object):
+    image_obj = speckle_object()
+    image_obj.get_filtered_image()
+    assert profile(image_obj).peak_bytes == image_obj.get_image().nbytes
+
+    # The padded spectrum is much larger than the image
+    image_obj.get_modal_noise(method='fft', fft_length=512)
+    assert profile(image_obj).peak_bytes >= 512 * 257 * 16
+
+def test_peak_bytes_include_the_fit_jacobian(profile, speckle_image):
+    from fiber_properties import rectangle_fit
+    image = speckle_image()
+    rectangle_fit(image, initial_guess=(60, 60, 80, 80, 0.0))
+    assert profile().peak_bytes == image.size * 7 * 8
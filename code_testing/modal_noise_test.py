@@ -0,0 +1,117 @@
+"""Tests of the modal noise helpers
+
+Run with pytest (python -m pytest code_testing/modal_noise_test.py)
+"""
+import sys
+import numpy as np
+import pytest
+from fiber_properties.modal_noise import _full_spectrum, _real_fft2
+
+@pytest.mark.parametrize('fft_length', [44, 45, 64, 2025])
+def test_full_spectrum_matches_fft2(fft_length):
+    image = np.random.RandomState(0).rand(30, 30)
+    spectrum = _full_spectrum(np.abs(_real_fft2(image, fft_length)),
+                              fft_length)
+    expected = np.fft.fftshift(np.abs(np.fft.fft2(image, s=(fft_length,
+                                                            fft_length))))
+    assert np.allclose(spectrum, expected)
+
+def test_fft_batch_stores_and_reuses_spectra(tmpdir, monkeypatch,
+                                            speckle_object):
+    from fiber_properties import load_image_object, modal_noise_fft_batch
+    object_files = []
+    for seed in xrange(2):
+        image_obj = speckle_object(seed)
+        object_files.append(str(tmpdir.join('obj_%d.pkl' % seed)))
+        image_obj.save_object(object_files[-1])
+
+    fft_info_list = modal_noise_fft_batch(object_files, fft_length=256,
+                                          save_objs=True)
+    loaded = load_image_object(object_files[0])
+    assert np.array_equal(loaded.get_modal_noise('fft').power,
+                          fft_info_list[0].power)
+
+    # Saved spectra are not calculated again
+    def fail(*args, **kwargs):
+        raise AssertionError('spectrum recalculated')
+    # The package exports a modal_noise function over the module name
+    module = sys.modules['fiber_properties.modal_noise']
+    monkeypatch.setattr(module, '_real_fft2', fail)
+    again = modal_noise_fft_batch(object_files, fft_length=256)
+    assert np.array_equal(again[1].power, fft_info_list[1].power)
+
+_GETTERS = ['get_image', 'get_fiber_data', 'get_gaussian_fit', 'get_camera',
+            'convert_pixels_to_units']
+
+def _record_threads(monkeypatch):
+    """Returns the names of the threads that call the FiberImage getters"""
+    import threading
+    from fiber_properties import FiberImage
+    threads = []
+    def recorded(getter):
+        def wrapper(self, *args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return getter(self, *args, **kwargs)
+        return wrapper
+    for name in _GETTERS:
+        monkeypatch.setattr(FiberImage, name,
+                            recorded(getattr(FiberImage, name)))
+    return threads
+
+def test_threaded_methods_use_the_object_serially(monkeypatch,
+                                                  speckle_object):
+    from fiber_properties import modal_noise_methods
+    methods = ['tophat', 'gaussian', 'polynomial', 'contrast', 'gradient']
+    expected = modal_noise_methods(speckle_object(), methods)
+
+    threads = _record_threads(monkeypatch)
+    values = modal_noise_methods(speckle_object(), methods, threads=4,
+                                 fiber_method='edge')
+    assert threads and set(threads) == set(['MainThread'])
+    for method in methods:
+        assert np.isclose(values[method], expected[method])
+
+def test_threaded_fft_batch_uses_the_objects_serially(monkeypatch,
+                                                       speckle_object):
+    from fiber_properties import modal_noise_fft_batch
+    threads = _record_threads(monkeypatch)
+    objects = [speckle_object(seed) for seed in xrange(4)]
+    fft_info_list = modal_noise_fft_batch(objects, fft_length=128,
+                                          threads=2, batch_size=1)
+    assert set(threads) == set(['MainThread'])
+    assert len(fft_info_list) == 4
+
+def test_perfect_image_follows_the_object(tmpdir, speckle_object):
+    from fiber_properties import baseline_image
+    from fiber_properties.modal_noise import _perfect_image
+    image_obj = speckle_object()
+    perfect = _perfect_image(image_obj, 11, 'edge')
+    assert _perfect_image(image_obj, 11, 'edge') is perfect
+
+    # A different center changes the crop
+    image_obj._center.edge.x += 5.0
+    shifted = _perfect_image(image_obj, 11, 'edge')
+    assert not np.array_equal(shifted, perfect)
+
+    # So does a new calibration
+    dark = np.tile(np.linspace(0.0, 100.0, 120), (120, 1))
+    image_obj.set_dark(dark)
+    expected_obj = speckle_object()
+    expected_obj.set_dark(dark)
+    assert np.array_equal(_perfect_image(image_obj, 11, 'edge'),
+                          _perfect_image(expected_obj, 11, 'edge'))
+
+    object_file = str(tmpdir.join('object.pkl'))
+    speckle_object().save_object(object_file)
+    assert np.array_equal(baseline_image(object_file, 11, seed=0,
+                                         fiber_method='edge'),
+                          baseline_image(speckle_object(), 11, seed=0,
+                                         fiber_method='edge'))
+
+def test_polynomial_method_value(speckle_object):
+    # Pinned after the fit moved to a normalized, orthogonal basis. The raw
+    # monomial least squares fit gave 0.0948 on this frame
+    from fiber_properties import modal_noise
+    value = modal_noise(speckle_object(), method='polynomial',
+                        fiber_method='edge')
+    assert np.isclose(value, 0.0842228, rtol=0, atol=1e-6)
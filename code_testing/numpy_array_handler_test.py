@@ -0,0 +1,241 @@
+"""Tests of the array functions
+
+Run with pytest (python -m pytest code_testing/numpy_array_handler_test.py)
+"""
+import numpy as np
+import pytest
+from fiber_properties import numpy_array_handler
+from fiber_properties.numpy_array_handler import intensity_statistics
+
+@pytest.mark.parametrize('shape', [(1,), (1000,), (1001,), (3, 1001)])
+def test_intensity_statistics_matches_numpy(shape, monkeypatch):
+    # Small blocks so that the values are split between several
+    monkeypatch.setattr(numpy_array_handler, '_STATISTICS_BLOCK', 64)
+    values = np.random.RandomState(0).gamma(2.0, 500.0, size=shape) + 1.0
+    stats = intensity_statistics(values, gini=True)
+    assert np.allclose(stats.sum, values.sum(axis=-1), rtol=1e-14)
+    assert np.array_equal(stats.min, values.min(axis=-1))
+    assert np.array_equal(stats.max, values.max(axis=-1))
+    assert np.allclose(stats.mean, values.mean(axis=-1), rtol=1e-14)
+    assert np.allclose(stats.std, values.std(axis=-1), rtol=1e-12, atol=1e-12)
+    p = values / values.sum(axis=-1, keepdims=True)
+    assert np.allclose(stats.entropy, -(p * np.log10(p)).sum(axis=-1),
+                       rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize('shape', [(8, 8), (9, 7), (7, 10)])
+def test_pyramid_reduce_mask_is_a_min_pool(shape):
+    from fiber_properties.numpy_array_handler import (_pyramid_reduce,
+                                                      _pyramid_reduce_mask)
+    mask = np.random.RandomState(1).rand(*shape) > 0.2
+    reduced = _pyramid_reduce_mask(mask, 'gaussian')
+    assert reduced.shape == _pyramid_reduce(np.zeros(shape), 'gaussian').shape
+    for i in xrange(reduced.shape[0]):
+        for j in xrange(reduced.shape[1]):
+            assert reduced[i, j] == mask[2*i:2*i+2, 2*j:2*j+2].all()
+
+def _counted_qr(monkeypatch):
+    calls = []
+    qr = np.linalg.qr
+    def counted_qr(*args, **kwargs):
+        calls.append(args[0].shape)
+        return qr(*args, **kwargs)
+    monkeypatch.setattr(np.linalg, 'qr', counted_qr)
+    return calls
+
+def test_polynomial_fit_reuses_the_factorization(monkeypatch):
+    from fiber_properties.containers import Pixel
+    from fiber_properties.numpy_array_handler import (polynomial_fit,
+                                                      clear_polynomial_fit_cache)
+    clear_polynomial_fit_cache()
+    calls = _counted_qr(monkeypatch)
+    image = np.random.RandomState(2).rand(80, 90)
+    first = polynomial_fit(image, 4, Pixel(40.3, 38.7), 25.2)
+    # A circle moved by a fraction of a pixel covers the same pixels
+    second = polynomial_fit(image, 4, Pixel(40.3 + 1e-9, 38.7), 25.2 + 1e-9)
+    assert len(calls) == 1
+    assert np.array_equal(first, second)
+    polynomial_fit(image, 4, Pixel(41.3, 38.7), 25.2)
+    assert len(calls) == 2
+    clear_polynomial_fit_cache()
+
+def test_uncached_polynomial_fit_matches_the_factorization(monkeypatch):
+    from fiber_properties.numpy_array_handler import (polynomial_fit,
+                                                      polynomial_array,
+                                                      mesh_grid_from_array,
+                                                      clear_polynomial_fit_cache)
+    clear_polynomial_fit_cache()
+    image = np.random.RandomState(3).rand(60, 70) * 100.0
+    fit, coeffs = polynomial_fit(image, 6, full_output=True)
+    clear_polynomial_fit_cache()
+    monkeypatch.setattr(numpy_array_handler, '_POLY_FIT_CACHE_BYTES', 1000)
+    calls = _counted_qr(monkeypatch)
+    grid_fit, grid_coeffs = polynomial_fit(image, 6, full_output=True)
+    assert not calls
+    assert np.allclose(grid_fit, fit, rtol=0, atol=1e-8)
+    assert np.allclose(polynomial_array(mesh_grid_from_array(image),
+                                        *grid_coeffs), grid_fit, atol=1e-8)
+    clear_polynomial_fit_cache()
+
+@pytest.fixture(scope='module')
+def speckled_tophat():
+    from scipy.ndimage import gaussian_filter
+    from fiber_properties import synthetic_image
+    speckle = gaussian_filter(np.random.RandomState(0).normal(size=(340, 340)),
+                              3.0)
+    speckle /= speckle.std()
+    return synthetic_image((340, 340), (170, 170), 150) * (1 + 0.05 * speckle)
+
+@pytest.mark.parametrize('kernel_size', [51, 101])
+def test_lowpass_engines_match_the_median(speckled_tophat, kernel_size):
+    from fiber_properties.numpy_array_handler import lowpass_image
+    # Bounds documented in lowpass_image()
+    bounds = {'gaussian': 0.011, 'box': 0.010, 'decimate': 0.002}
+    median = lowpass_image(speckled_tophat, kernel_size)
+    y_grid, x_grid = np.mgrid[:340, :340]
+    radius = np.hypot(x_grid - 170, y_grid - 170)
+    inner = radius < 150 - kernel_size / 2.0
+    mean = speckled_tophat[radius < 150].mean()
+    for method, bound in bounds.items():
+        filtered = lowpass_image(speckled_tophat, kernel_size, method)
+        assert filtered.shape == median.shape
+        difference = (filtered - median)[inner]
+        assert np.sqrt(np.mean(difference**2)) / mean < bound
+
+def _inside_polygon(x, y, vertices):
+    # Counter-clockwise vertices: inside is left of every edge
+    inside = np.ones(x.shape, dtype=bool)
+    for (x1, y1), (x2, y2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        inside &= (x2 - x1) * (y - y1) - (y2 - y1) * (x - x1) >= 0.0
+    return inside
+
+def test_polygon_array_is_the_pixel_coverage():
+    from fiber_properties.numpy_array_handler import (polygon_array,
+                                                      regular_polygon_vertices)
+    x0, y0, radius, sides, angle = 20.3, 19.6, 12.5, 8, 10.0
+    mesh_grid = np.meshgrid(np.arange(40.0), np.arange(40.0))
+    coverage = polygon_array(mesh_grid, x0, y0, radius, sides, angle)
+    area = 0.5 * sides * radius**2 * np.sin(2 * np.pi / sides)
+    assert np.isclose(coverage.sum(), area, rtol=1e-12)
+    assert coverage.min() >= 0.0 and coverage.max() <= 1.0
+
+    # Against 64 x 64 samples in every pixel
+    vertices = regular_polygon_vertices(x0, y0, radius, sides, angle)
+    if np.cross(vertices[1] - vertices[0], vertices[2] - vertices[1]) < 0:
+        vertices = vertices[::-1]
+    offsets = (np.arange(64) + 0.5) / 64 - 0.5
+    sub_x, sub_y = np.meshgrid(offsets, offsets)
+    for y in xrange(40):
+        for x in xrange(40):
+            samples = _inside_polygon(x + sub_x, y + sub_y, vertices).mean()
+            assert abs(coverage[y, x] - samples) < 0.02
+
+def test_aperture_sum_of_a_flat_image():
+    from fiber_properties.containers import Pixel
+    from fiber_properties.numpy_array_handler import (aperture_sum,
+                                                      intensity_array)
+    image = np.full((80, 80), 2.0)
+    center = Pixel(40.2, 39.7)
+    # Inscribed radius 20 octagon: 8 r**2 tan(pi/8)
+    assert np.isclose(aperture_sum(image, center, 20.0, 'octagon', 15.0),
+                      2.0 * 8 * 20.0**2 * np.tan(np.pi / 8), rtol=1e-12)
+    assert aperture_sum(image, center, 20.0) == intensity_array(image, center,
+                                                               20.0).sum()
+    x, y = np.meshgrid(np.arange(80), np.arange(80))
+    assert (aperture_sum(image, center, 20.0)
+            == 2.0 * ((x - 40.2)**2 + (y - 39.7)**2 <= 400.0).sum())
+
+@pytest.mark.parametrize('block_rows', [7, 256])
+def test_image_moments_match_numpy(block_rows):
+    from fiber_properties.numpy_array_handler import image_moments
+    state = np.random.RandomState(4)
+    image = state.gamma(2.0, 500.0, size=(60, 50))
+    variance = state.rand(60, 50) * 100.0
+    roi = (5, 47, 8, 41)
+    weights = state.rand(42, 33)
+    moments = image_moments(image, weights, roi, variance, True, block_rows)
+
+    y, x = np.mgrid[5:47, 8:41].astype('float64')
+    weighted = image[5:47, 8:41] * weights
+    total = weighted.sum()
+    x_mean = (weighted * x).sum() / total
+    y_mean = (weighted * y).sum() / total
+    assert np.isclose(moments.total, total, rtol=1e-13)
+    assert np.isclose(moments.x, x_mean, rtol=1e-13)
+    assert np.isclose(moments.y, y_mean, rtol=1e-13)
+    assert np.isclose(moments.xx, (weighted * (x - x_mean)**2).sum() / total,
+                      rtol=1e-10)
+    assert np.isclose(moments.yy, (weighted * (y - y_mean)**2).sum() / total,
+                      rtol=1e-10)
+    assert np.isclose(moments.xy, (weighted * (x - x_mean)
+                                   * (y - y_mean)).sum() / total,
+                      rtol=1e-8, atol=1e-10)
+    variance = variance[5:47, 8:41] * weights**2
+    assert np.isclose(moments.x_err, np.sqrt((variance
+                                              * (x - x_mean)**2).sum()) / total,
+                      rtol=1e-8)
+    assert np.isclose(moments.y_err, np.sqrt((variance
+                                              * (y - y_mean)**2).sum()) / total,
+                      rtol=1e-8)
+
+@pytest.mark.parametrize('window,step', [(5, 1), (9, 3)])
+def test_local_contrast_matches_brute_force(window, step):
+    from fiber_properties.numpy_array_handler import local_contrast
+    state = np.random.RandomState(5)
+    image = state.gamma(4.0, 1000.0, size=(30, 26))
+    mask = state.rand(30, 26) > 0.3
+    contrast_map = local_contrast(image, window, mask, step)
+
+    half = window // 2
+    assert contrast_map.shape == image[::step, ::step].shape
+    for i in xrange(contrast_map.shape[0]):
+        for j in xrange(contrast_map.shape[1]):
+            row, column = i * step, j * step
+            if not mask[row, column]:
+                assert np.isnan(contrast_map[i, j])
+                continue
+            rows = slice(max(0, row - half), row + half + 1)
+            columns = slice(max(0, column - half), column + half + 1)
+            values = image[rows, columns][mask[rows, columns]]
+            assert np.isclose(contrast_map[i, j], values.std() / values.mean(),
+                              rtol=1e-12, atol=0)
+
+def test_local_contrast_rejects_even_windows():
+    from fiber_properties.numpy_array_handler import local_contrast
+    with pytest.raises(ValueError):
+        local_contrast(np.ones((10, 10)), 4)
+
+@pytest.mark.parametrize('fiber_shape', ['circle', 'octagon'])
+def test_annular_statistics_match_brute_force(fiber_shape):
+    from fiber_properties.containers import Pixel
+    from fiber_properties.numpy_array_handler import annular_statistics
+    state = np.random.RandomState(6)
+    images = state.gamma(4.0, 1000.0, size=(2, 70, 64))
+    center = Pixel(31.4, 36.2)
+    info = annular_statistics(images, center, 22.0, 2.5, fiber_shape, 10.0)
+
+    x, y = np.meshgrid(np.arange(64) - center.x, np.arange(70) - center.y)
+    if fiber_shape == 'circle':
+        distance = np.sqrt(x**2 + y**2)
+    else:
+        angles = np.radians(10.0 + 45.0 * np.arange(8))
+        distance = np.max([x * np.cos(angle) + y * np.sin(angle)
+                           for angle in angles], axis=0)
+    rings = (distance / 2.5).astype('int')
+    assert np.array_equal(info.radius, 2.5 * np.arange(1, 10))
+    for frame, image in enumerate(images):
+        for ring in xrange(9):
+            values = image[rings == ring]
+            assert info.count[ring] == values.size
+            assert np.isclose(info.mean[frame, ring], values.mean(),
+                              rtol=1e-13)
+            assert np.isclose(info.std[frame, ring], values.std(), rtol=1e-11)
+            assert np.isclose(info.contrast[frame, ring],
+                              values.std() / values.mean(), rtol=1e-11)
+        energies = np.cumsum([image[rings == ring].sum()
+                              for ring in xrange(9)])
+        assert np.allclose(info.encircled_energy[frame],
+                           energies / energies[-1], rtol=1e-13)
+
+    single = annular_statistics(images[1], center, 22.0, 2.5, fiber_shape,
+                                10.0)
+    assert np.allclose(single.mean, info.mean[1], rtol=1e-13)
@@ -0,0 +1,50 @@
+"""Tests of the polygon fit and 'polygon' centering method on synthetic images
+
+Run with pytest (python -m pytest code_testing/polygon_fit_test.py)
+"""
+import numpy as np
+import pytest
+from fiber_properties import FiberImage, synthetic_image, polygon_fit
+
+CENTER = (75.3, 74.6)
+RADIUS = 45.0
+
+@pytest.mark.parametrize('fiber_shape, sides, angle',
+                         [('octagon', 8, 10.0), ('hexagon', 6, 25.0),
+                          ('square', 4, 40.0)])
+def test_polygon_fit(fiber_shape, sides, angle):
+    image = synthetic_image((150, 150), CENTER, RADIUS, fiber_shape=fiber_shape,
+                            fiber_angle=angle, read_noise=2.0, seed=0)
+    _, params = polygon_fit(image, sides, initial_guess=(75, 75, 50, 0.0),
+                            full_output=True)
+    x0, y0, radius, fit_angle, _, _ = params
+    assert abs(x0 - CENTER[0]) < 0.05 and abs(y0 - CENTER[1]) < 0.05
+    assert abs(radius - RADIUS / np.cos(np.pi / sides)) < 0.05
+    assert abs(fit_angle - angle) < 0.1
+
+def test_polygon_centering_method():
+    image = synthetic_image((150, 150), CENTER, RADIUS, fiber_shape='octagon',
+                            fiber_angle=10.0, read_noise=2.0, seed=0)
+    image_obj = FiberImage(image, threshold=1000, kernel_size=3,
+                           pixel_size=3.45, magnification=1.0)
+    center = image_obj.get_fiber_center(method='polygon', fiber_shape='octagon')
+    assert abs(center.x - CENTER[0]) < 0.05
+    assert abs(center.y - CENTER[1]) < 0.05
+    sides, radius, angle = image_obj.get_fiber_polygon()
+    assert sides == 8 and abs(angle - 10.0) < 0.1
+    assert abs(image_obj.get_fiber_diameter(method='polygon')
+               - 2.0 * radius) < 1e-9
+
+    centroid = image_obj.get_fiber_centroid(method='polygon')
+    assert abs(centroid.x - CENTER[0]) < 0.1
+    assert abs(centroid.y - CENTER[1]) < 0.1
+
+    image_obj.threshold = 500
+    assert image_obj._center.polygon.x is None
+    assert image_obj._centroid.polygon.x is None
+
+def test_polygon_method_needs_a_polygon():
+    image_obj = FiberImage(synthetic_image((150, 150), CENTER, RADIUS),
+                           threshold=1000, kernel_size=3)
+    with pytest.raises(ValueError):
+        image_obj.set_fiber_center(method='polygon', fiber_shape='circle')
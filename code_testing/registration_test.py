@@ -0,0 +1,68 @@
+"""Tests of the phase correlation registration on synthetic images
+
+Run with pytest (python -m pytest code_testing/registration_test.py)
+"""
+import os
+import numpy as np
+from fiber_properties import (FiberImage, register_images, phase_correlation,
+                              fiber_drift, synthetic_image,
+                              save_synthetic_image)
+
+CENTER = (64.0, 63.0)
+# Phase correlation of the area weighted edges is pulled towards whole
+# pixels by up to 0.1 pixels near quarter pixel offsets, so these offsets
+# keep clear of them
+SHIFTS = [(0.0, 0.0), (0.5, -0.5), (1.2, 0.1), (-2.5, 1.85)]
+
+def _shifted_image(shift, seed):
+    return synthetic_image((128, 128), (CENTER[0] + shift[0],
+                                        CENTER[1] + shift[1]), 30,
+                           read_noise=5.0, seed=seed)
+
+def test_register_images_finds_subpixel_shifts():
+    reference = _shifted_image((0.0, 0.0), 0)
+    images = [_shifted_image(shift, i+1) for i, shift in enumerate(SHIFTS)]
+    info = register_images(reference, images, threads=2, batch_size=3)
+    assert np.allclose(info.x_shift, [x for x, y in SHIFTS], rtol=0, atol=0.07)
+    assert np.allclose(info.y_shift, [y for x, y in SHIFTS], rtol=0, atol=0.07)
+    assert all(correlation > 0.5 for correlation in info.correlation)
+
+    x_shift, y_shift, correlation = phase_correlation(reference, images[2])
+    assert np.isclose(x_shift, info.x_shift[2])
+    assert np.isclose(y_shift, info.y_shift[2])
+    assert np.isclose(correlation, info.correlation[2])
+
+def test_phase_correlation_of_an_exact_translation():
+    reference = synthetic_image((128, 128), CENTER, 30, speckle_contrast=0.5,
+                                seed=0)
+    y_freq, x_freq = np.meshgrid(np.fft.fftfreq(128), np.fft.fftfreq(128),
+                                 indexing='ij')
+    shifted = np.fft.ifft2(np.fft.fft2(reference)
+                           * np.exp(-2j*np.pi * (0.37*x_freq - 1.62*y_freq))).real
+    x_shift, y_shift, correlation = phase_correlation(reference, shifted,
+                                                      upsample_factor=50)
+    # Within half of the 1/50 pixel step
+    assert abs(x_shift - 0.37) <= 0.011
+    assert abs(y_shift + 1.62) <= 0.011
+    assert correlation > 0.9
+
+def test_fiber_drift_of_saved_frames(tmpdir):
+    from astropy.io import fits
+    image_files = []
+    for i, shift in enumerate(SHIFTS):
+        image_file = os.path.join(str(tmpdir), 'nf_%03d.fit' % i)
+        save_synthetic_image(_shifted_image(shift, i), image_file,
+                             camera='nf', exp_time=1.0, pixel_size=3.45)
+        fits.setval(image_file, 'DATE-OBS', value='2017-03-19T10:0%d:00' % i)
+        image_files.append(image_file)
+
+    info = fiber_drift(image_files, method='edge', threads=1)
+    assert np.allclose(info.x_shift, [x for x, y in SHIFTS], rtol=0, atol=0.07)
+    assert np.allclose(info.y_shift, [y for x, y in SHIFTS], rtol=0, atol=0.07)
+    assert [time.minute for time in info.time] == range(len(SHIFTS))
+
+    microns = fiber_drift(image_files, method='edge', units='microns')
+    image_obj = FiberImage(image_files[0])
+    assert np.allclose(microns.x_shift,
+                       [image_obj.convert_pixels_to_units(shift, 'microns')
+                        for shift in info.x_shift])
@@ -0,0 +1,54 @@
+"""Tests of the FiberImage result dependencies on synthetic images
+
+Run with pytest (python -m pytest code_testing/result_graph_test.py)
+"""
+import cPickle as pickle
+import numpy as np
+from fiber_properties import FiberImage, filter_image, load_image_object
+
+def test_kernel_size_assignment_refilters(new_object):
+    image_obj = new_object()
+    image_obj.get_filtered_image()
+    image_obj.kernel_size = 21
+    assert np.array_equal(image_obj.get_filtered_image(),
+                          filter_image(image_obj.get_image(), 21))
+
+def test_threshold_assignment_clears_results(new_object):
+    image_obj = new_object()
+    image_obj.get_fiber_center(method='edge')
+    image_obj.get_fiber_centroid(method='edge')
+    image_obj.threshold = 100
+    assert image_obj.get_result_graph().is_computed('center.edge')
+
+    image_obj.threshold = 50
+    graph = image_obj.get_result_graph()
+    assert not graph.is_computed('center.edge')
+    assert not graph.is_computed('centroid.edge')
+    assert image_obj._center.edge.x is None
+
+def test_object_saved_before_the_graph(tmpdir, new_object):
+    image_obj = new_object()
+    image_obj.get_fiber_center(method='edge')
+    image_obj.get_fiber_centroid(method='edge')
+
+    # The attributes as they were saved before the result graph existed
+    state = dict(vars(image_obj))
+    del state['_graph']
+    state['kernel_size'] = state.pop('_kernel_size')
+    state['threshold'] = state.pop('_threshold')
+    old_obj = FiberImage.__new__(FiberImage)
+    old_obj.__dict__.update(state)
+    object_file = str(tmpdir.join('old.pkl'))
+    with open(object_file, 'wb') as output_file:
+        pickle.dump(old_obj, output_file, -1)
+
+    loaded = load_image_object(object_file)
+    assert loaded.kernel_size == 3 and loaded.threshold == 100
+    graph = loaded.get_result_graph()
+    assert graph.is_computed('center.edge')
+    assert graph.is_computed('centroid.edge')
+    assert not graph.is_computed('center.radius')
+
+    loaded.set_fiber_center(method='edge')
+    assert not loaded.get_result_graph().is_computed('centroid.edge')
+    assert loaded._centroid.edge.x is None
@@ -0,0 +1,53 @@
+"""Tests of the SQLite results index
+
+Run with pytest (python -m pytest code_testing/results_index_test.py)
+"""
+import numpy as np
+from fiber_properties import ResultsIndex
+
+def test_results_round_trip(tmpdir):
+    db_file = str(tmpdir.join('results.db'))
+    with ResultsIndex(db_file) as index:
+        index.record('Shift_00', 'nf', 'center_x', 60.25, 'edge',
+                     {'threshold': 100}, 'nf_000.fit')
+        index.record('Shift_01', 'nf', 'center_x', 63.5, 'edge',
+                     {'threshold': 100}, ['nf_000.fit', 'nf_001.fit'])
+        index.record('Shift_00', 'nf', 'modal_noise_power', [1.0, 0.5, 0.25],
+                     'fft')
+        # Recording the same result again replaces it
+        index.record('Shift_00', 'nf', 'center_x', 60.5, 'edge',
+                     {'threshold': 100}, 'nf_000.fit')
+        index.record('Shift_00', 'nf', 'center_x', 61.0, 'edge',
+                     {'threshold': 50})
+
+    # Read back from a new connection
+    with ResultsIndex(db_file) as index:
+        results = index.query('center_x', 'edge',
+                              parameters={'threshold': 100})
+        assert list(results.test) == ['Shift_00', 'Shift_01']
+        assert list(results.value) == [60.5, 63.5]
+        assert list(results.source) == [['nf_000.fit'],
+                                        ['nf_000.fit', 'nf_001.fit']]
+        assert results.parameters[0] == {'threshold': 100}
+        assert sorted(index.values('center_x', test='Shift_0%')) == [60.5,
+                                                                     61.0,
+                                                                     63.5]
+        assert np.array_equal(index.values('modal_noise_power', 'fft'),
+                              [[1.0, 0.5, 0.25]])
+        assert index.tests() == ['Shift_00', 'Shift_01']
+        assert index.tests('modal_noise_power') == ['Shift_00']
+
+        index.remove('Shift_00')
+        assert index.tests() == ['Shift_01']
+
+def test_record_image(new_object):
+    image_obj = new_object(camera='nf')
+    center = image_obj.get_fiber_center(method='edge')
+    diameter = image_obj.get_fiber_diameter(method='edge')
+    index = ResultsIndex(':memory:')
+    index.record_image(image_obj, test='synthetic')
+    assert index.values('center_x', 'edge', 'synthetic', 'nf')[0] == center.x
+    assert index.values('center_y', 'edge')[0] == center.y
+    assert index.values('diameter', 'edge')[0] == diameter
+    assert len(index.query('center_x', 'radius')) == 0
+    index.close()
@@ -0,0 +1,98 @@
+"""Tests of the shared memory transport on synthetic images
+
+Run with pytest (python -m pytest code_testing/shared_arrays_test.py)
+"""
+import os
+import numpy as np
+import pytest
+from fiber_properties import (FiberImage, SharedArrayRegistry,
+                              map_image_objects, synthetic_image,
+                              synthetic_dark, save_synthetic_image,
+                              load_image_object)
+from fiber_properties.shared_arrays import (SharedArray,
+                                            remove_stale_registries,
+                                            restore_image_object)
+
+def test_published_arrays_are_read_only_and_removed(tmpdir):
+    array = np.arange(12.0).reshape(3, 4)
+    with SharedArrayRegistry(str(tmpdir)) as registry:
+        shared = registry.publish(array, 'frame')
+        attached = shared.attach()
+        assert np.array_equal(attached, array)
+        assert not isinstance(attached, np.memmap)
+        with pytest.raises(ValueError):
+            attached[0, 0] = 1.0
+        assert registry.get('frame') is shared
+    assert not shared.exists()
+    with pytest.raises(RuntimeError):
+        shared.attach()
+
+def test_stale_registries_are_removed(tmpdir):
+    dead = tmpdir.mkdir('fiber_properties_999999_old')
+    registry = SharedArrayRegistry(str(tmpdir))
+    assert not dead.check()
+    remove_stale_registries(str(tmpdir))
+    assert os.path.isdir(registry.directory)
+    registry.close()
+    assert not os.path.isdir(registry.directory)
+
+def _dark_files(folder):
+    dark_files = []
+    for i in xrange(2):
+        dark_files.append(os.path.join(folder, 'dark_%03d.fit' % i))
+        save_synthetic_image(synthetic_dark((120, 120), 100.0, 5.0, seed=i),
+                             dark_files[-1], camera='nf', exp_time=1.0,
+                             pixel_size=3.45)
+    return dark_files
+
+def test_calibration_is_published_once(tmpdir):
+    dark_files = _dark_files(str(tmpdir))
+    with SharedArrayRegistry(str(tmpdir)) as registry:
+        shared = registry.publish_image_input(dark_files)
+        assert registry.publish_image_input(list(dark_files)) is shared
+        assert shared.info['exp_time'] == 1.0
+        assert np.array_equal(shared.attach(),
+                              FiberImage(dark_files).get_image())
+
+def _edge_center(image_obj):
+    return image_obj.get_fiber_center(method='edge').as_tuple()
+
+def test_map_matches_serial_and_saves_the_inputs(tmpdir):
+    dark_files = _dark_files(str(tmpdir))
+    def new_objects():
+        objects = []
+        for seed in xrange(3):
+            image = synthetic_image((120, 120), (60 + seed, 60), 40,
+                                    read_noise=5.0, dark_level=100.0,
+                                    seed=seed)
+            objects.append(FiberImage(image, dark=dark_files, threshold=100,
+                                      kernel_size=3, camera='nf',
+                                      pixel_size=3.45))
+        return objects
+
+    expected = [_edge_center(image_obj) for image_obj in new_objects()]
+    objects = new_objects()
+    assert map_image_objects(_edge_center, objects, processes=2) == expected
+    for image_obj, center in zip(objects, expected):
+        assert image_obj._center.edge.as_tuple() == center
+        assert image_obj.dark == dark_files
+        assert not hasattr(image_obj, '_shared_inputs')
+
+    object_file = str(tmpdir.join('object.pkl'))
+    objects[0].save_object(object_file)
+    loaded = load_image_object(object_file)
+    assert loaded.dark == dark_files
+    assert not isinstance(loaded.dark, SharedArray)
+
+def test_restore_keeps_the_original_inputs(tmpdir):
+    image_obj = FiberImage(synthetic_image((120, 120), (60, 60), 40),
+                           dark=_dark_files(str(tmpdir)), threshold=100)
+    original = image_obj.dark
+    with SharedArrayRegistry(str(tmpdir)) as registry:
+        shared_obj = registry.share_image_object(image_obj, publish_image=True)
+        assert isinstance(shared_obj.dark, SharedArray)
+        # Sharing twice keeps the original inputs
+        shared_obj = registry.share_image_object(shared_obj)
+        restore_image_object(shared_obj)
+    assert shared_obj.dark == original
+    assert shared_obj.image_file is None
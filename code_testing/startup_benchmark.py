@@ -0,0 +1,106 @@
+"""startup_benchmark.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+Times how long fresh interpreters take to import fiber_properties and to
+analyze a first frame, as a pool worker does, and lists the heavy
+dependencies each one loaded. Every run is a new process so nothing is
+cached between runs
+
+Usage
+-----
+python startup_benchmark.py
+python startup_benchmark.py --repeat 20 --output startup.json
+"""
+from timeit import default_timer
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Modules that should only load when they are used
+HEAVY_MODULES = ['matplotlib', 'astropy', 'PIL', 'scipy.optimize',
+                 'scipy.signal', 'scipy.stats']
+
+SCENARIOS = [
+    ('import', 'import fiber_properties', False),
+    ('headless_import', 'import fiber_properties', True),
+    ('headless_worker',
+     'from fiber_properties import FiberImage, synthetic_image\n'
+     'image = synthetic_image((200, 200), read_noise=5.0, seed=0)\n'
+     'FiberImage(image, pixel_size=1.0, magnification=1.0)'
+     '.get_fiber_center(method="edge")', True),
+    ('fitting_worker',
+     'from fiber_properties import FiberImage, synthetic_image\n'
+     'image = synthetic_image((200, 200), profile="gaussian", seed=0)\n'
+     'FiberImage(image, pixel_size=1.0, magnification=1.0, camera="ff")'
+     '.get_fiber_center(method="gaussian")', True),
+    ('plotting',
+     'import fiber_properties\nfiber_properties.get_pyplot()', False),
+]
+
+REPORT = ('import sys, json\n'
+          'print json.dumps([name for name in %r if name in sys.modules])'
+          % HEAVY_MODULES)
+
+def time_scenario(code, headless=False, repeat=5):
+    """Runs code in new interpreters
+
+    Returns
+    -------
+    times : list(float)
+        wall time (seconds) of each interpreter
+    modules : list(str)
+        HEAVY_MODULES loaded by the code
+    """
+    env = dict(os.environ)
+    env['MPLBACKEND'] = 'Agg'
+    env.pop('FIBER_PROPERTIES_HEADLESS', None)
+    if headless:
+        env['FIBER_PROPERTIES_HEADLESS'] = '1'
+    command = [sys.executable, '-c', code + '\n' + REPORT]
+
+    times = []
+    for _ in xrange(repeat):
+        start = default_timer()
+        output = subprocess.check_output(command, env=env)
+        times.append(default_timer() - start)
+    modules = json.loads(output.strip().splitlines()[-1])
+    return times, modules
+
+def baseline_time(repeat=5):
+    """Returns the best time of an interpreter that only imports numpy"""
+    times, _ = time_scenario('import numpy', repeat=repeat)
+    return min(times)
+
+def run_startup_benchmarks(repeat=5):
+    baseline = baseline_time(repeat)
+    results = []
+    for name, code, headless in SCENARIOS:
+        times, modules = time_scenario(code, headless, repeat)
+        results.append({'name': name, 'headless': headless, 'times': times,
+                        'best': min(times), 'overhead': min(times) - baseline,
+                        'modules': modules})
+        print '%-18s best %7.3f s  (+%6.3f s over numpy)  loaded: %s' % (
+            name, min(times), min(times) - baseline,
+            ', '.join(modules) or '-')
+    return {'numpy_baseline': baseline, 'results': results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the fiber_properties '
+                                     'startup in new interpreters')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=None,
+                        help='JSON file for the results')
+    args = parser.parse_args(argv)
+
+    report = run_startup_benchmarks(args.repeat)
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+    # Headless processes must never load matplotlib
+    return int(any('matplotlib' in result['modules']
+                   for result in report['results'] if result['headless']))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""Tests of fiber tracking on a drifting series of synthetic images
+
+Run with pytest (python -m pytest code_testing/tracking_test.py)
+"""
+import numpy as np
+from fiber_properties import FiberImage, synthetic_image, track_fiber
+
+# The third frame jumps past the edge of the seeded search window
+CENTERS = [(50.0, 50.0), (50.6, 49.7), (56.4, 51.2), (56.4, 51.2)]
+
+def test_tracking_widens_the_window_on_a_jump(monkeypatch):
+    from fiber_properties import tracking
+    windows = []
+    set_center = tracking._set_array_sum_center
+    def recorded(obj, method, approx_center, approx_radius, window, tol,
+                 **kwargs):
+        windows.append(window)
+        set_center(obj, method, approx_center, approx_radius, window, tol,
+                   **kwargs)
+    monkeypatch.setattr(tracking, '_set_array_sum_center', recorded)
+
+    objs = [FiberImage(synthetic_image((100, 100), center, 25,
+                                       read_noise=2.0, seed=0),
+                       threshold=100, kernel_size=3, pixel_size=3.45,
+                       magnification=1.0)
+            for center in CENTERS]
+    info = track_fiber(objs, method='circle', search_range=4.0,
+                       max_range=32.0)
+
+    assert np.allclose(info.center_x, [x for x, y in CENTERS], atol=0.5)
+    assert np.allclose(info.center_y, [y for x, y in CENTERS], atol=0.5)
+    assert np.allclose(info.diameter, 50.0, atol=1.0)
+    assert info.search_range == [32.0, 4.0, 32.0, 4.0]
+    # The first frame is searched once over the full window, the drifting
+    # frame is accepted in the seeded window, and the jump is searched again
+    # in growing windows
+    assert windows == [32.0, 4.0, 4.0, 16.0, 32.0, 4.0]
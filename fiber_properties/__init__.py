@@ -2,9 +2,27 @@ from .fiber_image import *
 from .calibrated_image import *
 from .base_image import *
 from .numpy_array_handler import *
-from .modal_noise import modal_noise, baseline_image
+from .modal_noise import (modal_noise, modal_noise_methods,
+                          modal_noise_fft_batch, baseline_image, contrast_map,
+                          ModalNoiseSession)
 from .scrambling_gain import *
+from .tracking import *
+from .registration import *
+from .results_index import *
+from .memoize import (ResultCache, enable_result_cache, disable_result_cache,
+                      get_result_cache)
+from .result_graph import ResultGraph, clear_array_cache
+from .instrumentation import (enable_instrumentation, disable_instrumentation,
+                              reset_instrumentation, get_profile,
+                              instrumentation_report, export_trace,
+                              add_trace_hook, remove_trace_hook, stage_timer)
 from .focal_ratio_degradation import *
+from .synthetic import *
+from .accuracy import (centering_accuracy, accuracy_summary,
+                       accuracy_report)
+from .batch import run_batch, load_manifest, build_tasks
+from .shared_arrays import (SharedArray, SharedArrayRegistry,
+                            map_image_objects)
 from .plotting import *
 from .input_output import *
 from .containers import *
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""accuracy.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+This module contains a Monte-Carlo harness that measures the accuracy and
+speed of the centering methods. Every trial generates a synthetic frame
+with a random sub-pixel center and radius (see synthetic.py), runs each
+method on it, and stores the center and diameter errors. Trials are spread
+over a process pool and each trial has its own seed, so results do not
+depend on the number of processes
+"""
+from multiprocessing import Pool, cpu_count
+from timeit import default_timer
+import numpy as np
+from .fiber_image import FiberImage
+from .synthetic import synthetic_image
+from .containers import AccuracyInfo
+
+# Keyworded arguments of FiberImage (the rest go to set_fiber_center)
+_OBJECT_KWARGS = ['kernel_size', 'threshold']
+
+def centering_accuracy(methods=('edge', 'radius', 'circle', 'gaussian'),
+                       noise_levels=(10.0,), trials=100, size=1000,
+                       processes=None, seed=0, amp=10000.0,
+                       speckle_contrast=0.0, fiber_shape='circle',
+                       threshold=1000, kernel_size=9, chunksize=4):
+    """Measures the center and diameter errors of centering methods
+
+    Args
+    ----
+    methods : sequence of str or (label, method, dict), optional
+        centering methods to test. A (label, method, kwargs) tuple runs the
+        method with the keyworded arguments passed to set_fiber_center()
+        (or 'kernel_size' and 'threshold' passed to FiberImage), so that
+        several settings of the same method can be compared
+    noise_levels : sequence of number, optional
+        read noise STDEV (counts) of each set of trials. Shot noise is
+        always included
+    trials : int, optional
+        number of frames per noise level
+    size : int, optional
+        side length of the square frames. The fiber radius is a quarter of
+        the side length plus a random fraction of a pixel
+    processes : int, optional
+        number of worker processes. If None, uses the number of CPUs. With
+        1, trials run in this process
+    seed : int, optional
+        seed from which every trial's seed is drawn
+    amp : number, optional
+        peak signal (counts) of the fiber face
+    speckle_contrast : number, optional
+        speckle on the near field faces. See synthetic_image()
+    fiber_shape : str or int, optional
+        shape of the near field faces. See synthetic_image()
+    threshold, kernel_size : optional
+        FiberImage arguments used unless a method overrides them
+    chunksize : int, optional
+        trials sent to a worker at a time
+
+    Returns
+    -------
+    info : AccuracyInfo
+        errors (measured - true, pixels) and run times of every trial. See
+        accuracy_summary() and accuracy_report()
+    """
+    methods = [_method_spec(method) for method in methods]
+    noise_levels = list(noise_levels)
+    trial_seeds = np.random.RandomState(seed).randint(2**31 - 1,
+                                                      size=(len(noise_levels),
+                                                            trials))
+    config = {'methods': methods, 'size': size, 'amp': amp,
+              'speckle_contrast': speckle_contrast,
+              'fiber_shape': fiber_shape, 'threshold': threshold,
+              'kernel_size': kernel_size}
+    tasks = [(level, trial, int(trial_seeds[level, trial]), noise, config)
+             for level, noise in enumerate(noise_levels)
+             for trial in xrange(trials)]
+
+    info = AccuracyInfo()
+    info.methods = [label for label, _, _ in methods]
+    info.noise_levels = noise_levels
+    shape = (len(noise_levels), trials)
+    for label in info.methods:
+        for errors in [info.x_error, info.y_error, info.diameter_error,
+                       info.time]:
+            errors[label] = np.full(shape, np.nan)
+
+    if processes is None:
+        processes = cpu_count()
+    if processes > 1:
+        pool = Pool(processes)
+        try:
+            results = pool.imap_unordered(_run_trial, tasks, chunksize)
+            for result in results:
+                _store_trial(info, result)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for task in tasks:
+            _store_trial(info, _run_trial(task))
+    return info
+
+def _method_spec(method):
+    if isinstance(method, basestring):
+        return (method, method, {})
+    label, method, kwargs = method
+    return (label, method, dict(kwargs))
+
+def _run_trial(task):
+    """Generates one frame per profile and runs every method on it
+
+    Returns
+    -------
+    level : int
+    trial : int
+    results : dict
+        label -> (x_error, y_error, diameter_error, time). NaN if the
+        method failed
+    """
+    level, trial, trial_seed, noise, config = task
+    random_state = np.random.RandomState(trial_seed)
+    size = config['size']
+    x0, y0 = size / 2.0 + random_state.rand(2) - 0.5
+    radius = size / 4.0 + random_state.rand()
+
+    images = {}
+    results = {}
+    for label, method, kwargs in config['methods']:
+        profile = 'gaussian' if method == 'gaussian' else 'tophat'
+        if profile not in images:
+            images[profile] = synthetic_image(
+                (size, size), (x0, y0), radius, profile=profile,
+                fiber_shape=config['fiber_shape'], amp=config['amp'],
+                speckle_contrast=(config['speckle_contrast']
+                                  if profile == 'tophat' else 0.0),
+                shot_noise=True, read_noise=noise, seed=random_state)
+
+        object_kwargs = {'threshold': config['threshold'],
+                         'kernel_size': config['kernel_size']}
+        center_kwargs = dict(kwargs)
+        for key in _OBJECT_KWARGS:
+            if key in center_kwargs:
+                object_kwargs[key] = center_kwargs.pop(key)
+        try:
+            start = default_timer()
+            image_obj = FiberImage(images[profile], pixel_size=1.0,
+                                   magnification=1.0,
+                                   camera='ff' if profile == 'gaussian' else 'nf',
+                                   **object_kwargs)
+            image_obj.set_fiber_center(method, **center_kwargs)
+            center = image_obj.get_fiber_center(method=method)
+            diameter = image_obj.get_fiber_diameter(method=method)
+            elapsed = default_timer() - start
+            results[label] = (center.x - x0, center.y - y0,
+                              diameter - 2.0 * radius, elapsed)
+        except Exception:
+            results[label] = (np.nan, np.nan, np.nan, np.nan)
+    return level, trial, results
+
+def _store_trial(info, result):
+    level, trial, results = result
+    for label, (x_error, y_error, diameter_error, elapsed) in results.items():
+        info.x_error[label][level, trial] = x_error
+        info.y_error[label][level, trial] = y_error
+        info.diameter_error[label][level, trial] = diameter_error
+        info.time[label][level, trial] = elapsed
+
+def accuracy_summary(info):
+    """Returns the bias, scatter, and run time of each method and noise level
+
+    Args
+    ----
+    info : AccuracyInfo
+
+    Returns
+    -------
+    summary : dict
+        label -> dict of 1D arrays (one value per noise level): x_bias,
+        y_bias, diameter_bias (mean errors), x_scatter, y_scatter,
+        diameter_scatter (STDEV of the errors), center_rms (RMS distance
+        from the true center), time (mean seconds), and failures
+    """
+    summary = {}
+    for label in info.methods:
+        x_error = info.x_error[label]
+        y_error = info.y_error[label]
+        diameter_error = info.diameter_error[label]
+        summary[label] = {
+            'x_bias': _nan_mean(x_error),
+            'y_bias': _nan_mean(y_error),
+            'diameter_bias': _nan_mean(diameter_error),
+            'x_scatter': _nan_std(x_error),
+            'y_scatter': _nan_std(y_error),
+            'diameter_scatter': _nan_std(diameter_error),
+            'center_rms': np.sqrt(_nan_mean(x_error**2 + y_error**2)),
+            'time': _nan_mean(info.time[label]),
+            'failures': np.isnan(info.time[label]).sum(axis=1)}
+    return summary
+
+def accuracy_report(info):
+    """Returns a table of accuracy_summary() for every method and noise level"""
+    summary = accuracy_summary(info)
+    lines = ['%-16s %8s %9s %9s %9s %9s %9s %9s %6s'
+             % ('method', 'noise', 'x bias', 'y bias', 'xy rms', 'd bias',
+                'd std', 'time (s)', 'fail')]
+    for label in info.methods:
+        stats = summary[label]
+        for level, noise in enumerate(info.noise_levels):
+            lines.append('%-16s %8.2f %9.4f %9.4f %9.4f %9.4f %9.4f %9.4f %6d'
+                         % (label, noise, stats['x_bias'][level],
+                            stats['y_bias'][level], stats['center_rms'][level],
+                            stats['diameter_bias'][level],
+                            stats['diameter_scatter'][level],
+                            stats['time'][level], stats['failures'][level]))
+    return '\n'.join(lines)
+
+def _nan_mean(array):
+    """Mean along the trials ignoring failed trials (NaN if all failed)"""
+    valid = ~np.isnan(array)
+    count = valid.sum(axis=1)
+    total = np.where(valid, array, 0.0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / count
+
+def _nan_std(array):
+    mean = _nan_mean(array)
+    return np.sqrt(_nan_mean((array - mean[:, np.newaxis])**2))
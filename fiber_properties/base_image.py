@@ -4,13 +4,15 @@ characterization on the EXtreme PREcision Spectrograph
 from ast import literal_eval
 from collections import Iterable
 from datetime import datetime
+import os
 import numpy as np
-from PIL import Image
-from astropy.io import fits
-from .input_output import save_image_object, save_image, save_data, load_image_object
+from .input_output import (save_image_object, save_image, save_data,
+                           load_image_object, load_columnar_image)
 from .numpy_array_handler import mesh_grid_from_array
 from .plotting import show_image
 from .containers import convert_pixels_to_units, convert_microns_to_units
+from .instrumentation import timed, count_event, record_array
+from .shared_arrays import SharedArray
 
 class BaseImage(object):
     """Base class for any image.
@@ -114,7 +116,7 @@ class BaseImage(object):
         image_input : str, array_like, or None
             See class definition for details
         """
-        self.convert_image_to_array(image_input, True)
+        self.convert_image_to_array(image_input, set_attributes=True)
 
         if self.magnification is None:
             if self.camera == 'nf' or self.camera == 'in':
@@ -132,19 +134,27 @@ class BaseImage(object):
         self.save_image()
         self.save_data()
 
-    def save_object(self, file_name=None):
-        """Pickle the entire BaseImage object.
+    def save_object(self, file_name=None, include_image=False):
+        """Save the entire BaseImage object.
+
+        Args
+        ----
+        file_name : {None, string}, optional
+            .pkl to pickle the object, or .npz/.h5 to store every attribute
+            as a separate array. See input_output.save_image_object()
+        include_image : bool, optional
+            whether to store the corrected image in a .npz/.h5 file
 
         Saves
         -----
         self: BaseImage
-            the entire object as .pkl
+            the entire object as .pkl, .npz, or .h5
         """
         if file_name is None and self.object_file is None:
             self.object_file = self.folder + self.get_camera() + '_object.pkl'
         elif file_name is not None:
             self.object_file = file_name
-        save_image_object(self, self.object_file)
+        save_image_object(self, self.object_file, include_image)
 
     def save_image(self, file_name=None):
         """Save the corrected image as FITS
@@ -286,9 +296,11 @@ class BaseImage(object):
 
         Args
         ----
-        image_input : {None, 1D iterable, 2D iterable, string}
+        image_input : {None, 1D iterable, 2D iterable, string, SharedArray}
             Inputting None simply returns None. Inputting a string of a file name
-            returns the image contained within that file. Inputting an iterable
+            returns the image contained within that file (or the image of a
+            saved .pkl, .npz, or .h5 object). Inputting a SharedArray returns
+            the shared image without copying it. Inputting an iterable
             containing strings returns all of the images in those files co-added
             together. Inputting a 2D iterable returns a 2D numpy.ndarray of the
             input iterable. Inputting a 1D iterable containing 2D iterables returns
@@ -310,6 +322,14 @@ class BaseImage(object):
         if image_input is None:
             pass
 
+        # Image input was published by a SharedArrayRegistry (read-only)
+        elif isinstance(image_input, SharedArray):
+            image = image_input.attach()
+            if set_attributes:
+                for attribute, value in image_input.info.items():
+                    setattr(self, attribute, value)
+                self.num_images = image_input.info.get('num_images', 1)
+
         # Image input is a single file name
         elif isinstance(image_input, basestring):
             if image_input.endswith('.pkl') or image_input.endswith('.p'):
@@ -317,6 +337,16 @@ class BaseImage(object):
                 for attribute in vars(old_im_obj):
                     setattr(self, attribute, getattr(old_im_obj, attribute))
                 image = self.get_image()
+            elif (image_input.endswith('.npz') or image_input.endswith('.h5')
+                  or image_input.endswith('.hdf5')):
+                if set_attributes:
+                    old_im_obj = load_image_object(image_input)
+                    for attribute in vars(old_im_obj):
+                        setattr(self, attribute, getattr(old_im_obj, attribute))
+                    image = self.get_image()
+                else:
+                    # Only reached through image_file, so the image is stored
+                    image = load_columnar_image(image_input)
             else:
                 image = self.image_from_file(image_input, set_attributes)
             if set_attributes:
@@ -356,6 +386,7 @@ class BaseImage(object):
                 self.height, self.width = image.shape
         return image
 
+    @timed('read_file')
     def image_from_file(self, image_string, set_attributes=False):
         """Returns image from file as 2D np.ndarray
 
@@ -376,12 +407,14 @@ class BaseImage(object):
 
         """
         if image_string[-3:] == 'fit':
+            from astropy.io import fits
             raw_image = fits.open(image_string, ignore_missing_end=True)[0]
             image = raw_image.data.astype('float64')
             if set_attributes:
                 header = dict(raw_image.header)
 
         elif image_string[-3:] == 'tif':
+            from PIL import Image
             raw_image = Image.open(image_string)
             image = np.array(raw_image).astype('float64')
             if set_attributes:
@@ -391,6 +424,8 @@ class BaseImage(object):
 
         else:
             raise ValueError('Incorrect image file extension')
+        count_event('bytes_read', os.path.getsize(image_string))
+        record_array(image)
 
         if set_attributes:
             self.folder = '/'.join(image_string.split('/')[:-1]) + '/'
@@ -0,0 +1,660 @@
+"""batch.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+This module contains a batch runner for analyses described by a JSON job
+manifest instead of a hard coded script. The manifest lists the tests,
+cameras, image and calibration files, and the centering and metric
+settings. Every (test, camera) becomes a chain of tasks
+
+    calibrate -> center -> metrics -> aggregate (per test)
+
+which are scheduled on a process pool within the resource hints of each
+task. Results are written to a ResultsIndex. Finished tasks are recorded in
+a journal so that an interrupted batch resumes where it stopped, and tasks
+are only redone if their settings (or those of a task they depend on)
+changed
+
+Usage
+-----
+python -m fiber_properties.batch manifest.json
+python -m fiber_properties.batch manifest.json --processes 4 --dry-run
+
+Manifest
+--------
+{
+  "folder": "../data/scrambling/2016-08-05 Prototype Core Extension 1/",
+  "results": "results.db",
+  "processes": 3,
+  "memory": 4000,
+  "cameras": ["in", "nf", "ff"],
+  "images": "{camera}_*.fit",
+  "calibration": {"dark": "../Dark/{camera}_*.fit",
+                  "ambient": "../Ambient/{camera}_*.fit"},
+  "parameters": {"threshold": 1000, "kernel_size": 9},
+  "center": {"in": {"method": "edge"},
+             "nf": {"method": "radius", "radius_range": 64,
+                    "center_range": 64},
+             "ff": {"method": "gaussian"}},
+  "metrics": {"centroid": {"method": "full"},
+              "modal_noise": {"methods": ["filter", "fft"], "threads": 2},
+              "frd": {}},
+  "resources": {"calibrate": {"memory": 1000}},
+  "tests": [{"name": "Shift_00", "folder": "Shift_00/"},
+            {"name": "Shift_01", "folder": "Shift_01/",
+             "metrics": {"centroid": {}}}],
+  "scrambling_gain": [{"name": "shifts", "tests": ["Shift_00", "Shift_01"],
+                       "input_camera": "in", "output_camera": "nf"}]
+}
+
+Every key except "tests" and "scrambling_gain" can be overridden by a test.
+"center" and "metrics" may be given per camera (keyed by camera) or once
+for every camera. File patterns are relative to the test folder and
+{camera} is replaced by the camera name
+"""
+from collections import OrderedDict
+from glob import glob
+from multiprocessing import Pool
+from multiprocessing.queues import SimpleQueue
+from timeit import default_timer
+import argparse
+import hashlib
+import json
+import os
+import Queue
+import sys
+import traceback
+from .containers import BatchInfo
+from .input_output import load_image_object
+from .shared_arrays import (SharedArrayRegistry, publish_array,
+                            find_shared_array, use_shared_inputs,
+                            use_shared_image, restore_image_object,
+                            _process_exists)
+
+#=============================================================================#
+#===== Manifest ==============================================================#
+#=============================================================================#
+
+def load_manifest(manifest_file):
+    """Reads a JSON job manifest
+
+    Relative folders and files in the manifest are relative to the manifest
+
+    Returns
+    -------
+    manifest : dict
+    """
+    with open(manifest_file) as input_file:
+        manifest = json.load(input_file)
+    base = os.path.dirname(os.path.abspath(manifest_file))
+    manifest['folder'] = os.path.join(base, manifest.get('folder', ''))
+    for key in ['results', 'journal']:
+        if key in manifest:
+            manifest[key] = os.path.join(base, manifest[key])
+    if 'journal' not in manifest:
+        manifest['journal'] = os.path.splitext(os.path.abspath(manifest_file))[0] + '_journal.json'
+    return manifest
+
+def test_settings(manifest, test):
+    """Returns the settings of a test: the manifest overridden by the test"""
+    settings = dict((key, value) for key, value in manifest.items()
+                    if key not in ['tests', 'scrambling_gain'])
+    settings.update(test)
+    settings['folder'] = os.path.normpath(os.path.join(
+        manifest.get('folder', ''), test.get('folder', '')))
+    if 'name' not in settings:
+        raise RuntimeError('Every test in the manifest needs a name')
+    return settings
+
+def _camera_setting(setting, camera):
+    """Returns the part of a center or metrics setting for camera"""
+    if setting is None:
+        return None
+    if any(key in setting for key in ['in', 'nf', 'ff']):
+        return setting.get(camera)
+    return setting
+
+def _find_files(folder, pattern, camera, exclude=()):
+    """Returns the sorted files matching a pattern or list of file names
+
+    Files in exclude (the outputs of the batch, which a pattern such as
+    "{camera}_*.fit" also matches) are left out of the matches
+    """
+    if pattern is None:
+        return None
+    if isinstance(pattern, basestring):
+        pattern = pattern.format(camera=camera)
+        pattern = os.path.normpath(os.path.join(folder, pattern))
+        files = sorted(name for name in glob(pattern) if name not in exclude)
+        if not files:
+            raise RuntimeError('No files match ' + pattern)
+        return files
+    return [os.path.normpath(os.path.join(folder, name.format(camera=camera)))
+            for name in pattern]
+
+#=============================================================================#
+#===== Task Graph ============================================================#
+#=============================================================================#
+
+class BatchTask(object):
+    """A single task of a batch
+
+    Args
+    ----
+    name : str
+        unique name (e.g. 'center:Shift_00/nf')
+    stage : str
+        key of the function in STAGES
+    spec : dict
+        JSON compatible arguments of the stage function
+    dependencies : list(str)
+        names of the tasks that must finish first
+    resources : dict
+        'memory' (MB) and 'threads' used by the task, and 'local' to run it
+        in the scheduling process (e.g. to write the results index)
+
+    Attributes
+    ----------
+    key : str
+        hash of the stage, spec, and dependency keys. A finished task is
+        redone if its key changes
+    """
+    def __init__(self, name, stage, spec, dependencies=(), resources=None):
+        self.name = name
+        self.stage = stage
+        self.spec = spec
+        self.dependencies = list(dependencies)
+        self.resources = dict(DEFAULT_RESOURCES.get(stage, {}))
+        if resources is not None:
+            self.resources.update(resources)
+        self.key = None
+
+    def __repr__(self):
+        return 'BatchTask(%s)' % self.name
+
+def build_tasks(manifest):
+    """Builds the task graph of a manifest
+
+    Returns
+    -------
+    tasks : OrderedDict
+        name -> BatchTask, each after the tasks it depends on
+    """
+    tasks = OrderedDict()
+    def add(task):
+        task.key = _task_key(task, tasks)
+        tasks[task.name] = task
+
+    # Files written by earlier runs must not become inputs of this one
+    outputs = set()
+    for test in manifest['tests']:
+        settings = test_settings(manifest, test)
+        for camera in settings.get('cameras', ['nf']):
+            outputs.update(_output_files(settings['folder'], camera))
+
+    for test in manifest['tests']:
+        settings = test_settings(manifest, test)
+        name = settings['name']
+        folder = settings['folder']
+        resources = settings.get('resources', {})
+        parameters = settings.get('parameters', {})
+        metric_tasks = []
+        objects = {}
+        for camera in settings.get('cameras', ['nf']):
+            label = name + '/' + camera
+            object_file, image_file = _output_files(folder, camera)
+            objects[camera] = object_file
+            calibration = dict((kind, _find_files(folder, pattern, camera,
+                                                  outputs))
+                               for kind, pattern
+                               in settings.get('calibration', {}).items())
+            add(BatchTask('calibrate:' + label, 'calibrate',
+                          {'images': _find_files(folder, settings['images'],
+                                                 camera, outputs),
+                           'calibration': calibration, 'camera': camera,
+                           'parameters': parameters,
+                           'object_file': object_file,
+                           'image_file': image_file},
+                          resources=resources.get('calibrate')))
+
+            center = _camera_setting(settings.get('center'), camera)
+            previous = 'calibrate:' + label
+            if center is not None:
+                add(BatchTask('center:' + label, 'center',
+                              {'object_file': object_file, 'center': center},
+                              [previous], resources.get('center')))
+                previous = 'center:' + label
+
+            metrics = _camera_setting(settings.get('metrics'), camera)
+            if metrics:
+                metric_resources = dict(resources.get('metrics', {}))
+                threads = metrics.get('modal_noise', {}).get('threads', 1)
+                metric_resources.setdefault('threads', threads)
+                add(BatchTask('metrics:' + label, 'metrics',
+                              {'object_file': object_file, 'metrics': metrics},
+                              [previous], metric_resources))
+                previous = 'metrics:' + label
+            metric_tasks.append(previous)
+
+        add(BatchTask('aggregate:' + name, 'aggregate',
+                      {'test': name, 'objects': objects,
+                       'parameters': parameters,
+                       'results': settings.get('results', 'results.db')},
+                      metric_tasks, resources.get('aggregate')))
+
+    for group in manifest.get('scrambling_gain', []):
+        input_camera = group.get('input_camera', 'in')
+        output_camera = group.get('output_camera', 'nf')
+        dependencies = ['aggregate:' + test for test in group['tests']]
+        missing = [name for name in dependencies if name not in tasks]
+        if missing:
+            raise RuntimeError('Scrambling gain tests not in the manifest: '
+                               + ', '.join(missing))
+        add(BatchTask('scrambling_gain:' + group['name'], 'scrambling_gain',
+                      {'name': group['name'],
+                       'in_objs': [tasks[name].spec['objects'][input_camera]
+                                   for name in dependencies],
+                       'out_objs': [tasks[name].spec['objects'][output_camera]
+                                    for name in dependencies],
+                       'input_method': group.get('input_method'),
+                       'output_method': group.get('output_method'),
+                       'camera': output_camera,
+                       'results': manifest.get('results', 'results.db')},
+                      dependencies, manifest.get('resources', {})
+                      .get('scrambling_gain')))
+    return tasks
+
+def _output_files(folder, camera):
+    """Returns the object and corrected image files of a test camera"""
+    return (os.path.join(folder, camera + '_object.pkl'),
+            os.path.join(folder, camera + '_corrected.fit'))
+
+def _task_key(task, tasks):
+    key = json.dumps([task.stage, task.spec,
+                      [tasks[name].key for name in task.dependencies]],
+                     sort_keys=True)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+#=============================================================================#
+#===== Stages ================================================================#
+#=============================================================================#
+
+# Each stage is called with the task spec and, when running on a pool, a
+# dict with the SharedArrayRegistry directory and the shared master
+# calibration frames (or None)
+
+def calibrate_stage(spec, shared=None):
+    """Corrects the images and saves the object and corrected image
+
+    The corrected image is also published for the later tasks
+    """
+    from .fiber_image import FiberImage
+    calibration = spec['calibration']
+    image_obj = FiberImage(spec['images'], dark=calibration.get('dark'),
+                           ambient=calibration.get('ambient'),
+                           flat=calibration.get('flat'),
+                           camera=spec['camera'], **spec['parameters'])
+    if shared is not None:
+        use_shared_inputs(image_obj, **shared.get('calibration', {}))
+    image = image_obj._get_image()
+    restore_image_object(image_obj)
+    image_obj.save_image(spec['image_file'])
+    image_obj.save_object(spec['object_file'])
+    if shared is not None:
+        publish_array(image, shared['directory'],
+                      _shared_name(spec['object_file']))
+
+def center_stage(spec, shared=None):
+    """Finds the fiber center (and diameter) with the given method"""
+    image_obj = _load_stage_object(spec['object_file'], shared)
+    kwargs = dict(spec['center'])
+    image_obj.set_fiber_center(kwargs.pop('method', 'edge'), **kwargs)
+    restore_image_object(image_obj)
+    image_obj.save_object(spec['object_file'])
+
+def metrics_stage(spec, shared=None):
+    """Calculates the centroid, modal noise, and FRD"""
+    image_obj = _load_stage_object(spec['object_file'], shared)
+    metrics = spec['metrics']
+    if 'centroid' in metrics:
+        image_obj.set_fiber_centroid(**metrics['centroid'])
+    if 'modal_noise' in metrics:
+        kwargs = dict(metrics['modal_noise'])
+        methods = kwargs.pop('methods', None)
+        image_obj.set_modal_noise(methods, **kwargs)
+    if 'frd' in metrics:
+        image_obj.set_frd_info(**metrics['frd'])
+    restore_image_object(image_obj)
+    image_obj.save_object(spec['object_file'])
+
+def aggregate_stage(spec, shared=None):
+    """Records every result of a test in the results index"""
+    from .results_index import ResultsIndex
+    with ResultsIndex(spec['results']) as index:
+        for camera in sorted(spec['objects']):
+            image_obj = load_image_object(spec['objects'][camera])
+            index.record_image(image_obj, test=spec['test'],
+                               parameters=spec['parameters'])
+
+def scrambling_gain_stage(spec, shared=None):
+    """Calculates and records the scrambling gain of a group of tests"""
+    from .scrambling_gain import scrambling_gain
+    from .results_index import ResultsIndex
+    info = scrambling_gain(spec['in_objs'], spec['out_objs'],
+                           spec['input_method'], spec['output_method'])
+    with ResultsIndex(spec['results']) as index:
+        index.record_scrambling_gain(info, spec['name'], spec['camera'],
+                                     source=spec['in_objs'] + spec['out_objs'])
+
+def _load_stage_object(object_file, shared):
+    """Loads a saved object, using its published corrected image if any"""
+    image_obj = load_image_object(object_file)
+    if shared is not None:
+        image = find_shared_array(shared['directory'], _shared_name(object_file))
+        if image is not None:
+            use_shared_image(image_obj, image)
+    return image_obj
+
+def _shared_name(object_file):
+    return 'image_' + hashlib.sha1(os.path.abspath(object_file)).hexdigest()
+
+STAGES = {'calibrate': calibrate_stage,
+          'center': center_stage,
+          'metrics': metrics_stage,
+          'aggregate': aggregate_stage,
+          'scrambling_gain': scrambling_gain_stage}
+
+# Writing the results index is kept in the scheduling process
+DEFAULT_RESOURCES = {'calibrate': {'memory': 500},
+                     'center': {'memory': 200},
+                     'metrics': {'memory': 300},
+                     'aggregate': {'local': True},
+                     'scrambling_gain': {'local': True}}
+
+#=============================================================================#
+#===== Journal ===============================================================#
+#=============================================================================#
+
+class BatchJournal(object):
+    """Append-only record of the finished tasks of a batch
+
+    Each line is a JSON object with the task name and key, so a crash can
+    at most lose the task that was being written
+
+    Args
+    ----
+    journal_file : str
+    """
+    def __init__(self, journal_file):
+        self.journal_file = journal_file
+
+    def finished(self):
+        """Returns a dict of task name -> key of every finished task"""
+        finished = {}
+        if not os.path.exists(self.journal_file):
+            return finished
+        with open(self.journal_file) as input_file:
+            for line in input_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue # Partially written line
+                finished[entry['task']] = entry['key']
+        return finished
+
+    def record(self, task, elapsed):
+        with open(self.journal_file, 'a') as output_file:
+            output_file.write(json.dumps({'task': task.name, 'key': task.key,
+                                          'time': elapsed}) + '\n')
+            output_file.flush()
+            os.fsync(output_file.fileno())
+
+    def clear(self):
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+
+#=============================================================================#
+#===== Scheduling ============================================================#
+#=============================================================================#
+
+def run_batch(manifest, processes=None, memory=None, restart=False,
+              dry_run=False):
+    """Runs every unfinished task of a manifest
+
+    Args
+    ----
+    manifest : str or dict
+        manifest file or a manifest loaded with load_manifest()
+    processes : int, optional
+        number of worker processes (and the number of threads the running
+        tasks may use). Overrides the manifest. With 1, tasks run in this
+        process
+    memory : number (MB), optional
+        memory the running tasks may use according to their hints.
+        Overrides the manifest. Unlimited if None
+    restart : bool, optional
+        whether to redo the tasks finished by earlier runs
+    dry_run : bool, optional
+        only return which tasks would run
+
+    Returns
+    -------
+    info : BatchInfo
+    """
+    if isinstance(manifest, basestring):
+        manifest = load_manifest(manifest)
+    tasks = build_tasks(manifest)
+    journal = BatchJournal(manifest.get('journal', 'batch_journal.json'))
+    if restart and not dry_run:
+        journal.clear()
+    finished = {} if restart else journal.finished()
+    if processes is None:
+        processes = manifest.get('processes', 1)
+    if memory is None:
+        memory = manifest.get('memory')
+
+    info = BatchInfo()
+    pending = OrderedDict()
+    for name, task in tasks.items():
+        if finished.get(name) == task.key:
+            info.skipped.append(name)
+        else:
+            pending[name] = task
+    if dry_run:
+        info.pending = list(pending)
+        return info
+
+    if processes <= 1:
+        _schedule(pending, None, processes, memory, journal, info, {})
+        return info
+
+    # The workers attach the master calibration frames and the corrected
+    # images from shared memory instead of each reading them again
+    registry = SharedArrayRegistry()
+    started = SimpleQueue()
+    pool = Pool(processes, initializer=_init_worker, initargs=(started,))
+    try:
+        shared = _share_inputs(pending, registry)
+        _schedule(pending, pool, processes, memory, journal, info, shared,
+                  started)
+    finally:
+        # Every result has arrived, but join() after close() would wait
+        # for lost tasks forever
+        pool.terminate()
+        pool.join()
+        registry.close()
+    return info
+
+def _share_inputs(pending, registry):
+    """Publishes the calibration frames of the pending calibrate tasks
+
+    Returns
+    -------
+    shared : dict
+        task name -> runtime argument of the stage (not part of the key)
+    """
+    shared = {}
+    for name, task in pending.items():
+        if task.stage == 'calibrate':
+            calibration = {}
+            for kind, files in task.spec['calibration'].items():
+                if files:
+                    calibration[kind] = registry.publish_image_input(files)
+            shared[name] = {'directory': registry.directory,
+                            'calibration': calibration}
+        elif task.stage in ['center', 'metrics']:
+            shared[name] = {'directory': registry.directory}
+    return shared
+
+def _schedule(pending, pool, processes, memory, journal, info, shared,
+              started=None):
+    """Dispatches ready tasks while their resource hints fit"""
+    done = Queue.Queue()
+    running = {}
+    results = {}
+    workers = {}
+    blocked = set()
+    while pending or running:
+        for name, task in pending.items():
+            if any(dependency in pending or dependency in running
+                   or dependency in blocked for dependency in task.dependencies):
+                if any(dependency in blocked for dependency in task.dependencies):
+                    blocked.add(name)
+                    info.failed[name] = 'dependency failed'
+                    del pending[name]
+                continue
+            if running and not _fits(task, running.values(), processes, memory):
+                continue
+            del pending[name]
+            if pool is None or task.resources.get('local'):
+                done.put(_run_task((task.name, task.stage, task.spec,
+                                    shared.get(name))))
+                running[name] = task
+            else:
+                running[name] = task
+                results[name] = pool.apply_async(
+                    _run_task, [(task.name, task.stage, task.spec,
+                                 shared.get(name))], callback=done.put)
+        if not running:
+            continue
+
+        # Queue.get without a timeout cannot be interrupted in python 2, and
+        # the pool never calls back for tasks that failed to pickle or whose
+        # worker died, so those are looked for while waiting
+        try:
+            name, error, elapsed = done.get(True, _POLL_TIME)
+        except Queue.Empty:
+            for lost in _lost_tasks(results, workers, started):
+                done.put(lost)
+            continue
+        if name not in running:
+            continue
+        task = running.pop(name)
+        results.pop(name, None)
+        workers.pop(name, None)
+        if error is None:
+            journal.record(task, elapsed)
+            info.finished.append(name)
+            info.times[name] = elapsed
+        else:
+            blocked.add(name)
+            info.failed[name] = error
+
+def _fits(task, running, processes, memory):
+    threads = sum(other.resources.get('threads', 1) for other in running
+                  if not other.resources.get('local'))
+    if threads + task.resources.get('threads', 1) > processes:
+        return False
+    if memory is not None:
+        used = sum(other.resources.get('memory', 0) for other in running)
+        if used + task.resources.get('memory', 0) > memory:
+            return False
+    return True
+
+def _lost_tasks(results, workers, started):
+    """Returns (name, error, 0.0) of the pool tasks that will never call back
+
+    Args
+    ----
+    results : dict
+        task name -> AsyncResult of the running pool tasks
+    workers : dict
+        task name -> pid of the worker running it, updated from started
+    started : multiprocessing.queues.SimpleQueue
+        (name, pid) put by the workers when they start a task
+    """
+    while started is not None and not started.empty():
+        name, pid = started.get()
+        workers[name] = pid
+
+    lost = []
+    for name, result in results.items():
+        if result.ready():
+            if not result.successful():
+                try:
+                    result.get(0)
+                except Exception:
+                    lost.append((name, traceback.format_exc(), 0.0))
+        elif name in workers and not _process_exists(workers[name]):
+            lost.append((name, 'worker process %d died' % workers[name], 0.0))
+    return lost
+
+def _init_worker(started=None):
+    global _STARTED
+    _STARTED = started
+    from .plotting import set_headless
+    try:
+        set_headless()
+    except RuntimeError:
+        pass
+
+def _run_task(task_args):
+    """Runs a stage and returns (name, traceback or None, seconds)"""
+    name, stage, spec, shared = task_args
+    if _STARTED is not None:
+        _STARTED.put((name, os.getpid()))
+    start = default_timer()
+    try:
+        STAGES[stage](spec, shared)
+    except Exception:
+        return name, traceback.format_exc(), default_timer() - start
+    return name, None, default_timer() - start
+
+# Seconds between looking for lost tasks
+_POLL_TIME = 1.0
+# Queue the pool workers report the tasks they start to
+_STARTED = None
+
+def print_batch_info(info):
+    for name in info.finished:
+        print '%-40s %9.2f s' % (name, info.times[name])
+    print '%d finished, %d already done, %d failed' % (len(info.finished),
+                                                       len(info.skipped),
+                                                       len(info.failed))
+    for name, error in info.failed.items():
+        print 'FAILED ' + name
+        print error
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the analyses of a '
+                                     'fiber_properties job manifest')
+    parser.add_argument('manifest')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--memory', type=float, default=None,
+                        help='MB the running tasks may use')
+    parser.add_argument('--restart', action='store_true',
+                        help='redo tasks finished by earlier runs')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='list the tasks that would run')
+    args = parser.parse_args(argv)
+
+    info = run_batch(args.manifest, args.processes, args.memory,
+                     args.restart, args.dry_run)
+    if args.dry_run:
+        for name in info.pending:
+            print name
+        return 0
+    print_batch_info(info)
+    return int(bool(info.failed))
+
+if __name__ == '__main__':
+    sys.exit(main())
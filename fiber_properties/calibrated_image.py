@@ -4,6 +4,7 @@ characterization on the EXtreme PREcision Spectrograph
 import numpy as np
 from .base_image import BaseImage
 from .numpy_array_handler import filter_image, subframe_image
+from .instrumentation import timed, record_array
 
 class CalibratedImage(BaseImage):
     """Fiber face image analysis class
@@ -199,6 +200,7 @@ class CalibratedImage(BaseImage):
     #==== Image Calibration Algorithm ========================================#
     #=========================================================================#
 
+    @timed('error_corrections')
     def execute_error_corrections(self, image):
         """Applies corrective images to image
 
@@ -252,6 +254,7 @@ class CalibratedImage(BaseImage):
         corrected_image *= (corrected_image > -1000.0).astype('float64')
 
         self.new_calibration = False
+        record_array(corrected_image)
         return corrected_image
 
     def remove_dark_image(self, image, dark_image=None):
@@ -35,6 +35,7 @@ class FiberInfo(object):
             self.circle = Pixel()
             self.gaussian = Pixel()
             self.rectangle = Pixel()
+            self.polygon = Pixel()
             self.full = Pixel()
         elif info == 'value':
             self.edge = None
@@ -42,6 +43,7 @@ class FiberInfo(object):
             self.circle = None
             self.gaussian = None
             self.rectangle = None
+            self.polygon = None
             self.full = None
 
 class RectangleInfo(object):
@@ -51,6 +53,188 @@ class RectangleInfo(object):
         self.width = None
         self.angle = None
 
+class PolygonInfo(object):
+    """Container for information about a regular polygon"""
+    def __init__(self):
+        self.sides = None
+        self.radius = None
+        self.angle = None
+
+class MomentsInfo(object):
+    """Container for the moments of an image
+
+    Attributes
+    ----------
+    total : float
+        zeroth moment (sum of the weighted intensities)
+    x : float
+        centroid x (first moment / total)
+    y : float
+        centroid y (first moment / total)
+    xx : float
+        second central moment along x
+    yy : float
+        second central moment along y
+    xy : float
+        second central cross moment
+    x_err : float
+        standard deviation of the centroid x from the variance map
+    y_err : float
+        standard deviation of the centroid y from the variance map
+    """
+    def __init__(self):
+        self.total = None
+        self.x = None
+        self.y = None
+        self.xx = None
+        self.yy = None
+        self.xy = None
+        self.x_err = None
+        self.y_err = None
+
+class IntensityStats(object):
+    """Container for the statistics of the intensities inside a mask
+
+    Every attribute is a float, or a 1D numpy.ndarray with one value per
+    frame when the statistics were calculated for a stack of frames
+
+    Attributes
+    ----------
+    count : int
+        number of intensities
+    sum : float
+        sum of the intensities
+    sum_sq : float
+        sum of the squared deviations from the mean
+    mean : float
+    std : float
+    min : float
+    max : float
+    entropy : float
+        Sum( -p_i * log10(p_i) ) where p_i = I_i / Sum( I_i )
+    gini : float
+        Gini coefficient of the intensities (None unless requested)
+    """
+    def __init__(self):
+        self.count = None
+        self.sum = None
+        self.sum_sq = None
+        self.mean = None
+        self.std = None
+        self.min = None
+        self.max = None
+        self.entropy = None
+        self.gini = None
+
+class AnnularInfo(object):
+    """Container for the intensity statistics of concentric rings
+
+    Every per-ring attribute has one row per frame when the statistics were
+    calculated for a stack of frames
+
+    Attributes
+    ----------
+    radius : 1D numpy.ndarray
+        outer radius of each ring
+    count : 1D numpy.ndarray
+        number of pixels in each ring
+    mean : numpy.ndarray
+    std : numpy.ndarray
+    contrast : numpy.ndarray
+        std / mean of each ring
+    encircled_energy : numpy.ndarray
+        fraction of the total intensity inside the outer edge of each ring
+    """
+    def __init__(self):
+        self.radius = None
+        self.count = None
+        self.mean = None
+        self.std = None
+        self.contrast = None
+        self.encircled_energy = None
+
+class StageInfo(object):
+    """Container for the timing of an instrumented stage
+
+    Attributes
+    ----------
+    calls : int
+        Number of times the stage ran
+    total_time : float
+        Wall time (seconds) of every call, including nested stages
+    max_time : float
+        Wall time (seconds) of the longest call
+    """
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+class ProfileInfo(object):
+    """Container for the instrumentation of an image object (or of all)
+
+    Attributes
+    ----------
+    stages : dict
+        stage name -> StageInfo
+    counters : dict
+        counter name -> int (e.g. 'circle_objective', 'bytes_read')
+    peak_bytes : int
+        Size of the largest array allocated by the instrumented hot paths
+        (reading, error corrections, filtering, FFTs, and fits)
+    """
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.peak_bytes = 0
+
+class AccuracyInfo(object):
+    """Container for the results of a centering accuracy test
+
+    Attributes
+    ----------
+    methods : list(str)
+        Labels of the tested methods
+    noise_levels : list(float)
+        Read noise of each set of trials
+    x_error, y_error, diameter_error : dict
+        method label -> 2D numpy.ndarray (noise level, trial) of the
+        measured - true values (pixels). NaN if the method failed
+    time : dict
+        method label -> 2D numpy.ndarray (noise level, trial) of the
+        run times (seconds)
+    """
+    def __init__(self):
+        self.methods = []
+        self.noise_levels = []
+        self.x_error = {}
+        self.y_error = {}
+        self.diameter_error = {}
+        self.time = {}
+
+class BatchInfo(object):
+    """Container for the outcome of a batch run
+
+    Attributes
+    ----------
+    finished : list(str)
+        Tasks run to completion, in the order they finished
+    skipped : list(str)
+        Tasks already finished by an earlier run
+    failed : dict
+        task name -> traceback, or 'dependency failed'
+    times : dict
+        task name -> run time (seconds) of the finished tasks
+    pending : list(str)
+        Tasks that would run (only set for a dry run)
+    """
+    def __init__(self):
+        self.finished = []
+        self.skipped = []
+        self.failed = {}
+        self.times = {}
+        self.pending = []
+
 class Pixel(object):
     """Container for the x and y position of a pixel."""
     def __init__(self, x=None, y=None, units='pixels',
@@ -199,6 +383,56 @@ class ScramblingInfo(object):
         self.in_d = []
         self.out_d = []
 
+class TrackingInfo(object):
+    """Container for fiber tracking information over a series of frames
+
+    Attributes
+    ----------
+    center_x : list(float)
+        List of the fiber center x positions
+    center_y : list(float)
+        List of the fiber center y positions
+    diameter : list(float)
+        List of the fiber diameters
+    centroid_x : list(float)
+        List of the fiber centroid x positions
+    centroid_y : list(float)
+        List of the fiber centroid y positions
+    search_range : list(float)
+        Search window (pixels) each frame's solution was accepted with
+    objective : list(float)
+        Value of the centering objective for each frame (array sum for the
+        radius and circle methods, None for the gaussian method)
+    """
+    def __init__(self):
+        self.center_x = []
+        self.center_y = []
+        self.diameter = []
+        self.centroid_x = []
+        self.centroid_y = []
+        self.search_range = []
+        self.objective = []
+
+class RegistrationInfo(object):
+    """Container for image registration information
+
+    Attributes
+    ----------
+    x_shift : list(float)
+        List of the x translations of each image relative to the reference
+    y_shift : list(float)
+        List of the y translations of each image relative to the reference
+    correlation : list(float)
+        List of the normalized phase correlation peak heights
+    time : list(datetime.datetime)
+        List of the times each image was taken (if known)
+    """
+    def __init__(self):
+        self.x_shift = []
+        self.y_shift = []
+        self.correlation = []
+        self.time = []
+
 class ModalNoiseInfo(object):
     """Container for modal noise information
 
@@ -212,6 +446,8 @@ class ModalNoiseInfo(object):
     gini : float
     entropy : float
     fft : FFTInfo
+    multiscale : numpy.ndarray
+        contrast of each octave band, finest first
     """
     def __init__(self):
         self.tophat = None
@@ -222,6 +458,7 @@ class ModalNoiseInfo(object):
         self.gini = None
         self.entropy = None
         self.fft = None
+        self.multiscale = None
 
 class FFTInfo(object):
     """Container for fast fourier transform information
@@ -1,18 +1,59 @@
 """fiber_image.py was written by Ryan Petersburg for use with fiber
 characterization on the EXtreme PREcision Spectrograph
 """
+from copy import copy
 import numpy as np
 from .numpy_array_handler import (sum_array, crop_image, remove_circle,
-                                  isolate_circle, circle_array, polynomial_fit,
-                                  gaussian_fit, rectangle_array,
+                                  circle_array, polynomial_fit,
+                                  gaussian_fit, rectangle_array, rectangle_fit,
+                                  polygon_fit,
                                   mesh_grid_from_array, intensity_array,
-                                  isolate_rectangle)
+                                  polygon_sides, circumscribed_radius,
+                                  aperture_sum, polygon_array, image_moments,
+                                  filter_image, annular_statistics)
 from .plotting import (plot_cross_sections, plot_overlaid_cross_sections,
                        plot_dot, show_plots, plot_image)
 from .containers import (FiberInfo, Edges, FRDInfo, ModalNoiseInfo,
-                         convert_microns_to_units, Pixel)
+                         RectangleInfo, PolygonInfo, convert_microns_to_units,
+                         Pixel)
 from .calibrated_image import CalibratedImage
-from .modal_noise import modal_noise
+from .modal_noise import modal_noise_methods, contrast_map
+from .memoize import memoized
+from .result_graph import ResultGraph
+from .instrumentation import stage_timer, timed, count_event, get_profile
+
+# Inputs and results of a FiberImage with the nodes each directly depends on
+_RESULT_DEPENDENCIES = [
+    ('image_input', []),
+    ('calibration', []),
+    ('kernel_size', []),
+    ('threshold', []),
+    ('magnification', []),
+    ('image', ['image_input', 'calibration']),
+    ('filtered_image', ['image', 'kernel_size']),
+    ('center.edge', ['filtered_image', 'threshold']),
+    ('center.circle', ['filtered_image', 'center.edge']),
+    ('center.radius', ['filtered_image', 'threshold', 'center.edge']),
+    ('center.rectangle', ['filtered_image', 'center.edge']),
+    ('center.polygon', ['filtered_image', 'center.edge']),
+    ('center.gaussian', ['image', 'center.edge', 'center.circle',
+                         'center.radius']),
+    ('centroid.full', ['image', 'filtered_image', 'threshold']),
+    ('centroid.edge', ['image', 'center.edge']),
+    ('centroid.circle', ['image', 'center.circle']),
+    ('centroid.radius', ['image', 'center.radius']),
+    ('centroid.rectangle', ['image', 'center.rectangle']),
+    ('centroid.polygon', ['image', 'center.polygon']),
+    ('centroid.gaussian', ['image', 'center.gaussian']),
+    ('modal_noise', ['image', 'center.edge', 'center.circle',
+                     'center.radius', 'center.rectangle', 'center.polygon',
+                     'center.gaussian']),
+    ('modal_noise.fft', ['image', 'center.edge', 'center.circle',
+                         'center.radius', 'center.rectangle',
+                         'center.polygon', 'center.gaussian',
+                         'magnification']),
+    ('frd', ['image', 'centroid.full', 'magnification']),
+]
 
 #=============================================================================#
 #===== FiberImage Class ======================================================#
@@ -40,10 +81,18 @@ class FiberImage(CalibratedImage):
         Container for the calculated centers of the fiber
     _centroid : FiberInfo
         Container for the calculated centroids of the fiber
+    _centroid_error : FiberInfo
+        Container for the centroid uncertainties (if a variance map was
+        given when centroiding)
     _diameter : FiberInfo
         Container for the calculated diameters of the fiber
     _array_sum : FiberInfo
         Container for the array sums used in the 'circle' methods
+    _rectangle : RectangleInfo
+        Container for the size and angle found by the 'rectangle' method
+    _polygon : PolygonInfo
+        Container for the sides, radius, and angle found by the 'polygon'
+        method
 
     _gaussian_amp : float
         Amplitude of the gaussian fit function
@@ -53,6 +102,11 @@ class FiberImage(CalibratedImage):
     _phi : float
         Golden ratio for the optimization tests
 
+    _graph : ResultGraph
+        Tracks which results are up to date. Changing an input (e.g. with
+        set_dark() or set_magnification()) clears exactly the results that
+        depend on it. See get_result_graph()
+
     Args
     ----
     image_input : str, array_like, or None
@@ -76,8 +130,11 @@ class FiberImage(CalibratedImage):
         self._edges = Edges()
         self._center = FiberInfo('pixel')
         self._centroid = FiberInfo('pixel')
+        self._centroid_error = FiberInfo('pixel')
         self._diameter = FiberInfo('value')
         self._array_sum = FiberInfo('value')
+        self._rectangle = RectangleInfo()
+        self._polygon = PolygonInfo()
 
         self._frd_info = FRDInfo()
         self._frd_info.input_fnum = input_fnum
@@ -90,8 +147,301 @@ class FiberImage(CalibratedImage):
         self._gaussian_amp = 0.0
         self._gaussian_offset = 0.0
 
+        self._graph = ResultGraph(_RESULT_DEPENDENCIES)
+
         super(FiberImage, self).__init__(image_input, **kwargs)
 
+    #=========================================================================#
+    #==== Result Dependencies ================================================#
+    #=========================================================================#
+
+    def get_result_graph(self):
+        """Return the ResultGraph of this object's inputs and results
+
+        Use get_result_graph().status() or describe() to see which results
+        are up to date
+        """
+        # Objects saved before the graph existed start with a new one, in
+        # which the results they hold are up to date
+        if getattr(self, '_graph', None) is None:
+            self._graph = ResultGraph(_RESULT_DEPENDENCIES)
+            for node in self._graph.nodes():
+                if self._has_result(node):
+                    self._graph.mark_computed(node)
+        return self._graph
+
+    def __setstate__(self, state):
+        # Objects saved before kernel_size and threshold were properties
+        for name in ['kernel_size', 'threshold']:
+            if name in state:
+                state['_' + name] = state.pop(name)
+        self.__dict__.update(state)
+        # Objects saved before the 'polygon' method existed
+        if not hasattr(self, '_polygon'):
+            self._polygon = PolygonInfo()
+            for info in [self._center, self._centroid, self._centroid_error]:
+                info.polygon = Pixel()
+            for info in [self._diameter, self._array_sum]:
+                info.polygon = None
+
+    def get_profile(self):
+        """Return the stage times and counters recorded for this object
+
+        Instrumentation must be enabled first. See
+        instrumentation.enable_instrumentation()
+
+        Returns
+        -------
+        profile : ProfileInfo
+        """
+        return get_profile(self)
+
+    def invalidate(self, node):
+        """Clear the result at node and every result that depends on it
+
+        Args
+        ----
+        node : str
+            input or result name. See get_result_graph().nodes()
+
+        Returns
+        -------
+        cleared : list(str)
+            the nodes that were cleared
+        """
+        cleared = self.get_result_graph().invalidate(node)
+        for other in cleared:
+            self._clear_result(other)
+        return cleared
+
+    def _invalidate_dependents(self, node):
+        """Clears every result downstream of a node that is being recalculated"""
+        graph = self.get_result_graph()
+        if graph.is_computed(node):
+            for other in graph.invalidate(node, include_node=False):
+                self._clear_result(other)
+
+    def _clear_result(self, node):
+        """Resets the stored values of a result node"""
+        kind, _, method = node.partition('.')
+        if kind == 'center':
+            setattr(self._center, method, Pixel())
+            setattr(self._diameter, method, None)
+            setattr(self._array_sum, method, None)
+            if method == 'edge':
+                self._edges = Edges()
+            elif method == 'rectangle':
+                self._rectangle = RectangleInfo()
+            elif method == 'polygon':
+                self._polygon = PolygonInfo()
+            elif method == 'gaussian':
+                self._gaussian_amp = 0.0
+                self._gaussian_offset = 0.0
+        elif kind == 'centroid':
+            setattr(self._centroid, method, Pixel())
+            setattr(self._centroid_error, method, Pixel())
+        elif node == 'modal_noise':
+            fft_info = self._modal_noise_info.fft
+            self._modal_noise_info = ModalNoiseInfo()
+            self._modal_noise_info.fft = fft_info
+        elif node == 'modal_noise.fft':
+            self._modal_noise_info.fft = None
+        elif node == 'frd':
+            self._frd_info.encircled_energy_fnum = []
+            self._frd_info.encircled_energy = []
+            self._frd_info.energy_loss = []
+
+    def _has_result(self, node):
+        """Whether a result node holds stored values"""
+        kind, _, method = node.partition('.')
+        if kind in ['center', 'centroid']:
+            # Older objects may not have a container for newer methods
+            pixel = getattr(getattr(self, '_' + kind), method, None)
+            return pixel is not None and pixel.as_tuple()[0] is not None
+        elif node == 'modal_noise':
+            return any(value is not None for name, value
+                       in vars(self._modal_noise_info).items()
+                       if name != 'fft')
+        elif node == 'modal_noise.fft':
+            return self._modal_noise_info.fft is not None
+        elif node == 'frd':
+            return bool(self._frd_info.encircled_energy)
+        return False
+
+    def _result_state(self, node):
+        """Returns a dict of the stored values of a result node
+
+        Returns None for inputs and for the cached images, which have no
+        stored values. See _restore_result()
+        """
+        kind, _, method = node.partition('.')
+        if kind == 'center':
+            state = {'center': getattr(self._center, method),
+                     'diameter': getattr(self._diameter, method),
+                     'array_sum': getattr(self._array_sum, method)}
+            if method == 'edge':
+                state['edges'] = self._edges
+            elif method == 'rectangle':
+                state['rectangle'] = self._rectangle
+            elif method == 'polygon':
+                state['polygon'] = self._polygon
+            elif method == 'gaussian':
+                state['gaussian_amp'] = self._gaussian_amp
+                state['gaussian_offset'] = self._gaussian_offset
+            return state
+        elif kind == 'centroid':
+            return {'centroid': getattr(self._centroid, method),
+                    'centroid_error': getattr(self._centroid_error, method)}
+        elif node == 'modal_noise':
+            return dict((name, value) for name, value
+                        in vars(self._modal_noise_info).items()
+                        if name != 'fft')
+        elif node == 'modal_noise.fft':
+            return {'fft': self._modal_noise_info.fft}
+        elif node == 'frd':
+            return {'frd_info': self._frd_info}
+        return None
+
+    def _restore_result(self, node, state):
+        """Sets the stored values of a result node from _result_state()"""
+        kind, _, method = node.partition('.')
+        if kind == 'center':
+            setattr(self._center, method, state['center'])
+            setattr(self._diameter, method, state['diameter'])
+            setattr(self._array_sum, method, state['array_sum'])
+            if method == 'edge':
+                self._edges = state['edges']
+            elif method == 'rectangle':
+                self._rectangle = state['rectangle']
+            elif method == 'polygon':
+                self._polygon = state['polygon']
+            elif method == 'gaussian':
+                self._gaussian_amp = state['gaussian_amp']
+                self._gaussian_offset = state['gaussian_offset']
+        elif kind == 'centroid':
+            setattr(self._centroid, method, state['centroid'])
+            setattr(self._centroid_error, method, state['centroid_error'])
+        elif node == 'modal_noise':
+            for name, value in state.items():
+                setattr(self._modal_noise_info, name, value)
+        elif node == 'modal_noise.fft':
+            self._modal_noise_info.fft = state['fft']
+        elif node == 'frd':
+            self._frd_info = state['frd_info']
+        self.get_result_graph().mark_computed(node)
+
+    #=========================================================================#
+    #==== Input Setters ======================================================#
+    #=========================================================================#
+
+    def set_dark(self, dark):
+        """Sets the dark calibration image and clears every result"""
+        super(FiberImage, self).set_dark(dark)
+        self.invalidate('calibration')
+
+    def set_ambient(self, ambient):
+        """Sets the ambient calibration image and clears every result"""
+        super(FiberImage, self).set_ambient(ambient)
+        self.invalidate('calibration')
+
+    def set_flat(self, flat):
+        """Sets the flat calibration images and clears every result"""
+        super(FiberImage, self).set_flat(flat)
+        self.invalidate('calibration')
+
+    def set_magnification(self, value):
+        """Sets the magnification and clears the FRD and FFT results"""
+        super(FiberImage, self).set_magnification(value)
+        self.invalidate('magnification')
+
+    def set_threshold(self, threshold):
+        """Sets the centering threshold and clears the results using it"""
+        self._threshold = threshold
+        self.invalidate('threshold')
+
+    def set_kernel_size(self, kernel_size):
+        """Sets the filter kernel size and clears the results using it"""
+        self._kernel_size = kernel_size
+        self.invalidate('kernel_size')
+
+    # Assigning threshold or kernel_size directly also clears the results
+    # using them, but only if the value changed
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    @threshold.setter
+    def threshold(self, threshold):
+        old = getattr(self, '_threshold', None)
+        self._threshold = threshold
+        if old is not None and threshold != old:
+            self.invalidate('threshold')
+
+    @property
+    def kernel_size(self):
+        return self._kernel_size
+
+    @kernel_size.setter
+    def kernel_size(self, kernel_size):
+        old = getattr(self, '_kernel_size', None)
+        self._kernel_size = kernel_size
+        if old is not None and kernel_size != old:
+            self.invalidate('kernel_size')
+
+    #=========================================================================#
+    #==== Primary Image Getters ==============================================#
+    #=========================================================================#
+
+    def get_image(self):
+        """Return the corrected image
+
+        The corrections are only executed once until the image input or
+        calibration changes. See CalibratedImage.get_image()
+
+        Returns
+        -------
+        image : 2D numpy array
+            Copy of the image corrected by calibration images
+        """
+        image = self._get_image()
+        if image is None:
+            return None
+        return image.copy()
+
+    def get_filtered_image(self, kernel_size=None, **kwargs):
+        """Return an error corrected and median filtered image
+
+        The image filtered with self.kernel_size is only calculated once
+        until an upstream input changes. See
+        CalibratedImage.get_filtered_image()
+
+        Returns
+        -------
+        filtered_image : 2D numpy array
+        """
+        if (kernel_size is not None and kernel_size != self.kernel_size) or kwargs:
+            return super(FiberImage, self).get_filtered_image(kernel_size,
+                                                              **kwargs)
+        image = self._get_filtered_image()
+        if image is None:
+            return None
+        return image.copy()
+
+    def _get_image(self):
+        """Returns the shared, read-only corrected image"""
+        return self.get_result_graph().get_array(
+            'image', super(FiberImage, self).get_image)
+
+    def _get_filtered_image(self):
+        """Returns the shared, read-only filtered image"""
+        def calculate():
+            image = self._get_image()
+            if image is None:
+                return None
+            return filter_image(image, self.kernel_size)
+        return self.get_result_graph().get_array('filtered_image', calculate)
+
     #=========================================================================#
     #==== Fiber Data Getters =================================================#
     #=========================================================================#
@@ -101,7 +451,8 @@ class FiberImage(CalibratedImage):
 
         Args
         ----
-        method : {None, 'radius', 'gaussian', 'circle', 'edge'}, optional
+        method : {None, 'radius', 'gaussian', 'circle', 'edge',
+                  'rectangle', 'polygon'}, optional
             The method which is used to calculate the fiber center. If None,
             return the best calculated fiber center in the order 'radius' >
             'gaussian' > 'circle' > 'edge'
@@ -137,7 +488,8 @@ class FiberImage(CalibratedImage):
 
         Args
         ----
-        method : None or str {'radius', 'gaussian', 'circle', 'edge'}, optional
+        method : None or str {'radius', 'gaussian', 'circle', 'edge',
+                                'rectangle', 'polygon'}, optional
             The method which is used to calculate the fiber center. If None,
             return the best calculated fiber center in the order 'radius' >
             'gaussian' > 'circle' > 'edge'
@@ -160,6 +512,7 @@ class FiberImage(CalibratedImage):
         """
         return self.get_fiber_diameter(method, units=units, **kwargs) / 2.0
 
+    @memoized
     def get_fiber_diameter(self, method=None, units='pixels', **kwargs):
         """Return the fiber diameter using the given method in the given units
 
@@ -168,7 +521,8 @@ class FiberImage(CalibratedImage):
 
         Args
         ----
-        method : {None, 'radius', 'gaussian', 'circle', 'edge'}, optional
+        method : {None, 'radius', 'gaussian', 'circle', 'edge',
+                  'rectangle', 'polygon'}, optional
             The method which is used to calculate the fiber center. If None,
             return the best calculated fiber center in the order 'radius' >
             'gaussian' > 'circle' > 'edge'
@@ -209,6 +563,7 @@ class FiberImage(CalibratedImage):
 
         return self.convert_pixels_to_units(diameter, units)
 
+    @memoized
     def get_fiber_center(self, method=None, units='pixels', **kwargs):
         """Return the fiber center using the given method in the given units
 
@@ -217,7 +572,8 @@ class FiberImage(CalibratedImage):
 
         Args
         ----
-        method : {None, 'radius', 'gaussian', 'circle', 'edge'}, optional
+        method : {None, 'radius', 'gaussian', 'circle', 'edge',
+                  'rectangle', 'polygon'}, optional
             The method which is used to calculate the fiber center. If None,
             return the best calculated fiber center in the order 'radius' >
             'gaussian' > 'circle' > 'edge'
@@ -260,6 +616,7 @@ class FiberImage(CalibratedImage):
         center = getattr(self._center, method)
         return self.convert_pixels_to_units(center, units)
 
+    @memoized
     def get_fiber_centroid(self, method=None, units='pixels', **kwargs):
         """Getter for the fiber centroid
 
@@ -312,33 +669,120 @@ class FiberImage(CalibratedImage):
     #==== Image Fitting Getters ==============================================#
     #=========================================================================#
 
-    def get_rectangle_fit(self):
-        """Return the best rectangle fit for the image"""
-        if self._center.circle.x is None:
-            self.set_fiber_center(method='circle')
+    def get_rectangle_fit(self, **kwargs):
+        """Return the best rectangle fit for the image
+
+        Returns
+        -------
+        rectangle_fit : 2D numpy.ndarray
+            Anti-aliased rectangle of amplitude 1.0 found by the 'rectangle'
+            centering method
+        """
+        if self._center.rectangle.x is None:
+            self.set_fiber_center(method='rectangle', **kwargs)
         rectangle_fit = rectangle_array(self.get_mesh_grid(),
-                                        corners = [self._edges.left,
-                                                   self._edges.bottom,
-                                                   self._edges.right,
-                                                   self._edges.top])
+                                        self._center.rectangle.x,
+                                        self._center.rectangle.y,
+                                        self._rectangle.width,
+                                        self._rectangle.height,
+                                        self._rectangle.angle)
         return rectangle_fit
 
-    def get_gaussian_fit(self, full_output=False, radius_factor=1.0):
+    def get_fiber_rectangle(self, units='pixels', **kwargs):
+        """Return the width, height, and angle of the fitted rectangle
+
+        Args
+        ----
+        units : {'pixels', 'microns'}, optional
+            The units of the returned width and height
+
+        Returns
+        -------
+        width : float
+            in the given units
+        height : float
+            in the given units
+        angle : float
+            in degrees
+        """
+        if self._rectangle.width is None:
+            self.set_fiber_center(method='rectangle', **kwargs)
+        return (self.convert_pixels_to_units(self._rectangle.width, units),
+                self.convert_pixels_to_units(self._rectangle.height, units),
+                self._rectangle.angle)
+
+    def get_polygon_fit(self, **kwargs):
+        """Return the best regular polygon fit for the image
+
+        Returns
+        -------
+        polygon_fit : 2D numpy.ndarray
+            Polygon of amplitude 1.0 found by the 'polygon' centering method
+        """
+        if self._center.polygon.x is None:
+            self.set_fiber_center(method='polygon', **kwargs)
+        polygon_fit = polygon_array(self.get_mesh_grid(),
+                                    self._center.polygon.x,
+                                    self._center.polygon.y,
+                                    self._polygon.radius,
+                                    self._polygon.sides,
+                                    self._polygon.angle)
+        return polygon_fit
+
+    def get_fiber_polygon(self, units='pixels', **kwargs):
+        """Return the sides, circumradius, and angle of the fitted polygon
+
+        Args
+        ----
+        units : {'pixels', 'microns'}, optional
+            The units of the returned radius
+
+        Returns
+        -------
+        sides : int
+        radius : float
+            circumradius in the given units
+        angle : float
+            in degrees. See numpy_array_handler.polygon_array()
+        """
+        if self._polygon.radius is None:
+            self.set_fiber_center(method='polygon', **kwargs)
+        return (self._polygon.sides,
+                self.convert_pixels_to_units(self._polygon.radius, units),
+                self._polygon.angle)
+
+    def get_gaussian_fit(self, full_output=False, radius_factor=1.0,
+                         initial_guess=None):
         """Return the best gaussian fit for the image
 
+        Args
+        ----
+        full_output : bool, optional
+            whether or not to include the fit coefficients in the output
+        radius_factor : number, optional
+            fraction of the radius inside which the gaussian is fit
+        initial_guess : tuple, optional
+            (x0, y0, radius, amplitude, offset) used to seed the fit and
+            select the fitted region instead of the best fiber center
+
         Returns
         -------
         _fit.gaussian : 2D numpy.ndarray
         """
-        image = self.get_image()
-        center = self.get_fiber_center()
-        radius = self.get_fiber_radius() * radius_factor
-        if self.camera == 'in':
-            initial_guess = (center.x, center.y, 100 / self.get_pixel_size(),
-                             image.max(), image.min())
+        image = self._get_image()
+        if initial_guess is not None:
+            center = Pixel(initial_guess[0], initial_guess[1])
+            radius = abs(initial_guess[2]) * radius_factor
         else:
-            initial_guess = (center.x, center.y, radius,
-                             image.max(), image.min())
+            center = self.get_fiber_center()
+            radius = self.get_fiber_radius() * radius_factor
+            if self.camera == 'in':
+                initial_guess = (center.x, center.y,
+                                 100 / self.get_pixel_size(),
+                                 image.max(), image.min())
+            else:
+                initial_guess = (center.x, center.y, radius,
+                                 image.max(), image.min())
 
         gauss_fit, coeffs = gaussian_fit(image, initial_guess=initial_guess,
                                          full_output=True, center=center,
@@ -360,7 +804,7 @@ class FiberImage(CalibratedImage):
         -------
         poly_fit : 2D numpy.ndarray
         """
-        image = self.get_image()
+        image = self._get_image()
         center = self.get_fiber_center(method=fiber_method, **kwargs)
         radius = self.get_fiber_radius() * radius_factor
         poly_fit = polynomial_fit(image, deg, center, radius)
@@ -375,7 +819,7 @@ class FiberImage(CalibratedImage):
             Circle array centered at best calculated center and with best
             calculated diameter
         """
-        image = self.get_image()
+        image = self._get_image()
         center = self.get_fiber_center()
         radius = self.get_fiber_radius()
         tophat_fit = circle_array(self.get_mesh_grid(), center.x, center.y,
@@ -395,6 +839,7 @@ class FiberImage(CalibratedImage):
         """Return the focal ratio of the FCS output side."""
         return self._frd_info.output_fnum
 
+    @memoized
     def get_frd_info(self, new=False, **kwargs):
         """Return the FRDInfo object and sets it where appropriate.
 
@@ -414,7 +859,9 @@ class FiberImage(CalibratedImage):
             self.set_frd_info(**kwargs)
         return self._frd_info
 
-    def set_frd_info(self, f_lim=(2.3, 6.0), res=0.1, fnum_diameter=0.95):
+    @timed('frd')
+    def set_frd_info(self, f_lim=(2.3, 6.0), res=0.1, fnum_diameter=0.95,
+                     fiber_shape='circle', fiber_angle=0.0):
         """Calculate the encircled energy for various focal ratios
 
         Args
@@ -427,6 +874,12 @@ class FiberImage(CalibratedImage):
         fnum_diameter : float
             the fraction of the total encircled energy at which the output
             focal ratio is set
+        fiber_shape : str or int, optional
+            shape of the aperture inside which the energy is summed. For a
+            polygon, the focal ratio sets the inscribed radius. See
+            numpy_array_handler.polygon_sides()
+        fiber_angle : number (degrees), optional
+            rotation of a polygonal aperture
 
         Sets
         ----
@@ -447,13 +900,11 @@ class FiberImage(CalibratedImage):
         energy_loss = None
         output_fnum = None
         encircled_energy = []
-        image = self.get_image()
+        image = self._get_image()
         for fnum in fnums:
             radius = self.convert_fnum_to_radius(fnum, units='pixels')
-            isolated_circle = isolate_circle(image,
-                                             center,
-                                             radius)
-            iso_circ_sum = sum_array(isolated_circle)
+            iso_circ_sum = aperture_sum(image, center, radius,
+                                        fiber_shape, fiber_angle)
             encircled_energy.append(iso_circ_sum)
             if abs(fnum - self._frd_info.input_fnum) < res / 2.0:
                 energy_loss = 100 * (1 - iso_circ_sum / encircled_energy[0])
@@ -464,80 +915,263 @@ class FiberImage(CalibratedImage):
         self._frd_info.energy_loss = energy_loss
         self._frd_info.encircled_energy_fnum = fnums
         self._frd_info.encircled_energy = list(np.array(encircled_energy) / encircled_energy[0])
+        self.get_result_graph().mark_computed('frd')
 
     #=========================================================================#
     #==== Modal Noise Methods ================================================#
     #=========================================================================#
 
+    @memoized
     def get_modal_noise(self, method='fft', new=False, **kwargs):
         if (not hasattr(self._modal_noise_info, method) 
             or getattr(self._modal_noise_info, method) is None) or new:
             self.set_modal_noise(method, **kwargs)
         return getattr(self._modal_noise_info, method)
 
-    def set_modal_noise(self, method=None, **kwargs):
+    def set_modal_noise(self, method=None, threads=1, **kwargs):
+        """Sets the modal noise using the given method or all methods
+
+        When several methods are run they share a single ModalNoiseSession,
+        so the image, fiber data, crops, and masks are only calculated once
+
+        Args
+        ----
+        method : str or list(str), optional
+            modal noise method or methods (see modal_noise.modal_noise()).
+            If None, uses every method relevant to the camera
+        threads : int, optional
+            number of methods evaluated concurrently
+        **kwargs :
+            The keyworded arguments to pass to the modal noise methods
+        """
         if method is None:
             if self.camera == 'nf':
                 method1 = 'tophat'
             elif self.camera == 'ff':
                 method1 = 'gaussian'
             methods = [method1, 'polynomial', 'contrast', 'filter', 'gradient', 'fft']
-        else:
+        elif isinstance(method, basestring):
             methods = [method]
+        else:
+            methods = list(method)
 
+        with stage_timer('modal_noise', self):
+            results = modal_noise_methods(self, methods, threads, **kwargs)
         for method in methods:
-            setattr(self._modal_noise_info, method,
-                    modal_noise(self, method, **kwargs))            
+            self._store_modal_noise(method, results[method])
+
+    def _store_modal_noise(self, method, value):
+        """Stores a modal noise result (also used by modal_noise_fft_batch)"""
+        setattr(self._modal_noise_info, method, value)
+        if method == 'fft':
+            self.get_result_graph().mark_computed('modal_noise.fft')
+        else:
+            self.get_result_graph().mark_computed('modal_noise')
+
+    def get_contrast_map(self, window=31, step=1, **kwargs):
+        """Return a map of the local speckle contrast across the fiber face
+
+        Args
+        ----
+        window : int (odd), optional
+            side length of the sliding window (pixels)
+        step : int, optional
+            spacing of the returned pixels (1 for full resolution)
+        **kwargs :
+            The keyworded arguments to pass to modal_noise.contrast_map()
+
+        Returns
+        -------
+        contrast_map : 2D numpy.ndarray
+            local STDEV / MEAN, NaN outside the fiber face
+        corner : Pixel
+            image pixel of contrast_map[0, 0]
+        """
+        return contrast_map(self, window, step, **kwargs)
+
+    @memoized
+    def get_annular_statistics(self, bin_width=1.0, radius_factor=1.0,
+                               fiber_method=None, fiber_shape='circle',
+                               fiber_angle=0.0, units='pixels', **kwargs):
+        """Return the intensity statistics of rings around the fiber center
+
+        Near field rings show how the modal noise changes from the core
+        center to the edge. Far field rings give the azimuthally averaged
+        profile and encircled energy
+
+        Args
+        ----
+        bin_width : number (pixels), optional
+            radial width of each ring
+        radius_factor : number, optional
+            outer radius of the last ring as a fraction of the fiber radius
+        fiber_method : str, optional
+            method to use when calculating center and radius of fiber face
+        fiber_shape : str or int, optional
+            shape of the rings. See numpy_array_handler.polygon_sides()
+        fiber_angle : number (degrees), optional
+            rotation of polygonal rings
+        units : {'pixels', 'microns'}, optional
+            units of the ring radii
+
+        Returns
+        -------
+        info : AnnularInfo
+            See containers.py for specifics
+        """
+        center = self.get_fiber_center(method=fiber_method, units='pixels',
+                                       **kwargs)
+        radius = self.get_fiber_radius(method=fiber_method, units='pixels',
+                                       **kwargs)
+        info = annular_statistics(self._get_image(), center,
+                                  radius * radius_factor, bin_width,
+                                  fiber_shape, fiber_angle)
+        info.radius = info.radius * self.convert_pixels_to_units(1.0, units)
+        return info
 
     #=========================================================================#
     #==== Image Centroiding ==================================================#
     #=========================================================================#
 
+    @timed('centroid')
     def set_fiber_centroid(self, method='full', radius_factor=1.0,
-                           show_image=False, fiber_shape='circle', **kwargs):
+                           show_image=False, fiber_shape='circle',
+                           fiber_angle=0.0, variance=None, **kwargs):
         """Find the centroid of the fiber face image
 
+        The moments are calculated in a single pass over only the region
+        around the fiber face (or the thresholded image for the 'full'
+        method). See numpy_array_handler.image_moments()
+
         Args
         ----
-        method : {'full', 'edge', 'radius', 'gaussian', 'circle'}, optional
+        method : {'full', 'edge', 'radius', 'gaussian', 'circle', 'rectangle',
+                  'polygon'}, optional
             If 'full', takes the centroid of the entire image. Otherwise, uses
-            the specified method to isolate only the fiber face in the image
+            the specified method to isolate only the fiber face in the image.
+            The 'rectangle' and 'polygon' methods always isolate the fitted
+            shape
         radius_factor : number, optional
             The factor by which the radius is multiplied when isolating the
             fiber face in the image
         show_image : bool, optional
             Shows centroid dot on fiber image
-        fiber_shape : {'circle', 'rectangle'}, optional
+        fiber_shape : {'circle', 'rectangle', 'octagon', ...} or int, optional
             The shape of the fiber core cross-section. Used to decide which
-            points to use when calculating the centroid.
+            points to use when calculating the centroid. Regular polygons
+            (see numpy_array_handler.polygon_sides) use the fiber radius as
+            their inscribed radius
+        fiber_angle : number (degrees), optional
+            Rotation of a polygonal fiber core. See
+            numpy_array_handler.polygon_array()
+        variance : 2D numpy.ndarray, optional
+            Variance map of the corrected image. If given, the centroid
+            uncertainty is also calculated
 
         Sets
         ----
         _centroid.method : Pixel
             The centroid of the image in the context of the given method
+        _centroid_error.method : Pixel
+            The centroid uncertainty if variance is given
         """
-        image = self.get_image()
+        self._invalidate_dependents('centroid.' + method)
+        image = self._get_image()
         if method == 'full':
-            image_iso = image * (self.get_filtered_image() > self.threshold).astype('float64')
+            roi = None
+            weights = self._get_filtered_image() > self.threshold
         else:
+            if method == 'polygon' and polygon_sides(fiber_shape) is not None:
+                kwargs['fiber_shape'] = fiber_shape
             center = self.get_fiber_center(method=method, **kwargs)
             radius = self.get_fiber_radius(method=method, **kwargs)
-            if 'rect' in fiber_shape:
-                image_iso = isolate_rectangle(image, corners=self._edges)
-            else:
-                image_iso = isolate_circle(image, center,
-                                           radius*radius_factor, res=1)
-
-        x_array, y_array = self.get_mesh_grid()
-        getattr(self._centroid, method).x = ((image_iso * x_array).sum()
-                                             / image_iso.sum())
-        getattr(self._centroid, method).y = ((image_iso * y_array).sum()
-                                             / image_iso.sum())
+            roi, weights = self._get_centroid_weights(image, method, center,
+                                                      radius*radius_factor,
+                                                      fiber_shape,
+                                                      fiber_angle)
+
+        moments = image_moments(image, weights, roi, variance)
+        getattr(self._centroid, method).x = moments.x
+        getattr(self._centroid, method).y = moments.y
+        if variance is not None:
+            getattr(self._centroid_error, method).x = moments.x_err
+            getattr(self._centroid_error, method).y = moments.y_err
+        self.get_result_graph().mark_computed('centroid.' + method)
 
         if show_image:
+            if roi is None:
+                image_iso = image * weights
+            else:
+                top, bottom, left, right = roi
+                image_iso = np.zeros_like(image)
+                image_iso[top:bottom, left:right] = (image[top:bottom, left:right]
+                                                     * weights)
             plot_dot(image_iso, getattr(self._centroid, method))
             show_plots()
 
+    def _get_centroid_weights(self, image, method, center, radius,
+                              fiber_shape='circle', fiber_angle=0.0):
+        """Returns the region around the fiber face and its pixel weights
+
+        Returns
+        -------
+        roi : (int, int, int, int)
+            (top, bottom, left, right) bounds of the region in the image
+        weights : 2D numpy.ndarray
+            Fraction of each region pixel inside the fiber face
+        """
+        if method in ['rectangle', 'polygon']:
+            radius = getattr(self._diameter, method) / 2.0
+        elif isinstance(fiber_shape, basestring) and 'rect' in fiber_shape:
+            corners = np.array([corner.as_tuple() for corner in self._edges],
+                               dtype='float64')
+            center = Pixel(*corners.mean(axis=0))
+            radius = np.sqrt(((corners - center.as_array())**2).sum(axis=1)).max()
+        else:
+            radius = circumscribed_radius(radius, fiber_shape)
+
+        image_crop, new_center = crop_image(image, center, radius)
+        top = int(round(center.y - new_center.y))
+        left = int(round(center.x - new_center.x))
+        roi = (top, top + image_crop.shape[0], left, left + image_crop.shape[1])
+        mesh_grid = mesh_grid_from_array(image_crop)
+
+        if method == 'rectangle':
+            weights = rectangle_array(mesh_grid, new_center.x, new_center.y,
+                                      self._rectangle.width,
+                                      self._rectangle.height,
+                                      self._rectangle.angle)
+        elif method == 'polygon':
+            weights = polygon_array(mesh_grid, new_center.x, new_center.y,
+                                    self._polygon.radius, self._polygon.sides,
+                                    self._polygon.angle)
+        elif isinstance(fiber_shape, basestring) and 'rect' in fiber_shape:
+            weights = rectangle_array(mesh_grid,
+                                      corners=[Pixel(corner.x - left,
+                                                     corner.y - top)
+                                               for corner in self._edges])
+        elif polygon_sides(fiber_shape) is not None:
+            weights = polygon_array(mesh_grid, new_center.x, new_center.y,
+                                    radius, polygon_sides(fiber_shape),
+                                    fiber_angle)
+        else:
+            weights = circle_array(mesh_grid, new_center.x, new_center.y,
+                                   radius, res=1)
+        return roi, weights
+
+    def get_fiber_centroid_error(self, method, units='pixels'):
+        """Return the centroid uncertainty found with a variance map
+
+        See set_fiber_centroid()
+
+        Returns
+        -------
+        _centroid_error.method : Pixel
+            in the given units
+        """
+        return self.convert_pixels_to_units(getattr(self._centroid_error,
+                                                    method), units)
+
     #=========================================================================#
     #==== Image Centering ====================================================#
     #=========================================================================#
@@ -596,7 +1230,8 @@ class FiberImage(CalibratedImage):
 
         Args
         ----
-        method : {'edge', 'radius', 'gaussian', 'circle'}
+        method : {'edge', 'radius', 'gaussian', 'circle', 'rectangle',
+                  'polygon'}
             Uses the respective method to find the fiber center
         show_image : boolean, optional (default=False)
             Whether or not to show relevant fitting image
@@ -608,28 +1243,49 @@ class FiberImage(CalibratedImage):
         RuntimeError
             needs a valid method string to run the proper algorithm
         """
-        # Reset the fits due to new fiber parameters
-        if method == 'radius':
-            self.set_fiber_center_radius_method(**kwargs)
-        elif method == 'edge':
-            self.set_fiber_center_edge_method()
-        elif method == 'circle':
-            self.set_fiber_center_circle_method(**kwargs)
-        elif method == 'gaussian':
-            self.set_fiber_center_gaussian_method()
-        else:
+        if method not in ['radius', 'edge', 'circle', 'gaussian', 'rectangle',
+                          'polygon']:
             raise RuntimeError('Incorrect string for fiber centering method')
+        # Reset the results that used the previous center
+        self._invalidate_dependents('center.' + method)
+
+        with stage_timer('center.' + method, self):
+            if method == 'radius':
+                self.set_fiber_center_radius_method(**kwargs)
+            elif method == 'edge':
+                self.set_fiber_center_edge_method()
+            elif method == 'circle':
+                self.set_fiber_center_circle_method(**kwargs)
+            elif method == 'gaussian':
+                self.set_fiber_center_gaussian_method(**kwargs)
+            elif method == 'rectangle':
+                self.set_fiber_center_rectangle_method(**kwargs)
+            else:
+                self.set_fiber_center_polygon_method(**kwargs)
+        self.get_result_graph().mark_computed('center.' + method)
 
         if show_image:
             center = getattr(self._center, method)
             r = getattr(self._diameter, method) / 2.0
-            image = self.get_filtered_image()
+            image = self._get_filtered_image()
 
             if method == 'gaussian':
                 plot_overlaid_cross_sections(image, self.get_gaussian_fit(),
                                              center)
                 plot_dot(image, center)
                 show_plots()
+            elif method == 'rectangle':
+                plot_overlaid_cross_sections(image, image.max() / 2.0
+                                             * self.get_rectangle_fit(),
+                                             center)
+                plot_dot(image, center)
+                show_plots()
+            elif method == 'polygon':
+                plot_overlaid_cross_sections(image, image.max() / 2.0
+                                             * self.get_polygon_fit(),
+                                             center)
+                plot_dot(image, center)
+                show_plots()
             else:
                 plot_image(remove_circle(image, center, r, res=1))
                 plot_overlaid_cross_sections(image, image.max() / 2.0
@@ -641,7 +1297,7 @@ class FiberImage(CalibratedImage):
                         plot_dot(image, corner)
                 show_plots()
 
-    def set_fiber_center_gaussian_method(self):
+    def set_fiber_center_gaussian_method(self, initial_guess=None, **kwargs):
         """Set fiber center using a Gaussian Fit
 
         Uses Scipy.optimize.curve_fit method to fit fiber image to
@@ -649,6 +1305,12 @@ class FiberImage(CalibratedImage):
         therefore encompassing ~95% of the imaged light. Use previous methods
         of center-finding to approximate the location of the center
 
+        Args
+        ----
+        initial_guess : tuple, optional
+            (x0, y0, radius, amplitude, offset) used instead of previous
+            centering methods to seed the fit (e.g. the previous frame's fit)
+
         Sets
         ----
         _diameter.gaussian : float
@@ -658,7 +1320,8 @@ class FiberImage(CalibratedImage):
         _fit.gaussian : 2D numpy.ndarray
             Best gaussian fit for the fiber image
         """
-        _, coeffs = self.get_gaussian_fit(full_output=True)
+        _, coeffs = self.get_gaussian_fit(full_output=True,
+                                          initial_guess=initial_guess)
 
         self._center.gaussian.x = coeffs[0]
         self._center.gaussian.y = coeffs[1]
@@ -666,7 +1329,112 @@ class FiberImage(CalibratedImage):
         self._gaussian_amp = coeffs[3]
         self._gaussian_offset = coeffs[4]
 
-    def set_fiber_center_radius_method(self, radius_tol=.03, radius_range=None, **kwargs):
+    def set_fiber_center_rectangle_method(self, edge_widths=(8.0, 1.0),
+                                          **kwargs):
+        """Set fiber center using an anti-aliased rectangle fit
+
+        Fits a rectangle of arbitrary size and angle to the filtered image
+        with numpy_array_handler.rectangle_fit(), starting from the fiber
+        edges. Only the region around the edge method's fiber face is fit.
+        Intended for rectangular core fibers
+
+        Args
+        ----
+        edge_widths : sequence of numbers (pixels), optional
+            Ramp widths used for each successive fit. See rectangle_fit()
+
+        Sets
+        ----
+        _diameter.rectangle : float
+            Diagonal of the fitted rectangle (the diameter of the circle
+            that circumscribes the fiber face)
+        _center.rectangle : {'x': float, 'y': float}
+            Center of the fitted rectangle
+        _rectangle : RectangleInfo
+            Width, height, and angle (degrees) of the fitted rectangle
+        """
+        image = self._get_filtered_image()
+        approx_center = self.get_fiber_center(method='edge')
+        approx_width = float(self._edges.right.x - self._edges.left.x)
+        approx_height = float(self._edges.bottom.y - self._edges.top.y)
+
+        crop_radius = np.sqrt(approx_width**2 + approx_height**2) / 2.0 + 10
+        image_crop, crop_center = crop_image(image, approx_center, crop_radius)
+        initial_guess = (crop_center.x, crop_center.y,
+                         approx_width, approx_height, 0.0)
+
+        _, params = rectangle_fit(image_crop, initial_guess=initial_guess,
+                                  full_output=True, edge_widths=edge_widths)
+
+        self._center.rectangle.x = params[0] + approx_center.x - crop_center.x
+        self._center.rectangle.y = params[1] + approx_center.y - crop_center.y
+        self._rectangle.width = params[2]
+        self._rectangle.height = params[3]
+        self._rectangle.angle = params[4]
+        self._diameter.rectangle = np.sqrt(params[2]**2 + params[3]**2)
+
+    def set_fiber_center_polygon_method(self, fiber_shape='octagon',
+                                        fiber_angle=0.0,
+                                        edge_widths=(8.0, 1.0), **kwargs):
+        """Set fiber center using an anti-aliased regular polygon fit
+
+        Fits a regular polygon of arbitrary size and angle to the filtered
+        image with numpy_array_handler.polygon_fit(), starting from the fiber
+        edges. Only the region around the edge method's fiber face is fit.
+        Intended for polygonal (e.g. octagonal) core fibers
+
+        Args
+        ----
+        fiber_shape : str or int, optional
+            Polygon name or number of sides. See
+            numpy_array_handler.polygon_sides()
+        fiber_angle : number (degrees), optional
+            Initial guess for the polygon angle. See
+            numpy_array_handler.polygon_array()
+        edge_widths : sequence of numbers (pixels), optional
+            Ramp widths used for each successive fit. See polygon_fit()
+
+        Sets
+        ----
+        _diameter.polygon : float
+            Diameter of the circle that circumscribes the fitted polygon
+        _center.polygon : {'x': float, 'y': float}
+            Center of the fitted polygon
+        _polygon : PolygonInfo
+            Sides, circumradius, and angle (degrees) of the fitted polygon
+
+        Raises
+        ------
+        ValueError
+            if fiber_shape is not a regular polygon
+        """
+        sides = polygon_sides(fiber_shape)
+        if sides is None or sides < 3:
+            raise ValueError('The polygon method needs a polygonal fiber shape')
+
+        image = self._get_filtered_image()
+        approx_center = self.get_fiber_center(method='edge')
+        approx_diameter = (self._edges.right.x - self._edges.left.x
+                           + self._edges.bottom.y - self._edges.top.y) / 2.0
+        approx_radius = circumscribed_radius(approx_diameter / 2.0, sides)
+
+        image_crop, crop_center = crop_image(image, approx_center,
+                                             approx_radius + 10)
+        initial_guess = (crop_center.x, crop_center.y, approx_radius,
+                         fiber_angle)
+
+        _, params = polygon_fit(image_crop, sides, initial_guess=initial_guess,
+                                full_output=True, edge_widths=edge_widths)
+
+        self._center.polygon.x = params[0] + approx_center.x - crop_center.x
+        self._center.polygon.y = params[1] + approx_center.y - crop_center.y
+        self._polygon.sides = sides
+        self._polygon.radius = params[2]
+        self._polygon.angle = params[3]
+        self._diameter.polygon = 2.0 * params[2]
+
+    def set_fiber_center_radius_method(self, radius_tol=.03, radius_range=None,
+                                       approx_radius=None, **kwargs):
         """Set fiber center using dark circle with varying radius
 
         Uses a golden mean optimization method to find the optimal radius of the
@@ -682,6 +1450,8 @@ class FiberImage(CalibratedImage):
         radius_range: int (in pixels)
             Range of tested radii, i.e. max(radius) - min(radius). If None,
             uses full possible range
+        approx_radius : number (in pixels), optional
+            Center of the tested radius range. If None, uses the edge method
 
         Sets
         ----
@@ -689,18 +1459,20 @@ class FiberImage(CalibratedImage):
             Diameter of the fiber in the radius method context
         _center.radius : {'x': float, 'y': float}
             Center of the fiber in the radius method context
-        _diameter.circle : float
-            Also uses the circle method, therefore changes this value
-        _center.circle : float
-            Also uses the circle method, therefore chnages this value
+
+        The circle method results are used for each tested radius and then
+        restored, so an earlier circle method result is left unchanged
         """
-        image = self.get_filtered_image()
+        image = self._get_filtered_image()
+        circle_result = (copy(self._center.circle), self._diameter.circle,
+                         self._array_sum.circle)
 
         # Initialize range of tested radii
         r = np.zeros(4).astype(float)
 
         if radius_range is not None:
-            approx_radius = self.get_fiber_radius(method='edge')
+            if approx_radius is None:
+                approx_radius = self.get_fiber_radius(method='edge')
             radius_range /= 2.0
 
             r[0] = approx_radius - radius_range
@@ -716,11 +1488,12 @@ class FiberImage(CalibratedImage):
 
         array_sum = np.zeros(2).astype(float)
         for i in xrange(2):
-            self.set_fiber_center(method='circle', radius=r[i+1],
-                                  image=image, **kwargs)
+            self.set_fiber_center_circle_method(radius=r[i+1], image=image,
+                                                **kwargs)
             array_sum[i] = (self._array_sum.circle
                             + self.threshold
                             * np.pi * r[i+1]**2)
+        count_event('radius_objective', 2, self)
 
         min_index = np.argmin(array_sum) # Integer 0 or 1 for min of r[1], r[2]
 
@@ -736,11 +1509,12 @@ class FiberImage(CalibratedImage):
 
             array_sum[1 - min_index] = array_sum[min_index]
 
-            self.set_fiber_center(method='circle', radius=r[min_index+1],
-                                  image=image, **kwargs)
+            self.set_fiber_center_circle_method(radius=r[min_index+1],
+                                                image=image, **kwargs)
             array_sum[min_index] = (self._array_sum.circle
                                     + self.threshold
                                     * np.pi * r[min_index+1]**2)
+            count_event('radius_objective', 1, self)
 
             min_index = np.argmin(array_sum) # Integer 0 or 1 for min of r[1], r[2]
 
@@ -749,8 +1523,12 @@ class FiberImage(CalibratedImage):
         self._center.radius.x = self._center.circle.x
         self._array_sum.radius = np.amin(array_sum)
 
+        (self._center.circle, self._diameter.circle,
+         self._array_sum.circle) = circle_result
+
     def set_fiber_center_circle_method(self, radius=None, center_tol=.03,
-                                       center_range=None, image=None, **kwargs):
+                                       center_range=None, image=None,
+                                       approx_center=None, **kwargs):
         """Finds fiber center using a dark circle of set radius
 
         Uses golden mean method to find the optimal center for a circle
@@ -769,6 +1547,8 @@ class FiberImage(CalibratedImage):
         image : 2d numpy.ndarray, optional
             The image being analyzed. This is only useful for the radius_method.
             Probably not for use outside the class.
+        approx_center : Pixel, optional
+            Center of the tested center range. If None, uses the edge method
 
         Sets
         ----
@@ -785,7 +1565,7 @@ class FiberImage(CalibratedImage):
         """
         res = int(1.0/center_tol)
         if image is None:
-            image = self.get_filtered_image()
+            image = self._get_filtered_image()
         if radius is None:
             radius = self.get_fiber_radius(method='edge')
 
@@ -794,7 +1574,8 @@ class FiberImage(CalibratedImage):
         y = np.zeros(4).astype(float)
 
         if center_range is not None:
-            approx_center = self.get_fiber_center(method='edge')
+            if approx_center is None:
+                approx_center = self.get_fiber_center(method='edge')
             center_range = center_range / 2.0
 
             x[0] = approx_center.x - center_range
@@ -832,6 +1613,7 @@ class FiberImage(CalibratedImage):
                                                      Pixel(x[i+1], y[j+1]),
                                                      radius, res=1)
                 array_sum[j, i] = sum_array(removed_circle_array)
+        count_event('circle_objective', 4, self)
 
         # Find the index of the corner with minimum array_sum
         min_index = np.unravel_index(np.argmin(array_sum), (2, 2)) # Tuple
@@ -870,6 +1652,7 @@ class FiberImage(CalibratedImage):
                                                              Pixel(x[i+1], y[j+1]),
                                                              radius, temp_res)
                         array_sum[j, i] = sum_array(removed_circle_array)
+            count_event('circle_objective', 3, self)
 
             min_index = np.unravel_index(np.argmin(array_sum), (2, 2))
 
@@ -907,7 +1690,7 @@ class FiberImage(CalibratedImage):
         self._edges.bottom : float
         self._diameter.edge : float
         """
-        image = self.get_filtered_image() # To prvent hot pixels
+        image = self._get_filtered_image() # To prvent hot pixels
 
         left = -1
         right = -1
@@ -956,7 +1739,7 @@ class FiberImage(CalibratedImage):
     def plot_cross_sections(self, image=None, row=None, column=None):
         """Plots cross sections across the center of the fiber"""
         if image is None:
-            image = self.get_image()
+            image = self._get_image()
         if row is None:
             row = self.get_fiber_center().y
         if column is None:
@@ -5,12 +5,13 @@ This module contains functions that calculate the focal ratio degradation
 for images taken with the FCS
 """
 import numpy as np
-import scipy.stats as stats
 from .containers import FRDInfo
 from .input_output import load_image_object
 from .fiber_image import FiberImage
+from .shared_arrays import map_image_objects
 
-def frd(in_objs, out_objs, cal_method='edge', save_objs=True, **kwargs):
+def frd(in_objs, out_objs, cal_method='edge', save_objs=True, processes=1,
+        **kwargs):
     """Collects all relevant FRD info from the frd_input
 
     Args
@@ -26,6 +27,10 @@ def frd(in_objs, out_objs, cal_method='edge', save_objs=True, **kwargs):
     save_objs : bool, optional
         If true, the FiberImage objects will be saved after calculations
         are made
+    processes : int, optional
+        number of worker processes. With more than 1, the calibration
+        images are read once and shared with the workers (see
+        shared_arrays.map_image_objects())
     **kwargs : **dict
         Keyword arguments that are passed to FiberImage.get_frd_info
 
@@ -43,33 +48,50 @@ def frd(in_objs, out_objs, cal_method='edge', save_objs=True, **kwargs):
         magnification values
     """
     output = FRDInfo()
+    save = 'object' if save_objs else None
 
-    magn_list = []
-    for out_obj in out_objs:
-        if isinstance(out_obj, basestring):
-            out_obj = FiberImage(out_obj)
-        diameter = out_obj.get_fiber_diameter(method=cal_method,
-                                              units='microns')
-        if save_objs:
-            out_obj.save_object()
-        magn_list.append(diameter / ((4.0 / out_obj.get_output_fnum()) * 25400))
+    if processes > 1:
+        magn_list = map_image_objects(_output_magnification, out_objs,
+                                      (cal_method,), processes, save)
+    else:
+        magn_list = []
+        for out_obj in out_objs:
+            if isinstance(out_obj, basestring):
+                out_obj = FiberImage(out_obj)
+            magn_list.append(_output_magnification(out_obj, cal_method))
+            if save_objs:
+                out_obj.save_object()
 
     magnification = np.mean(magn_list)
     magn_error = 0.0
     if len(magn_list) > 1:
-        magn_error = stats.sem(magn_list)
+        from scipy.stats import sem # slow to import
+        magn_error = sem(magn_list)
 
-    for in_obj in in_objs:
-        if isinstance(in_obj, basestring):
-            in_obj = FiberImage(in_obj)
-        in_obj.set_magnification(magnification)
-
-        temp_output = in_obj.get_frd_info(**kwargs)
-
-        if save_objs:
-            in_obj.save_object()
+    if processes > 1:
+        in_outputs = map_image_objects(_input_frd_info, in_objs,
+                                       (magnification, kwargs), processes,
+                                       save)
+    else:
+        in_outputs = []
+        for in_obj in in_objs:
+            if isinstance(in_obj, basestring):
+                in_obj = FiberImage(in_obj)
+            in_outputs.append(_input_frd_info(in_obj, magnification, kwargs))
+            if save_objs:
+                in_obj.save_object()
 
+    for temp_output in in_outputs:
         for attr in vars(temp_output):
             getattr(output, attr).append(getattr(temp_output, attr))
 
     return output, magnification, magn_list, magn_error
+
+def _output_magnification(out_obj, cal_method):
+    """Returns the far field magnification measured from an output image"""
+    diameter = out_obj.get_fiber_diameter(method=cal_method, units='microns')
+    return diameter / ((4.0 / out_obj.get_output_fnum()) * 25400)
+
+def _input_frd_info(in_obj, magnification, kwargs):
+    in_obj.set_magnification(magnification)
+    return in_obj.get_frd_info(**kwargs)
@@ -2,10 +2,14 @@
 characterization on the EXtreme PREcision Spectrograph
 """
 import os
+import re
+import json
+import importlib
 import cPickle as pickle
 from collections import Iterable
-import matplotlib.pyplot as plt
-from astropy.io import fits
+from datetime import datetime
+import numpy as np
+from .instrumentation import count_event
 
 def image_list(image_name, ext='.fit', num=10):
     """List of images typically created by FCS."""
@@ -20,31 +24,102 @@ def save_image(input_array, save_file):
     if save_file.split('/')[-1] in os.listdir('/'.join(save_file.split('/')[:-1])):
         os.remove(save_file)
     if save_file[-3:] == 'tif':
-        plt.imsave(save_file, input_array, cmap='gray')
+        from .plotting import get_pyplot # plotting imports this module
+        get_pyplot().imsave(save_file, input_array, cmap='gray')
     elif save_file[-3:] == 'fit':
+        from astropy.io import fits
         fits.PrimaryHDU(input_array).writeto(save_file)
     else:
         raise RuntimeError('Please choose either .fit or .tif for file extension')
 
-def save_image_object(image_obj, file_name):
-    """Pickle an ImageAnalysis object to file_name."""
+def save_image_object(image_obj, file_name, include_image=False):
+    """Save an ImageAnalysis object to file_name.
+
+    Objects are pickled for .p and .pkl file names. For .npz, .h5, and .hdf5
+    file names every attribute is stored as a separate array (see
+    save_columnar_object()) so parts of the object can be read on their own
+
+    Args
+    ----
+    image_obj : BaseImage
+    file_name : str
+    include_image : bool, optional
+        whether to store the corrected image with a columnar object
+    """
     create_directory(file_name)
+    if _is_columnar_file(file_name):
+        save_columnar_object(image_obj, file_name, include_image)
+        return
     if file_name[-2:] != '.p' and file_name[-4:] != '.pkl':
-        raise RuntimeError('Please use .p or .pkl for file extension')
-    create_directory(file_name)
+        raise RuntimeError('Please use .p, .pkl, .npz, or .h5 for file extension')
     with open(file_name, 'wb') as output_file:
         pickle.dump(image_obj, output_file, -1)
 
-def load_image_object(object_file, image_file=None):
-    """Load a pickled ImageAnalysis object."""
-    if object_file[-2:] != '.p' and object_file[-4:] != '.pkl':
-        raise RuntimeError('Please use .p or .pkl for file extension')
-    with open(object_file, 'rb') as input_file:
-        image_obj = pickle.load(input_file)
+def load_image_object(object_file, image_file=None, key=None):
+    """Load a pickled or columnar ImageAnalysis object.
+
+    Args
+    ----
+    object_file : str
+    image_file : str, optional
+        FITS file of the corrected image to use with the object
+    key : str, optional
+        attribute path to read from a columnar object instead of the whole
+        object, e.g. '_center' or '_modal_noise_info/fft'. See
+        load_columnar_object()
+    """
+    if key is None:
+        count_event('bytes_read', os.path.getsize(object_file))
+    if _is_columnar_file(object_file):
+        image_obj = load_columnar_object(object_file, key)
+        if key is not None:
+            return image_obj
+    elif object_file[-2:] != '.p' and object_file[-4:] != '.pkl':
+        raise RuntimeError('Please use .p, .pkl, .npz, or .h5 for file extension')
+    else:
+        with open(object_file, 'rb') as input_file:
+            image_obj = pickle.load(input_file)
     if image_file is not None:
         image_obj.set_image_file(image_file)
     return image_obj
 
+def load_object(image_obj):
+    """Returns a FiberImage from an object or a file name
+
+    Saved objects are loaded without reading their image
+    """
+    if not isinstance(image_obj, basestring):
+        return image_obj
+    if image_obj.endswith(OBJECT_EXTENSIONS):
+        return load_image_object(image_obj)
+    from .fiber_image import FiberImage # fiber_image imports this module
+    return FiberImage(image_obj)
+
+# File extensions of saved image objects
+OBJECT_EXTENSIONS = ('.pkl', '.p', '.npz', '.h5', '.hdf5')
+
+def convert_pickled_object(object_file, file_name=None, include_image=False):
+    """Rewrite a pickled ImageAnalysis object in the columnar format.
+
+    Args
+    ----
+    object_file : str
+        .p or .pkl file of the pickled object
+    file_name : str, optional
+        new file name. If None, replaces the pickle extension with .npz
+    include_image : bool, optional
+        whether to store the corrected image as well
+
+    Returns
+    -------
+    file_name : str
+    """
+    if file_name is None:
+        file_name = os.path.splitext(object_file)[0] + '.npz'
+    save_image_object(load_image_object(object_file), file_name,
+                      include_image)
+    return file_name
+
 def create_directory(file_name):
     """Recursively creates directories if they don't exist."""
     if not (file_name.startswith('C:/') or file_name.startswith('/')
@@ -84,3 +159,277 @@ def to_dict(obj):
     elif hasattr(obj, '__dict__'):
         return to_dict(vars(obj))
     return obj
+
+#=============================================================================#
+#===== Columnar Objects ======================================================#
+#=============================================================================#
+
+def save_columnar_object(image_obj, file_name, include_image=False):
+    """Store an object's attributes as separate arrays
+
+    Every attribute (recursively through containers, lists, and dicts) is
+    stored under its '/' separated path, e.g. '_center/edge/_x', along with
+    a JSON schema of the Python type at every path. A '/' or '%' in an
+    attribute name or dict key is stored as '%2F' or '%25'. Dict keys may
+    be strings, ints, floats, or bools and keep their types. Nothing depends on the
+    object's class layout beyond attribute names, and each attribute can be
+    read without reading the rest (see load_columnar_object())
+
+    Args
+    ----
+    image_obj : object
+    file_name : str
+        .npz (uncompressed NumPy archive) or .h5/.hdf5 (requires h5py, with
+        the image stored in chunks)
+    include_image : bool, optional
+        whether to also store image_obj.get_image() under 'image'
+    """
+    columns = {}
+    schema = {}
+    _flatten(image_obj, '', columns, schema)
+    if include_image:
+        columns['image'] = image_obj.get_image()
+        schema['image'] = 'ndarray'
+    columns[_SCHEMA_KEY] = np.array(json.dumps(schema, sort_keys=True))
+
+    if file_name.endswith('.npz'):
+        with open(file_name, 'wb') as output_file:
+            np.savez(output_file, **columns)
+    else:
+        h5py = _import_h5py()
+        with h5py.File(file_name, 'w') as output_file:
+            for path, value in columns.items():
+                if path == 'image':
+                    output_file.create_dataset(path, data=value, chunks=True)
+                else:
+                    output_file.create_dataset(path, data=value)
+
+def load_columnar_object(file_name, key=None):
+    """Read an object (or one of its attributes) stored by
+    save_columnar_object()
+
+    Only the arrays under the requested path are read, so for example the
+    fiber centers can be loaded without reading any pixel data
+
+    Args
+    ----
+    file_name : str
+    key : str, optional
+        '/' separated attribute path (with a '/' in a name escaped as in
+        save_columnar_object()). If None, the whole object is rebuilt
+        without calling its __init__. If the image was stored, the rebuilt
+        object reads its corrected image from file_name
+
+    Returns
+    -------
+    value :
+        the object or the attribute at key
+    """
+    schema = json.loads(_read_columns(file_name, [_SCHEMA_KEY])[_SCHEMA_KEY].item())
+    if key is None:
+        path = ''
+    else:
+        path = key.strip('/')
+        if path not in schema:
+            raise RuntimeError('No attribute ' + path + ' in ' + file_name)
+
+    prefix = path + '/' if path else ''
+    paths = [item for item in schema
+             if item == path or item.startswith(prefix)]
+    columns = _read_columns(file_name, [item for item in paths
+                                        if _is_leaf(schema[item])
+                                        and schema[item] != 'none'
+                                        and item != 'image'])
+    value = _unflatten(path, schema, columns)
+
+    if key is None and 'image' in schema:
+        value.image_file = file_name
+        value.new_calibration = False
+    return value
+
+def load_columnar_image(file_name):
+    """Return the corrected image stored by save_columnar_object()"""
+    return _read_columns(file_name, ['image'])['image']
+
+def _is_columnar_file(file_name):
+    return (file_name.endswith('.npz') or file_name.endswith('.h5')
+            or file_name.endswith('.hdf5'))
+
+def _import_h5py():
+    try:
+        import h5py
+    except ImportError:
+        raise RuntimeError('h5py is required for .h5 files. Please use .npz')
+    return h5py
+
+def _read_columns(file_name, paths):
+    """Returns a dict of only the requested arrays from a columnar file"""
+    if file_name.endswith('.npz'):
+        with np.load(file_name) as input_file:
+            return dict((path, input_file[path]) for path in paths)
+    h5py = _import_h5py()
+    with h5py.File(file_name, 'r') as input_file:
+        return dict((path, input_file[path][()]) for path in paths)
+
+def _flatten(value, path, columns, schema):
+    """Adds the arrays and types of value and its attributes"""
+    if value is None:
+        schema[path] = 'none'
+    elif isinstance(value, (bool, np.bool_)):
+        schema[path] = 'bool'
+        columns[path] = np.array(value)
+    elif isinstance(value, (int, long, np.integer)):
+        schema[path] = 'int'
+        columns[path] = np.array(value)
+    elif isinstance(value, (float, np.floating)):
+        schema[path] = 'float'
+        columns[path] = np.array(value)
+    elif isinstance(value, basestring):
+        schema[path] = 'str'
+        columns[path] = np.array(value)
+    elif isinstance(value, datetime):
+        schema[path] = 'datetime'
+        columns[path] = np.array(value.strftime(_DATETIME_FORMAT))
+    elif isinstance(value, np.ndarray):
+        schema[path] = 'ndarray'
+        columns[path] = value
+    elif isinstance(value, (list, tuple)) and _is_simple_sequence(value):
+        schema[path] = type(value).__name__ + '_array'
+        columns[path] = np.array(value)
+    elif isinstance(value, (list, tuple)):
+        schema[path] = type(value).__name__
+        for index, item in enumerate(value):
+            _flatten(item, _join(path, str(index)), columns, schema)
+    elif isinstance(value, dict):
+        # The names of keys that are not strings are recorded with their
+        # types so that they are restored as the same keys
+        key_types = {}
+        for item_key, item in value.items():
+            name, key_type = _key_name(item_key, path)
+            if name in key_types:
+                raise RuntimeError('Two keys are stored as ' + name + ' at '
+                                   + path)
+            key_types[name] = key_type
+            _flatten(item, _join(path, name), columns, schema)
+        key_types = dict((name, key_type) for name, key_type
+                         in key_types.items() if key_type != 'str')
+        if key_types:
+            schema[path] = 'dict:' + json.dumps(key_types, sort_keys=True)
+        else:
+            schema[path] = 'dict'
+    elif hasattr(value, '__dict__'):
+        schema[path] = value.__class__.__module__ + ':' + value.__class__.__name__
+        if hasattr(value, '__getstate__'):
+            state = value.__getstate__()
+        else:
+            state = vars(value)
+        for attribute, item in state.items():
+            _flatten(item, _join(path, _escape(attribute)), columns, schema)
+    else:
+        raise RuntimeError('Cannot store ' + str(type(value)) + ' at ' + path)
+
+def _unflatten(path, schema, columns):
+    """Rebuilds the value at path from its arrays and types"""
+    kind = schema[path]
+    if kind == 'none':
+        return None
+    elif kind in ['bool', 'int', 'float', 'str']:
+        return columns[path].item()
+    elif kind == 'datetime':
+        return datetime.strptime(columns[path].item(), _DATETIME_FORMAT)
+    elif kind == 'ndarray':
+        return columns[path]
+    elif kind in ['list_array', 'tuple_array']:
+        value = columns[path]
+        if value.ndim == 1:
+            value = value.tolist()
+        if kind == 'tuple_array':
+            return tuple(value)
+        return list(value)
+
+    children = _children(path, schema)
+    if kind in ['list', 'tuple']:
+        value = [_unflatten(_join(path, child), schema, columns)
+                 for child in sorted(children, key=int)]
+        if kind == 'tuple':
+            return tuple(value)
+        return value
+    elif kind == 'dict' or kind.startswith('dict:'):
+        key_types = json.loads(kind[len('dict:'):] or '{}')
+        return dict((_key_value(child, key_types.get(child, 'str')),
+                     _unflatten(_join(path, child), schema, columns))
+                    for child in children)
+
+    module_name, class_name = kind.split(':')
+    cls = getattr(importlib.import_module(module_name), class_name)
+    value = cls.__new__(cls)
+    state = dict((_unescape(child),
+                  _unflatten(_join(path, child), schema, columns))
+                 for child in children)
+    if hasattr(value, '__setstate__'):
+        value.__setstate__(state)
+    else:
+        value.__dict__.update(state)
+    return value
+
+def _children(path, schema):
+    """Returns the attribute names directly below path"""
+    prefix = path + '/' if path else ''
+    return [item[len(prefix):] for item in schema
+            if item.startswith(prefix) and item != path and item != 'image'
+            and item != _SCHEMA_KEY and '/' not in item[len(prefix):]]
+
+def _is_simple_sequence(value):
+    """Whether a list or tuple can be stored as a single array"""
+    if len(value) == 0:
+        return False
+    if all(isinstance(item, basestring) for item in value):
+        return True
+    if all(isinstance(item, (int, long, float, np.number))
+           and not isinstance(item, bool) for item in value):
+        return True
+    return (all(isinstance(item, np.ndarray) for item in value)
+            and len(set(item.shape for item in value)) == 1)
+
+def _is_leaf(kind):
+    return kind in ['none', 'bool', 'int', 'float', 'str', 'datetime',
+                    'ndarray', 'list_array', 'tuple_array']
+
+def _key_name(key, path):
+    """Returns the escaped path name and the type name of a dict key"""
+    if isinstance(key, basestring):
+        return _escape(key), 'str'
+    elif isinstance(key, (bool, np.bool_)):
+        return str(bool(key)), 'bool'
+    elif isinstance(key, (int, long, np.integer)):
+        return str(int(key)), 'int'
+    elif isinstance(key, (float, np.floating)):
+        return repr(float(key)), 'float'
+    raise RuntimeError('Cannot store a ' + str(type(key)) + ' key at ' + path)
+
+def _key_value(name, key_type):
+    """Returns the dict key stored under name by _key_name()"""
+    if key_type == 'bool':
+        return name == 'True'
+    elif key_type == 'int':
+        return int(name)
+    elif key_type == 'float':
+        return float(name)
+    return _unescape(name)
+
+def _escape(name):
+    """Escapes the path separator in an attribute name or dict key"""
+    return name.replace('%', '%25').replace('/', '%2F')
+
+def _unescape(name):
+    return re.sub('%(25|2F)', lambda match: _UNESCAPED[match.group(1)], name)
+
+_UNESCAPED = {'25': '%', '2F': '/'}
+
+def _join(path, name):
+    if path:
+        return path + '/' + name
+    return name
+
+_SCHEMA_KEY = '__schema__'
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
@@ -0,0 +1,292 @@
+"""instrumentation.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+This module contains the timing and counter instrumentation of the hot
+paths: file reading, error corrections, filtering, the centering searches,
+and the fits. Stages and counters are attributed to the FiberImage being
+analyzed. Instrumentation is disabled until enable_instrumentation() is
+called and costs a single flag check per stage while disabled
+"""
+from contextlib import contextmanager
+from functools import wraps
+from timeit import default_timer
+import json
+import os
+import threading
+import weakref
+from .containers import StageInfo, ProfileInfo
+
+#=============================================================================#
+#===== Enabling ==============================================================#
+#=============================================================================#
+
+def enable_instrumentation(trace=False):
+    """Start recording stage times and counters
+
+    Args
+    ----
+    trace : bool, optional
+        whether to also keep every stage as a trace event for
+        export_trace() and the trace hooks
+    """
+    global _ENABLED, _TRACING
+    _ENABLED = True
+    _TRACING = trace
+
+def disable_instrumentation():
+    """Stop recording (recorded results are kept)"""
+    global _ENABLED, _TRACING
+    _ENABLED = False
+    _TRACING = False
+
+def instrumentation_enabled():
+    """Whether stage times and counters are being recorded"""
+    return _ENABLED
+
+def reset_instrumentation():
+    """Discard every recorded stage, counter, and trace event"""
+    global _TOTAL
+    with _LOCK:
+        _TOTAL = ProfileInfo()
+        _PROFILES.clear()
+        del _TRACE_EVENTS[:]
+
+_ENABLED = False
+_TRACING = False
+_LOCK = threading.Lock()
+# Objects currently running an instrumented stage, per thread
+_LOCAL = threading.local()
+_TOTAL = ProfileInfo()
+_PROFILES = weakref.WeakKeyDictionary()
+_TRACE_EVENTS = []
+_TRACE_HOOKS = []
+
+#=============================================================================#
+#===== Recording =============================================================#
+#=============================================================================#
+
+def stage_timer(stage, image_obj=None):
+    """Context manager timing a stage
+
+    Args
+    ----
+    stage : str
+        name of the stage (e.g. 'center.radius')
+    image_obj : FiberImage, optional
+        object the stage belongs to. Nested stages without an object are
+        attributed to the innermost object
+
+    Example
+    -------
+    with stage_timer('filter_image'):
+        filtered = filter_image(image, kernel_size)
+    """
+    if not _ENABLED:
+        return _NO_STAGE
+    return _timed_stage(stage, image_obj)
+
+class _NoStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+_NO_STAGE = _NoStage()
+
+@contextmanager
+def _timed_stage(stage, image_obj):
+    stack = _object_stack()
+    if image_obj is not None:
+        stack.append(image_obj)
+    start = default_timer()
+    try:
+        yield
+    finally:
+        end = default_timer()
+        owner = stack[-1] if stack else None
+        if image_obj is not None:
+            stack.pop()
+        _record_stage(stage, owner, start, end)
+
+def timed(stage):
+    """Decorates a function or method to time it as a stage
+
+    Methods of image objects are attributed to the object (self) unless
+    they run inside a stage of another object (e.g. reading the dark
+    images of a FiberImage)
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return func(*args, **kwargs)
+            image_obj = None
+            if (args and hasattr(args[0], 'image_input')
+                    and not _object_stack()):
+                image_obj = args[0]
+            with _timed_stage(stage, image_obj):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count_event(counter, number=1, image_obj=None):
+    """Adds number to a counter (e.g. objective evaluations or bytes read)"""
+    if not _ENABLED:
+        return
+    owner = _owner(image_obj)
+    with _LOCK:
+        for profile in _profiles(owner):
+            profile.counters[counter] = profile.counters.get(counter, 0) + number
+
+def record_array(array, image_obj=None):
+    """Records the size of an allocated array for the peak array size"""
+    if not _ENABLED or getattr(array, 'nbytes', None) is None:
+        return
+    owner = _owner(image_obj)
+    with _LOCK:
+        for profile in _profiles(owner):
+            profile.peak_bytes = max(profile.peak_bytes, array.nbytes)
+
+def records_array(func):
+    """Decorates a function to record the size of the array it returns
+
+    For functions that return a tuple the first element is recorded
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if _ENABLED:
+            record_array(result[0] if isinstance(result, tuple) else result)
+        return result
+    return wrapper
+
+def counted(func, counter):
+    """Returns func wrapped to count its calls (e.g. a fit model)"""
+    if not _ENABLED:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        count_event(counter)
+        return func(*args, **kwargs)
+    return wrapper
+
+def _object_stack():
+    stack = getattr(_LOCAL, 'stack', None)
+    if stack is None:
+        stack = _LOCAL.stack = []
+    return stack
+
+def _owner(image_obj):
+    if image_obj is not None:
+        return image_obj
+    stack = _object_stack()
+    if stack:
+        return stack[-1]
+    return None
+
+def _profiles(owner):
+    """Returns the profiles a record is added to"""
+    if owner is None:
+        return [_TOTAL]
+    if owner not in _PROFILES:
+        _PROFILES[owner] = ProfileInfo()
+    return [_TOTAL, _PROFILES[owner]]
+
+def _record_stage(stage, owner, start, end):
+    elapsed = end - start
+    with _LOCK:
+        for profile in _profiles(owner):
+            if stage not in profile.stages:
+                profile.stages[stage] = StageInfo()
+            info = profile.stages[stage]
+            info.calls += 1
+            info.total_time += elapsed
+            info.max_time = max(info.max_time, elapsed)
+        if not _TRACING:
+            return
+        event = {'name': stage, 'cat': 'fiber_properties', 'ph': 'X',
+                 'ts': start * 1e6, 'dur': elapsed * 1e6,
+                 'pid': os.getpid(), 'tid': threading.current_thread().ident,
+                 'args': {'object': _label(owner)}}
+        _TRACE_EVENTS.append(event)
+        hooks = list(_TRACE_HOOKS)
+    for hook in hooks:
+        hook(event)
+
+def _label(image_obj):
+    """Returns a readable name of an image object"""
+    if image_obj is None:
+        return None
+    image_input = getattr(image_obj, 'image_input', None)
+    if isinstance(image_input, basestring):
+        return image_input
+    if isinstance(image_input, (list, tuple)) and image_input \
+            and isinstance(image_input[0], basestring):
+        return image_input[0]
+    return '%s at %s' % (image_obj.__class__.__name__, hex(id(image_obj)))
+
+#=============================================================================#
+#===== Reports ===============================================================#
+#=============================================================================#
+
+def get_profile(image_obj=None):
+    """Return the ProfileInfo of an image object, or of everything if None"""
+    with _LOCK:
+        if image_obj is None:
+            return _TOTAL
+        return _PROFILES.get(image_obj, ProfileInfo())
+
+def profiled_objects():
+    """Return the image objects with recorded stages or counters"""
+    with _LOCK:
+        return list(_PROFILES.keys())
+
+def instrumentation_report(image_obj=None):
+    """Return a table of the stages (slowest first) and counters
+
+    Args
+    ----
+    image_obj : FiberImage, optional
+        If None, reports everything that was recorded
+
+    Returns
+    -------
+    report : str
+    """
+    profile = get_profile(image_obj)
+    lines = ['%-28s %8s %12s %12s %12s' % ('stage', 'calls', 'total (s)',
+                                           'mean (s)', 'max (s)')]
+    for stage, info in sorted(profile.stages.items(),
+                              key=lambda item: -item[1].total_time):
+        lines.append('%-28s %8d %12.4f %12.4f %12.4f'
+                     % (stage, info.calls, info.total_time,
+                        info.total_time / info.calls, info.max_time))
+    for counter, value in sorted(profile.counters.items()):
+        lines.append('%-28s %8d' % (counter, value))
+    lines.append('%-28s %8.1f MB' % ('peak array', profile.peak_bytes / 2.0**20))
+    return '\n'.join(lines)
+
+def add_trace_hook(hook):
+    """Call hook(event) with every completed stage while tracing
+
+    Events are dicts in the Chrome trace event format
+    """
+    with _LOCK:
+        _TRACE_HOOKS.append(hook)
+
+def remove_trace_hook(hook):
+    with _LOCK:
+        _TRACE_HOOKS.remove(hook)
+
+def get_trace_events():
+    """Return a copy of the recorded trace events"""
+    with _LOCK:
+        return list(_TRACE_EVENTS)
+
+def export_trace(file_name):
+    """Write the trace events as JSON readable by chrome://tracing"""
+    with open(file_name, 'w') as output_file:
+        json.dump({'traceEvents': get_trace_events(),
+                   'displayTimeUnit': 'ms'}, output_file)
@@ -0,0 +1,270 @@
+"""memoize.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+This module contains an on-disk cache of FiberImage results. Each result is
+stored under a hash of everything it depends on: the source frame files
+(path, size, and modification time), the calibration inputs, the
+constructor parameters, and the getter's arguments. Re-running an analysis
+only recalculates results whose inputs changed. The cache is disabled until
+enable_result_cache() is called
+"""
+from collections import Iterable
+from functools import wraps
+import cPickle as pickle
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+class ResultCache(object):
+    """Content-addressed store of pickled results in a directory
+
+    Entries are evicted least recently used first once the directory holds
+    more than max_bytes
+
+    Args
+    ----
+    directory : str
+        location of the cache. Created if it does not exist
+    max_bytes : int, optional
+        size limit of the stored results
+
+    Attributes
+    ----------
+    directory : str
+    max_bytes : int
+    """
+    def __init__(self, directory, max_bytes=2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._size = sum(os.path.getsize(file_name)
+                         for file_name in self._entries())
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def get(self, key):
+        """Return (True, value) for a stored key or (False, None)"""
+        file_name = self._file_name(key)
+        try:
+            with open(file_name, 'rb') as input_file:
+                value = pickle.load(input_file)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+        try:
+            os.utime(file_name, None) # Mark as recently used
+        except OSError:
+            pass
+        return True, value
+
+    def set(self, key, value):
+        """Store value under key, evicting old entries if needed"""
+        file_name = self._file_name(key)
+        directory = os.path.dirname(file_name)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                pass # Made by another process
+        # Write then rename so readers never see a partial entry
+        handle, temp_name = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, 'wb') as output_file:
+            pickle.dump(value, output_file, -1)
+        size = os.path.getsize(temp_name)
+        if os.path.exists(file_name):
+            size -= os.path.getsize(file_name)
+        os.rename(temp_name, file_name)
+
+        with self._lock:
+            self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        """Remove every stored result"""
+        with self._lock:
+            for file_name in self._entries():
+                os.remove(file_name)
+            self._size = 0
+
+    def _evict(self):
+        """Remove least recently used entries until 90% of max_bytes"""
+        entries = sorted((os.path.getmtime(file_name), file_name)
+                         for file_name in self._entries())
+        for _, file_name in entries:
+            if self._size <= 0.9 * self.max_bytes:
+                break
+            self._size -= os.path.getsize(file_name)
+            os.remove(file_name)
+
+    def _entries(self):
+        for folder, _, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                if file_name.endswith('.pkl'):
+                    yield os.path.join(folder, file_name)
+
+    def _file_name(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pkl')
+
+def enable_result_cache(directory='.fiber_cache', max_bytes=2**30):
+    """Start caching FiberImage results in directory
+
+    Returns
+    -------
+    cache : ResultCache
+    """
+    global _RESULT_CACHE
+    _RESULT_CACHE = ResultCache(directory, max_bytes)
+    return _RESULT_CACHE
+
+def disable_result_cache():
+    """Stop caching FiberImage results (stored results are kept)"""
+    global _RESULT_CACHE
+    _RESULT_CACHE = None
+
+def get_result_cache():
+    """Return the active ResultCache or None"""
+    return _RESULT_CACHE
+
+_RESULT_CACHE = None
+
+def memoized(getter):
+    """Decorates a FiberImage getter to use the active ResultCache
+
+    Along with the return value, the stored values of every result the
+    getter calculated (e.g. the edges found on the way to a rectangle
+    center) are cached and set on the object again when the result is
+    found, so the object is the same as if the getter had run. The results
+    the object already holds are part of the key. Calls without a method
+    (where the result depends on which methods have already been run) are
+    not cached. A call with new=True is recalculated and replaces the
+    stored result
+    """
+    name = getter.__name__
+    spec = inspect.getargspec(getter)
+
+    @wraps(getter)
+    def wrapper(self, *args, **kwargs):
+        cache = _RESULT_CACHE
+        if cache is None:
+            return getter(self, *args, **kwargs)
+        arguments = inspect.getcallargs(getter, self, *args, **kwargs)
+        del arguments[spec.args[0]]
+        if spec.keywords is not None:
+            arguments.update(arguments.pop(spec.keywords))
+        if 'method' in spec.args and arguments['method'] is None:
+            return getter(self, *args, **kwargs)
+
+        new = arguments.pop('new', False)
+        before = _describe(result_states(self))
+        key = result_key(self, name, arguments, before)
+        if not new:
+            found, entry = cache.get(key)
+            if found:
+                value, cleared, states = entry
+                for node in cleared:
+                    self.invalidate(node)
+                for node, state in states.items():
+                    self._restore_result(node, state)
+                return value
+        value = getter(self, *args, **kwargs)
+
+        # Store the results this call calculated, changed, or cleared
+        after = result_states(self)
+        cleared = [node for node in before if node not in after]
+        states = dict((node, state) for node, state in after.items()
+                      if _describe(state) != before.get(node))
+        cache.set(key, (value, cleared, states))
+        return value
+    return wrapper
+
+def result_states(image_obj):
+    """Return node -> stored values of every up to date result of an object
+
+    See FiberImage._result_state()
+    """
+    graph = image_obj.get_result_graph()
+    states = {}
+    for node in graph.nodes():
+        if graph.is_computed(node):
+            state = image_obj._result_state(node)
+            if state is not None:
+                states[node] = state
+    return states
+
+def result_key(image_obj, name, arguments, results=None):
+    """Return the hash of a result's inputs and arguments
+
+    Args
+    ----
+    image_obj : FiberImage
+    name : str
+        name of the getter
+    arguments : dict
+        arguments of the getter by name
+    results : dict, optional
+        description of the results the object already holds (see
+        result_states())
+
+    Returns
+    -------
+    key : str
+        hexadecimal SHA-1 digest
+    """
+    description = {'inputs': input_fingerprint(image_obj),
+                   'name': name,
+                   'arguments': _describe(arguments),
+                   'results': results}
+    return hashlib.sha1(json.dumps(description, sort_keys=True)).hexdigest()
+
+def input_fingerprint(image_obj):
+    """Return a description of everything an image object's results depend on
+
+    Files are described by absolute path, size, and modification time and
+    arrays by a hash of their contents
+    """
+    return _describe({'class': image_obj.__class__.__name__,
+                      'image_input': image_obj.image_input,
+                      'dark': getattr(image_obj, 'dark', None),
+                      'ambient': getattr(image_obj, 'ambient', None),
+                      'flat': getattr(image_obj, 'flat', None),
+                      'kernel_size': getattr(image_obj, 'kernel_size', None),
+                      'threshold': getattr(image_obj, 'threshold', None),
+                      'input_fnum': _frd_attribute(image_obj, 'input_fnum'),
+                      'pixel_size': image_obj.pixel_size,
+                      'camera': image_obj.camera,
+                      'magnification': image_obj.magnification})
+
+def _frd_attribute(image_obj, attribute):
+    frd_info = getattr(image_obj, '_frd_info', None)
+    if frd_info is None:
+        return None
+    return getattr(frd_info, attribute)
+
+def _describe(value):
+    """Converts value into a JSON serializable description"""
+    if isinstance(value, basestring):
+        if os.path.isfile(value):
+            stat = os.stat(value)
+            return ['file', os.path.abspath(value), stat.st_size, stat.st_mtime]
+        return value
+    elif isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        return ['array', str(array.dtype), list(array.shape),
+                hashlib.sha1(array).hexdigest()]
+    elif isinstance(value, dict):
+        return dict((str(key), _describe(item)) for key, item in value.items())
+    elif isinstance(value, Iterable):
+        return [_describe(item) for item in value]
+    elif value is None or isinstance(value, (bool, int, long, float)):
+        return value
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif hasattr(value, '__dict__'):
+        return [value.__class__.__name__, _describe(vars(value))]
+    return repr(value)
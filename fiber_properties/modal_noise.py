@@ -5,23 +5,33 @@ This module contains functions that calculate the modal noise for
 images taken with the FCS contained in FiberImage objects
 """
 from __future__ import division
+from multiprocessing.pool import ThreadPool
+import threading
+import weakref
 import numpy as np
 from .numpy_array_handler import (crop_image, isolate_circle, apply_window,
                                   mesh_grid_from_array, intensity_array,
-                                  filter_image)
+                                  intensity_mask, intensity_statistics,
+                                  lowpass_image, isolate_polygon,
+                                  polygon_sides, multiscale_contrast,
+                                  local_contrast,
+                                  circumscribed_radius, polynomial_fit)
 from .plotting import (plot_image, plot_fft, show_plots, plot_cross_sections,
                        show_image, plot_overlaid_cross_sections, plot_dot)
-from .containers import FFTInfo, Pixel
+from .containers import FFTInfo, Pixel, convert_pixels_to_units
+from .input_output import load_object, OBJECT_EXTENSIONS
+from .instrumentation import records_array
+from scipy.fftpack import next_fast_len
 
 def modal_noise(image_obj, method='fft', **kwargs):
     """Finds modal noise of image using specified method and output
 
     Args
     ----
-    image_obj : FiberImage
+    image_obj : FiberImage or ModalNoiseSession
         the image object being analyzed
     method : {'tophat', 'fft', 'polynomial', 'gaussian', 'gradient',
-             'contrast', 'gini', 'entropy'}
+             'contrast', 'gini', 'entropy', 'filter', 'multiscale'}
         string designating the modal noise method to use
     **kwargs : dict
         The keyworded arguments to pass to the modal noise method
@@ -50,16 +60,123 @@ def modal_noise(image_obj, method='fft', **kwargs):
         return _modal_noise_gini(image_obj, **kwargs)
     elif method in 'entropy':
         return _modal_noise_entropy(image_obj, **kwargs)
+    elif method in 'multiscale':
+        return _modal_noise_multiscale(image_obj, **kwargs)
     else:
         raise ValueError('Incorrect string for modal noise method')
 
-def baseline_image(image_obj, kernel_size=None, stdev=0.01, num_images=10, **kwargs):
+def modal_noise_methods(image_obj, methods, threads=1, **kwargs):
+    """Finds modal noise of image using several methods with shared data
+
+    The image, fiber center and radius, crops, masks, and filtered images are
+    calculated once in a ModalNoiseSession and shared by every method
+
+    Args
+    ----
+    image_obj : FiberImage or ModalNoiseSession
+        the image object being analyzed
+    methods : list(str)
+        modal noise methods to use. See modal_noise()
+    threads : int, optional
+        number of methods evaluated concurrently. Everything the methods
+        need from the image object is found first, so the threads only work
+        on the session's arrays. Methods are always run one at a time when
+        show_image is True
+    **kwargs : dict
+        The keyworded arguments to pass to every modal noise method
+
+    Returns
+    -------
+    results : dict
+        modal noise result for each method
+    """
+    session = _get_session(image_obj,
+                           **dict((key, value) for key, value in kwargs.items()
+                                  if key not in _METHOD_KWARGS))
+    if threads > 1 and not kwargs.get('show_image', False):
+        # The image object is only used here so the threads share arrays
+        session.prepare(methods)
+        pool = ThreadPool(processes=min(threads, len(methods)))
+        try:
+            values = pool.map(lambda method: modal_noise(session, method,
+                                                         **kwargs),
+                              methods)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        values = [modal_noise(session, method, **kwargs) for method in methods]
+    return dict(zip(methods, values))
+
+def contrast_map(image_obj, window=31, step=1, radius_factor=None,
+                 fiber_shape='circle', fiber_angle=0.0, **kwargs):
+    """Return a map of the local speckle contrast across the fiber face
+
+    The standard deviation divided by the mean of the fiber face pixels in a
+    window around each pixel is found with summed-area tables (see
+    numpy_array_handler.local_contrast())
+
+    Args
+    ----
+    image_obj : FiberImage or ModalNoiseSession
+        image object to analyze
+    window : int (odd), optional
+        side length of the square window (pixels)
+    step : int, optional
+        spacing of the returned pixels (1 for full resolution)
+    radius_factor : float, optional
+        fraction of the radius inside which the contrast is calculated
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
+    **kwargs :
+        The keyworded arguments to pass to ModalNoiseSession (e.g.
+        fiber_method)
+
+    Returns
+    -------
+    contrast_map : 2D numpy.ndarray
+        local contrast, NaN outside the fiber face
+    corner : Pixel
+        image pixel of contrast_map[0, 0]. contrast_map[i, j] is centered
+        on image pixel (corner.x + j*step, corner.y + i*step)
+    """
+    session = _get_session(image_obj, **kwargs)
+    radius = session.radius
+    if radius_factor is None:
+        radius_factor = _get_radius_factor(radius)
+    top, left, mask = session.mask(radius*radius_factor, fiber_shape,
+                                   fiber_angle)
+    region = session.image[top:top+mask.shape[0], left:left+mask.shape[1]]
+    return (local_contrast(region, window, mask, step), Pixel(left, top))
+
+def baseline_image(image_obj, kernel_size=None, stdev=0.01, num_images=10,
+                   seed=None, fiber_method=None, lowpass='median', **kwargs):
     """Return a numpy array of a baseline modal noise image
 
+    The heavily filtered (perfect) image is cached for each image object,
+    kernel size, and fiber center and radius until the image changes. The noise of num_images averaged normal
+    draws is generated as a single draw with the equivalent variance
+
     Args
     ----
-    im_obj : FiberImage
-        image object to use for baseline
+    im_obj : FiberImage or str
+        image object (or saved object file name) to use for baseline
+    kernel_size : odd int, optional
+        kernel side length of the median filter (default 101)
+    stdev : float, optional
+        standard deviation of the noise added to the shot noise
+    num_images : int, optional
+        number of noisy images averaged together
+    seed : int or numpy.random.RandomState, optional
+        seed or random state used for the noise. Baselines with the same
+        seed are identical
+    fiber_method : str, optional
+        method to use when calculating center and radius of fiber face
+    lowpass : {'median', 'gaussian', 'box', 'decimate'}, optional
+        low-pass engine used for the perfect image. See
+        numpy_array_handler.lowpass_image()
 
     Returns
     -------
@@ -68,7 +185,40 @@ def baseline_image(image_obj, kernel_size=None, stdev=0.01, num_images=10, **kwa
     """
     if kernel_size is None:
         kernel_size = 101
-    image, center, radius = _get_image_data(image_obj, **kwargs)
+    perfect_image = _perfect_image(image_obj, kernel_size, fiber_method,
+                                   lowpass, **kwargs)
+
+    if isinstance(seed, np.random.RandomState):
+        random_state = seed
+    else:
+        random_state = np.random.RandomState(seed)
+
+    # The mean of num_images draws of N(I, s) is a single draw of
+    # N(I, s / sqrt(num_images))
+    baseline_image = random_state.standard_normal(perfect_image.shape)
+    baseline_image *= np.sqrt(perfect_image) + stdev
+    baseline_image /= np.sqrt(num_images)
+    baseline_image += perfect_image
+    return baseline_image
+
+def _perfect_image(image_obj, kernel_size, fiber_method=None,
+                   lowpass='median', **kwargs):
+    """Returns the (cached) filtered fiber image used by baseline_image()
+
+    The cache of each object is keyed by the fiber center and radius that
+    fiber_method and **kwargs give, and is emptied when the object's image
+    changes (e.g. with a new calibration)
+    """
+    image_obj = load_object(image_obj)
+    image, center, radius = _get_image_data(image_obj, fiber_method, **kwargs)
+
+    version = image_obj.get_result_graph().version('image')
+    if _PERFECT_IMAGES.get(image_obj, (None,))[0] != version:
+        _PERFECT_IMAGES[image_obj] = (version, {})
+    cache = _PERFECT_IMAGES[image_obj][1]
+    key = (kernel_size, lowpass, center.as_tuple(), radius)
+    if key in cache:
+        return cache[key]
 
     zero_fill = False
     if kernel_size > int((min(*image.shape) - 2*radius)):
@@ -76,14 +226,16 @@ def baseline_image(image_obj, kernel_size=None, stdev=0.01, num_images=10, **kwa
 
     image_crop = crop_image(image, center, radius + kernel_size, False)
 
-    perfect_image = filter_image(image_crop, kernel_size=kernel_size, zero_fill=zero_fill)
+    perfect_image = lowpass_image(image_crop, kernel_size, lowpass, zero_fill)
     perfect_image *= (perfect_image > 0.0).astype('float64')
+    perfect_image.flags.writeable = False
 
-    baseline_image = np.zeros_like(perfect_image)
-    for i in xrange(num_images):
-        # baseline_image += np.random.poisson(perfect_image) / 10.0
-        baseline_image += np.random.normal(perfect_image, np.sqrt(perfect_image) + stdev) / num_images
-    return baseline_image
+    cache[key] = perfect_image
+    return perfect_image
+
+# (image version, filtered images) for baseline_image() held only while
+# their object exists
+_PERFECT_IMAGES = weakref.WeakKeyDictionary()
 
 def _get_image_data(image_obj, fiber_method=None, **kwargs):
     """Returns relevant information from a FiberImage object
@@ -117,13 +269,213 @@ def _get_radius_factor(radius):
     """Returns the radius factor for 20 pixels inside circumference"""
     return 1 - 30 / radius
 
+#=============================================================================#
+#==== Modal Noise Session ====================================================#
+#=============================================================================#
+
+# Keyworded arguments used by the modal noise methods themselves rather than
+# by the fiber centering methods
+_METHOD_KWARGS = ['output', 'radius_factor', 'show_image', 'kernel_size', 'deg',
+                  'fiber_shape', 'fiber_angle', 'fft_length', 'workers',
+                  'lowpass', 'levels', 'pyramid']
+
+class ModalNoiseSession(object):
+    """Image data shared by the modal noise methods
+
+    The image, fiber center, and fiber radius are found once. Crops,
+    intensity masks, and filtered images are calculated the first time they
+    are requested and reused afterwards. Requests are thread safe so several
+    methods can use the same session concurrently. Only __init__ and
+    gaussian_fit() use the image object, so call prepare() before sharing
+    the session between threads. Arrays returned by the session are shared
+    and must not be modified in place
+
+    Args
+    ----
+    image_obj : FiberImage
+        the image object being analyzed
+    fiber_method : str, optional
+        method to use when calculating center and radius of fiber face
+    **kwargs :
+        The keyworded arguments to pass to the centering method
+
+    Attributes
+    ----------
+    image_obj : FiberImage
+    image : 2D numpy.ndarray
+        the corrected image
+    center : Pixel
+        the fiber center (pixels)
+    radius : float
+        the fiber radius (pixels)
+    camera : str
+    pixel_size : float
+    magnification : float
+        copied from the image object
+    """
+    def __init__(self, image_obj, fiber_method=None, **kwargs):
+        self.image_obj = image_obj
+        self.image, self.center, self.radius = _get_image_data(image_obj,
+                                                               fiber_method,
+                                                               **kwargs)
+        self.camera = image_obj.get_camera()
+        self.pixel_size = image_obj.pixel_size
+        self.magnification = image_obj.magnification
+        self._cache = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, methods):
+        """Finds everything the given methods need from the image object
+
+        Args
+        ----
+        methods : list(str)
+            modal noise methods. See modal_noise()
+        """
+        for method in methods:
+            if len(method) >= 3 and method in 'gaussian':
+                self.gaussian_fit()
+
+    def get_camera(self):
+        """Return the camera of the image object"""
+        return self.camera
+
+    def convert_pixels_to_units(self, value, units):
+        """Returns the pixel value in the proper units"""
+        return convert_pixels_to_units(value, self.pixel_size,
+                                       self.magnification, units)
+
+    def gaussian_fit(self):
+        """Return the image object's gaussian fit"""
+        return self._cached(('gaussian_fit',), self.image_obj.get_gaussian_fit)
+
+    def crop(self, radius):
+        """Return the image cropped around the fiber center
+
+        Returns
+        -------
+        image_crop : 2D numpy.ndarray
+        new_center : Pixel
+        """
+        return self._cached(('crop', radius),
+                            lambda: crop_image(self.image, self.center, radius))
+
+    def filtered(self, kernel_size, crop_radius, zero_fill=False,
+                 lowpass='median'):
+        """Return the low-pass filtered crop(crop_radius) image
+
+        See numpy_array_handler.lowpass_image() for the lowpass engines
+        """
+        return self._cached(('filtered', kernel_size, crop_radius, zero_fill,
+                             lowpass),
+                            lambda: lowpass_image(self.crop(crop_radius)[0],
+                                                  kernel_size, lowpass,
+                                                  zero_fill))
+
+    def mask(self, radius, fiber_shape='circle', fiber_angle=0.0):
+        """Return the fiber face mask. See intensity_mask()
+
+        Returns
+        -------
+        top : int
+        left : int
+        mask : 2D numpy.ndarray (bool)
+        """
+        return self._cached(('mask', radius, fiber_shape, fiber_angle),
+                            lambda: intensity_mask(self.image, self.center,
+                                                   radius, fiber_shape,
+                                                   fiber_angle))
+
+    def intensities(self, array, radius, fiber_shape='circle', fiber_angle=0.0,
+                    crop_radius=None):
+        """Return the values of array inside the fiber face
+
+        Equivalent to numpy_array_handler.intensity_array() around the fiber
+        center but with the mask reused between calls
+
+        Args
+        ----
+        array : 2D or 3D numpy.ndarray
+            aligned with the image, or with crop(crop_radius) if given. A
+            3D array is treated as a stack of frames
+        radius : number (pixels)
+        fiber_shape : str or int, optional
+        fiber_angle : number (degrees), optional
+            See intensity_array()
+        crop_radius : number (pixels), optional
+
+        Returns
+        -------
+        intensity_array : 1D numpy.ndarray
+        """
+        top, left, mask = self.mask(radius, fiber_shape, fiber_angle)
+        if crop_radius is not None:
+            new_center = self.crop(crop_radius)[1]
+            top -= int(round(self.center.y - new_center.y))
+            left -= int(round(self.center.x - new_center.x))
+
+        # Clip the mask region to the array
+        height, width = array.shape[-2:]
+        mask_top = max(0, -top)
+        mask_left = max(0, -left)
+        mask = mask[mask_top:height-top, mask_left:width-left]
+        top += mask_top
+        left += mask_left
+        return array[..., top:top+mask.shape[0], left:left+mask.shape[1]][..., mask]
+
+    def statistics(self, array=None, radius=None, fiber_shape='circle',
+                   fiber_angle=0.0, crop_radius=None, gini=False):
+        """Return the intensity statistics of array inside the fiber face
+
+        Args
+        ----
+        array : 2D numpy.ndarray, optional
+            If None, uses the image. Statistics of the image are cached
+        radius, fiber_shape, fiber_angle, crop_radius :
+            See intensities()
+        gini : bool, optional
+            See numpy_array_handler.intensity_statistics()
+
+        Returns
+        -------
+        stats : IntensityStats
+        """
+        if array is None:
+            key = ('statistics', radius, fiber_shape, fiber_angle, gini)
+            return self._cached(key, lambda: self.statistics(self.image, radius,
+                                                             fiber_shape,
+                                                             fiber_angle,
+                                                             gini=gini))
+        return intensity_statistics(self.intensities(array, radius, fiber_shape,
+                                                     fiber_angle, crop_radius),
+                                    gini)
+
+    def _cached(self, key, func):
+        """Return the cached value for key, calculating it with func once"""
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._cache:
+                self._cache[key] = func()
+        return self._cache[key]
+
+def _get_session(image_obj, **kwargs):
+    """Returns a ModalNoiseSession for a FiberImage or existing session"""
+    if isinstance(image_obj, ModalNoiseSession):
+        return image_obj
+    return ModalNoiseSession(image_obj, **kwargs)
+
 def _modal_noise_fft(image_obj, output='array', radius_factor=None,
-                     show_image=False, **kwargs):
+                     show_image=False, fiber_shape='circle', fiber_angle=0.0,
+                     fft_length=2500, workers=1, **kwargs):
     """Finds modal noise of image using the image's power spectrum
 
     Args
     ----
-    image_obj : FiberImage
+    image_obj : FiberImage or ModalNoiseSession
         image object to analyze
     output {'array', 'parameter'}, optional
         see Returns for further info
@@ -131,6 +483,15 @@ def _modal_noise_fft(image_obj, output='array', radius_factor=None,
         whether or not to show images of the modal noise analysis
     radius_factor : number, optional
         fraction of the radius outside which the array is padded with zeros
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
+    fft_length : int, optional
+        minimum side length of the zero padded transform. Rounded up to the
+        next length with only small prime factors
+    workers : int, optional
+        number of threads used for the transform
 
     Returns
     -------
@@ -140,19 +501,8 @@ def _modal_noise_fft(image_obj, output='array', radius_factor=None,
         parameter : float
             the Gini coefficient for the 2D power spectrum
     """
-    image, center, radius = _get_image_data(image_obj, **kwargs)
-    if radius_factor is None:
-        radius_factor = _get_radius_factor(radius)
-    height, width = image.shape
-
-    if image_obj.get_camera() == 'nf':
-        image, center = crop_image(image, center, radius*radius_factor)
-        image = isolate_circle(image, center, radius*radius_factor)
-
-    elif image_obj.get_camera() == 'ff':
-        image, center = crop_image(image, center, min(center.x, center.y,
-                                                      width-center.x,
-                                                      height-center.y))
+    session = _get_session(image_obj, **kwargs)
+    image = _fft_image(session, radius_factor, fiber_shape, fiber_angle)
 
     if show_image:
         plot_image(image)
@@ -160,17 +510,10 @@ def _modal_noise_fft(image_obj, output='array', radius_factor=None,
     image = apply_window(image)
     if show_image:
         plot_image(image)
-    height, width = image.shape
 
-    fft_length = 2500 # Chosen to get good resolution in decent time
-    fft_array = np.fft.fftshift(np.abs(np.fft.fft2(image, s=(fft_length,
-                                                             fft_length),
-                                                   norm='ortho')))
-    if show_image:
-        plot_image(np.log(fft_array))
-
-    fx0 = fft_length//2
-    fy0 = fft_length//2
+    # The default length was chosen to get good resolution in decent time
+    fft_length = next_fast_len(fft_length)
+    fft_array = np.abs(_real_fft2(image, fft_length, workers)) / fft_length
 
     max_freq = fft_length//2
 
@@ -178,41 +521,16 @@ def _modal_noise_fft(image_obj, output='array', radius_factor=None,
         raise ValueError('Incorrect output string')
 
     elif output in 'array':
-        bin_width = 1
-        list_len = max_freq//bin_width + 1
-
-        fft_list = np.zeros(list_len).astype('float64')
-        weight_list = np.zeros(list_len).astype('float64')
-        freq_list = bin_width * np.arange(list_len).astype('float64')
-
-        # Take the four quadrants of the FFT and sum them together
-        bottom_right = fft_array[fy0:fy0+max_freq, fx0:fx0+max_freq]
-        bottom_left = fft_array[fy0:fy0+max_freq, fx0-max_freq+1:fx0+1][:, ::-1]
-        top_left = fft_array[fy0-max_freq+1:fy0+1, fx0-max_freq+1:fx0+1][::-1, ::-1]
-        top_right = fft_array[fy0-max_freq+1:fy0+1, fx0:fx0+max_freq][::-1, :]
-
-        fft_array = (bottom_right + bottom_left + top_left + top_right) / 4.0
-
-        for i in xrange(max_freq):
-            for j in xrange(i+1):
-                freq = np.sqrt(i**2 + j**2)
-                if freq <= max_freq:
-                    fft_list[int(freq/bin_width)] += fft_array[j, i] + fft_array[i, j]
-                    weight_list[int(freq/bin_width)] += 2.0
-
-        # Remove bins with nothing in them
-        mask = (weight_list > 0.0).astype('bool')
-        weight_list = weight_list[mask]
-        freq_list = freq_list[mask]
-        fft_list = fft_list[mask] / weight_list # Average out
-
-        # Normalize
-        fft_list /= fft_list.sum()
+        if show_image:
+            plot_image(np.log(_full_spectrum(fft_array, fft_length)))
+
+        fft_list, freq_list = _radial_spectrum(fft_array, fft_length)
         # Get Frequencies in 1/um
-        freq_list /= image_obj.convert_pixels_to_units(fft_length, 'microns')
+        freq_list /= session.convert_pixels_to_units(fft_length, 'microns')
 
         if show_image:
-            max_wavelength = image_obj.get_fiber_radius(method='edge', units='microns')
+            max_wavelength = session.image_obj.get_fiber_radius(method='edge',
+                                                                units='microns')
             plot_fft(FFTInfo(np.array(fft_list), np.array(freq_list)),
                      labels=[],
                      max_wavelength=max_wavelength)
@@ -221,12 +539,296 @@ def _modal_noise_fft(image_obj, output='array', radius_factor=None,
         return FFTInfo(np.array(fft_list), np.array(freq_list))
 
     elif output in 'parameter':
-        return _gini_coefficient(intensity_array(fft_array, Pixel(fx0, fy0), max_freq))
+        fft_array = _full_spectrum(fft_array, fft_length)
+        return _gini_coefficient(intensity_array(fft_array,
+                                                 Pixel(max_freq, max_freq),
+                                                 max_freq))
 
     else:
         raise ValueError('Incorrect output string')
 
-def _modal_noise_filter(image_obj, kernel_size=None, show_image=False, radius_factor=None, **kwargs):
+def modal_noise_fft_batch(images, radius_factor=None, fiber_shape='circle',
+                          fiber_angle=0.0, fft_length=2500, threads=1,
+                          batch_size=2, pixel_size=None, magnification=None,
+                          new=False, save_objs=False, **kwargs):
+    """Finds the FFT modal noise spectra of several images together
+
+    Equivalent to image_obj.get_modal_noise('fft') for every image, but the
+    windowing, transforms, and radial binning are done on stacks of
+    batch_size images at a time spread over a thread pool. The frequency
+    axis is only calculated once. Spectra already stored in FiberImage
+    inputs are reused, and calculated spectra are stored in them
+
+    Args
+    ----
+    images : list(FiberImage), list(str), or 3D numpy.ndarray
+        FiberImage objects (or saved object file names) which are cropped
+        exactly like _modal_noise_fft(), or a stack of equally sized fiber
+        face crops that are windowed and transformed as they are
+    radius_factor : number or list(number), optional
+        fraction of the radius outside which the array is padded with zeros
+        for every image or for each image. Only used for FiberImage inputs
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
+    fft_length : int, optional
+        see _modal_noise_fft()
+    threads : int, optional
+        number of batches processed concurrently
+    batch_size : int, optional
+        number of images transformed together. Each image needs roughly
+        fft_length**2 * 16 bytes while being transformed
+    pixel_size : number, optional
+        pixel size (microns) used for the frequencies of a stack. If None,
+        stack frequencies are returned in 1/pixels
+    magnification : number, optional
+        magnification used for the frequencies of a stack
+    new : bool, optional
+        whether to recalculate spectra already stored in FiberImage inputs
+    save_objs : bool, optional
+        whether to save the objects of saved object file inputs again with
+        their spectra
+    **kwargs :
+        The keyworded arguments to pass to ModalNoiseSession (e.g.
+        fiber_method)
+
+    Returns
+    -------
+    fft_info_list : list(FFTInfo)
+        one FFTInfo for each image
+    """
+    fft_length = next_fast_len(fft_length)
+
+    if isinstance(images, np.ndarray):
+        num_images = images.shape[0]
+        if pixel_size is None:
+            freq_units = [fft_length] * num_images
+        else:
+            if magnification is None:
+                magnification = 1.0
+            freq_units = [convert_pixels_to_units(fft_length, pixel_size,
+                                                  magnification, 'microns')]
+            freq_units *= num_images
+        prepare = lambda start, end: apply_window(images[start:end])
+        objects = None
+        todo = range(num_images)
+    else:
+        objects = [load_object(image_obj) for image_obj in images]
+        if not isinstance(radius_factor, (list, tuple)):
+            radius_factor = [radius_factor] * len(objects)
+        # Only the spectra not stored in the objects are calculated
+        todo = [i for i, image_obj in enumerate(objects)
+                if new or image_obj._modal_noise_info.fft is None]
+        num_images = len(todo)
+        # The objects are only used here so the threads share arrays
+        sessions = [_get_session(objects[i], **kwargs) for i in todo]
+        freq_units = [session.convert_pixels_to_units(fft_length, 'microns')
+                      for session in sessions]
+
+        def prepare(start, end):
+            crops = []
+            for i in xrange(start, end):
+                crops.append(apply_window(_fft_image(sessions[i],
+                                                     radius_factor[todo[i]],
+                                                     fiber_shape,
+                                                     fiber_angle)))
+            # Zero padding is added after the image by the transform anyway
+            stack = np.zeros((len(crops),
+                              max(crop.shape[0] for crop in crops),
+                              max(crop.shape[1] for crop in crops)))
+            for crop, image in zip(crops, stack):
+                image[:crop.shape[0], :crop.shape[1]] = crop
+            return stack
+
+    def transform(start):
+        end = min(start + batch_size, num_images)
+        fft_array = np.abs(_real_fft2(prepare(start, end), fft_length))
+        fft_array /= fft_length
+        return _radial_spectrum(fft_array, fft_length)
+
+    starts = range(0, num_images, batch_size)
+    if threads > 1:
+        pool = ThreadPool(processes=threads)
+        try:
+            results = pool.map(transform, starts)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [transform(start) for start in starts]
+
+    fft_info_list = []
+    if results:
+        freq_list = results[0][1]
+        fft_lists = np.concatenate([fft_list for fft_list, _ in results])
+        fft_info_list = [FFTInfo(fft_list, freq_list / units)
+                         for fft_list, units in zip(fft_lists, freq_units)]
+    if objects is None:
+        return fft_info_list
+
+    for i, fft_info in zip(todo, fft_info_list):
+        objects[i]._store_modal_noise('fft', fft_info)
+        if (save_objs and isinstance(images[i], basestring)
+                and images[i].endswith(OBJECT_EXTENSIONS)):
+            objects[i].save_object(images[i])
+    return [image_obj._modal_noise_info.fft for image_obj in objects]
+
+def _fft_image(session, radius_factor=None, fiber_shape='circle',
+               fiber_angle=0.0):
+    """Returns the isolated fiber face used by the FFT method"""
+    image, center, radius = session.image, session.center, session.radius
+    if radius_factor is None:
+        radius_factor = _get_radius_factor(radius)
+    height, width = image.shape
+
+    if session.get_camera() == 'nf':
+        sides = polygon_sides(fiber_shape)
+        crop_radius = circumscribed_radius(radius*radius_factor, fiber_shape)
+        image, center = session.crop(crop_radius)
+        if sides is None:
+            image = isolate_circle(image, center, radius*radius_factor)
+        else:
+            image = isolate_polygon(image, center, crop_radius, sides,
+                                    fiber_angle)
+
+    elif session.get_camera() == 'ff':
+        image, center = session.crop(min(center.x, center.y,
+                                         width-center.x, height-center.y))
+    return image
+
+def _radial_spectrum(fft_array, fft_length):
+    """Returns the normalized, radially averaged power spectrum
+
+    Args
+    ----
+    fft_array : 2D or 3D numpy.ndarray
+        magnitude of the real-input transform of an image or a stack of
+        images (see _real_fft2())
+    fft_length : int
+
+    Returns
+    -------
+    fft_list : 1D or 2D numpy.ndarray
+        average spectrum in each non-empty frequency bin, normalized to sum
+        to one (for every image)
+    freq_list : 1D numpy.ndarray
+        frequency of each bin in 1/(fft_length pixels)
+    """
+    max_freq = fft_length//2
+
+    # The four quadrants of a real image's spectrum are pairwise symmetric,
+    # so average the positive and negative y frequencies of the positive x
+    # frequencies
+    fft_array = (fft_array[..., :max_freq, :max_freq]
+                 + fft_array[..., -np.arange(max_freq), :max_freq]) / 2.0
+
+    fft_list, weight_list = _radial_sum(fft_array, max_freq)
+    freq_list = np.arange(max_freq + 1).astype('float64')
+
+    # Remove bins with nothing in them
+    mask = (weight_list > 0.0).astype('bool')
+    weight_list = weight_list[mask]
+    freq_list = freq_list[mask]
+    fft_list = fft_list[..., mask] / weight_list # Average out
+
+    # Normalize
+    fft_list /= fft_list.sum(axis=-1, keepdims=True)
+    return fft_list, freq_list
+
+@records_array
+def _real_fft2(image, fft_length, workers=1):
+    """Returns the real-input 2D FFT of the zero padded image
+
+    Equivalent to np.fft.rfft2(image, s=(fft_length, fft_length)). The row
+    transforms are only taken over the image rows (not the padding) and the
+    column transforms are split between the given number of threads
+    """
+    rows = np.fft.rfft(image, n=fft_length, axis=-1)
+    if workers <= 1:
+        return np.fft.fft(rows, n=fft_length, axis=-2)
+
+    fft_array = np.empty(rows.shape[:-2] + (fft_length, rows.shape[-1]),
+                         dtype='complex128')
+    columns = np.array_split(np.arange(rows.shape[-1]), workers)
+
+    def transform(cols):
+        fft_array[..., cols[0]:cols[-1]+1] = np.fft.fft(rows[..., cols[0]:cols[-1]+1],
+                                                       n=fft_length, axis=-2)
+
+    pool = ThreadPool(processes=workers)
+    try:
+        pool.map(transform, [cols for cols in columns if len(cols)])
+    finally:
+        pool.close()
+        pool.join()
+    return fft_array
+
+def _full_spectrum(fft_array, fft_length):
+    """Returns the shifted full spectrum from a real-input spectrum
+
+    Uses |F(ky, kx)| = |F(-ky, -kx)| for real images to fill in the
+    negative x frequencies, then moves the zero frequency to the center
+    """
+    full_array = np.empty((fft_length, fft_length))
+    half = fft_length//2
+    full_array[:, :half+1] = fft_array[:, :half+1]
+    # The fft_length - half - 1 negative frequencies (one fewer than the
+    # non-negative ones for even lengths, the same number for odd lengths)
+    full_array[:, half+1:] = fft_array[-np.arange(fft_length),
+                                       (fft_length-1)//2:0:-1]
+    return np.fft.fftshift(full_array)
+
+def _radial_sum(fft_array, max_freq):
+    """Sums the folded spectrum into integer radial frequency bins
+
+    Each point (j, i) with frequency sqrt(i**2 + j**2) <= max_freq is added
+    to its bin once, and points on the diagonal twice
+
+    Returns
+    -------
+    fft_list : 1D or 2D numpy.ndarray
+        sum of the spectrum in each bin (for each image of a stack)
+    weight_list : 1D numpy.ndarray
+        number of points added to each bin
+    """
+    bins, weights, weight_list = _radial_bins(max_freq)
+    if fft_array.ndim == 2:
+        fft_list = np.bincount(bins, weights=fft_array.ravel() * weights,
+                               minlength=max_freq + 1)
+        return fft_list, weight_list
+
+    # Offset the bins of each image in the stack so one bincount sums all
+    num_images = fft_array.shape[0]
+    stack_bins = bins + (max_freq + 1) * np.arange(num_images)[:, np.newaxis]
+    fft_list = np.bincount(stack_bins.ravel(),
+                           weights=(fft_array.reshape(num_images, -1)
+                                    * weights).ravel(),
+                           minlength=num_images * (max_freq + 1))
+    return fft_list.reshape(num_images, max_freq + 1), weight_list
+
+def _radial_bins(max_freq):
+    """Returns the (cached) radial bin of each point in a folded spectrum"""
+    if max_freq in _RADIAL_BINS:
+        return _RADIAL_BINS[max_freq]
+
+    j, i = np.indices((max_freq, max_freq))
+    freq = np.sqrt(i**2 + j**2)
+    weights = (freq <= max_freq).astype('float64')
+    weights[np.arange(max_freq), np.arange(max_freq)] *= 2.0
+    weights = weights.ravel()
+    bins = np.minimum(freq, max_freq).astype('int').ravel()
+    weight_list = np.bincount(bins, weights=weights, minlength=max_freq + 1)
+
+    _RADIAL_BINS.clear()
+    _RADIAL_BINS[max_freq] = (bins, weights, weight_list)
+    return _RADIAL_BINS[max_freq]
+
+_RADIAL_BINS = {}
+
+def _modal_noise_filter(image_obj, kernel_size=None, show_image=False,
+                        radius_factor=None, fiber_shape='circle',
+                        fiber_angle=0.0, lowpass='median', **kwargs):
     """Finds modal noise of image using a median filter comparison
 
     Find the difference between the image and the median filtered image. Take
@@ -235,7 +837,7 @@ def _modal_noise_filter(image_obj, kernel_size=None, show_image=False, radius_fa
 
     Args
     ----
-    image_obj : FiberImage
+    image_obj : FiberImage or ModalNoiseSession
         image object to analyze
     kernel_size : odd int, optional
         kernel side length to use for median filter
@@ -243,24 +845,38 @@ def _modal_noise_filter(image_obj, kernel_size=None, show_image=False, radius_fa
         whether or not to show images of the modal noise analysis
     radius_factor : float, optional
         fraction of the radius inside which the modal noise is calculated
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
+    lowpass : {'median', 'gaussian', 'box', 'decimate'}, optional
+        low-pass engine compared to the image. The alternatives to the
+        median are much faster approximations. See
+        numpy_array_handler.lowpass_image()
     """
-    image, center, radius = _get_image_data(image_obj, **kwargs)
+    session = _get_session(image_obj, **kwargs)
+    image, center, radius = session.image, session.center, session.radius
     if radius_factor is None:
         radius_factor = _get_radius_factor(radius)
     if kernel_size is None:
         kernel_size = 101
 
+    crop_radius = circumscribed_radius(radius, fiber_shape)
+
     zero_fill = False
-    if kernel_size > int((min(*image.shape) - 2*radius)):
+    if kernel_size > int((min(*image.shape) - 2*crop_radius)):
         zero_fill = True # Prevents edge effects due to large filters
 
-    image, center = crop_image(image, center, radius + (kernel_size+1)//2)
-    image_inten_array = intensity_array(image, center, radius*radius_factor)
-    
-    filtered_image = filter_image(image, kernel_size, zero_fill=zero_fill)
+    crop_radius += (kernel_size+1)//2
+    image, center = session.crop(crop_radius)
+    image_stats = session.statistics(None, radius*radius_factor, fiber_shape,
+                                     fiber_angle)
+
+    filtered_image = session.filtered(kernel_size, crop_radius, zero_fill,
+                                      lowpass)
     diff_image = image - filtered_image
-    diff_inten_array = intensity_array(diff_image, center,
-                                       radius*radius_factor)
+    diff_stats = session.statistics(diff_image, radius*radius_factor,
+                                    fiber_shape, fiber_angle, crop_radius)
     if show_image:
         plot_image(filtered_image)
         plot_image(diff_image)
@@ -272,9 +888,10 @@ def _modal_noise_filter(image_obj, kernel_size=None, show_image=False, radius_fa
         plot_cross_sections(diff_image, center)
         show_plots()
 
-    return diff_inten_array.std() / image_inten_array.mean()
+    return diff_stats.std / image_stats.mean
 
-def _modal_noise_tophat(image_obj, show_image=False, radius_factor=None, **kwargs):
+def _modal_noise_tophat(image_obj, show_image=False, radius_factor=None,
+                        fiber_shape='circle', fiber_angle=0.0, **kwargs):
     """Finds modal noise of image assumed to be a tophat
 
     Modal noise is defined as the variance across the fiber face normalized
@@ -282,67 +899,80 @@ def _modal_noise_tophat(image_obj, show_image=False, radius_factor=None, **kwarg
 
     Args
     ----
-    image_obj : FiberImage
+    image_obj : FiberImage or ModalNoiseSession
         image object to analyze
     show_image : bool, optional
         whether or not to show images of the modal noise analysis
     radius_factor : float, optional
         fraction of the radius inside which the modal noise is calculated
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
 
     Returns
     -------
     parameter : float
         STDEV / MEAN for the intensities inside the fiber face
     """
-    image, center, radius = _get_image_data(image_obj, **kwargs)
+    session = _get_session(image_obj, **kwargs)
+    image, center, radius = session.image, session.center, session.radius
     if radius_factor is None:
         radius_factor = _get_radius_factor(radius)
-    inten_array = intensity_array(image, center, radius*radius_factor)
+    stats = session.statistics(None, radius*radius_factor, fiber_shape,
+                               fiber_angle)
 
     if show_image:
-        tophat_fit = image_obj.get_tophat_fit()
+        tophat_fit = session.image_obj.get_tophat_fit()
         image, new_center = crop_image(image, center, radius*radius_factor)
         tophat_fit = crop_image(tophat_fit, center, radius*radius_factor)[0]
         plot_overlaid_cross_sections(image, tophat_fit, new_center)
         plot_image(tophat_fit)
         show_plots()
 
-    return inten_array.std() / inten_array.mean()
+    return stats.std / stats.mean
 
-def _modal_noise_contrast(image_obj, radius_factor=None, show_image=False, **kwargs):
+def _modal_noise_contrast(image_obj, radius_factor=None, show_image=False,
+                          fiber_shape='circle', fiber_angle=0.0, **kwargs):
     """Finds modal noise of image using Michelson contrast
 
     Modal noise is defined as (I_max - I_min) / (I_max + I_min)
 
     Args
     ----
-    image_obj : FiberImage
+    image_obj : FiberImage or ModalNoiseSession
         image object to analyze
     radius_factor : float, optional
         fraction of the radius inside which the modal noise is calculated
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
 
     Returns
     -------
     parameter : float
         (I_max - I_min) / (I_max + I_min) for intensities inside fiber face
     """
-    image, center, radius = _get_image_data(image_obj, **kwargs)
+    session = _get_session(image_obj, **kwargs)
+    radius = session.radius
     if radius_factor is None:
-        if image_obj.camera == 'ff':
+        if session.get_camera() == 'ff':
             radius_factor = 0.1
         else:
             radius_factor = _get_radius_factor(radius)
-    inten_array = intensity_array(image, center, radius*radius_factor)
+    stats = session.statistics(None, radius*radius_factor, fiber_shape,
+                               fiber_angle)
 
-    return (np.max(inten_array) - np.min(inten_array)) \
-           / (np.max(inten_array) + np.min(inten_array))
+    return (stats.max - stats.min) / (stats.max + stats.min)
 
-def _modal_noise_gradient(image_obj, show_image=False, radius_factor=None, **kwargs):
+def _modal_noise_gradient(image_obj, show_image=False, radius_factor=None,
+                          fiber_shape='circle', fiber_angle=0.0, **kwargs):
     """Finds modal noise of image using the image gradient
 
     Args
     ----
-    image_obj : FiberImage
+    image_obj : FiberImage or ModalNoiseSession
         image object to analyze
     show_image : bool, optional
         whether or not to show images of the modal noise analysis
@@ -350,16 +980,22 @@ def _modal_noise_gradient(image_obj, show_image=False, radius_factor=None, **kwa
         fraction of the radius inside which the modal noise is calculated
     fiber_method : str, optional
         method to use when calculating center and radius of fiber face
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
 
     Returns
     -------
     parameter : float
         STDEV / MEAN for the gradient in the fiber image
     """
-    image, center, radius = _get_image_data(image_obj, **kwargs)
+    session = _get_session(image_obj, **kwargs)
+    radius = session.radius
     if radius_factor is None:
         radius_factor = _get_radius_factor(radius)
-    image, center = crop_image(image, center, radius)
+    crop_radius = circumscribed_radius(radius, fiber_shape)
+    image, center = session.crop(crop_radius)
 
     gradient_y, gradient_x = np.gradient(image)
     gradient_array = np.sqrt(gradient_x**2 + gradient_y**2)
@@ -369,11 +1005,15 @@ def _modal_noise_gradient(image_obj, show_image=False, radius_factor=None, **kwa
         plot_overlaid_cross_sections(image, gradient_array, center)
         show_plots()
 
-    inten_array = intensity_array(gradient_array, center, radius*radius_factor)
-    image_inten_array = intensity_array(image, center, radius*radius_factor)
-    return inten_array.std() / image_inten_array.mean()
+    gradient_stats = session.statistics(gradient_array, radius*radius_factor,
+                                        fiber_shape, fiber_angle, crop_radius)
+    image_stats = session.statistics(None, radius*radius_factor, fiber_shape,
+                                     fiber_angle)
+    return gradient_stats.std / image_stats.mean
 
-def _modal_noise_polynomial(image_obj, show_image=False, radius_factor=None, deg=6, **kwargs):
+def _modal_noise_polynomial(image_obj, show_image=False, radius_factor=None,
+                            deg=6, fiber_shape='circle', fiber_angle=0.0,
+                            **kwargs):
     """Finds modal noise of image using polynomial fit
 
     Crops image exactly around the circumference of the circle and fits a
@@ -383,7 +1023,7 @@ def _modal_noise_polynomial(image_obj, show_image=False, radius_factor=None, deg
 
     Args
     ----
-    image_obj : FiberImage
+    image_obj : FiberImage or ModalNoiseSession
         image object to analyze
     show_image : bool, optional
         whether or not to show images of the modal noise analysis
@@ -391,6 +1031,10 @@ def _modal_noise_polynomial(image_obj, show_image=False, radius_factor=None, deg
         fraction of the radius inside which the modal noise is calculated
     deg : float, optional
         degree of the fitted polynomial
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
 
     Returns
     -------
@@ -398,10 +1042,14 @@ def _modal_noise_polynomial(image_obj, show_image=False, radius_factor=None, deg
         STDEV for the difference between the fiber image and poly_fit
         divided by the mean of the fiber image intensities
     """
-    image, center, radius = _get_image_data(image_obj, **kwargs)
+    session = _get_session(image_obj, **kwargs)
+    image, center, radius = session.image, session.center, session.radius
     if radius_factor is None:
         radius_factor = _get_radius_factor(radius)
-    poly_fit = image_obj.get_polynomial_fit(deg, radius_factor, **kwargs)
+    # Fit over the circle that circumscribes the analyzed fiber face
+    poly_fit = polynomial_fit(image, deg, center,
+                              circumscribed_radius(radius*radius_factor,
+                                                   fiber_shape))
 
     if show_image:
         plot_overlaid_cross_sections(image, poly_fit, center)
@@ -409,9 +1057,11 @@ def _modal_noise_polynomial(image_obj, show_image=False, radius_factor=None, deg
         show_plots()
 
     diff_array = image - poly_fit
-    inten_array = intensity_array(diff_array, center, radius * radius_factor)
-    image_inten_array = intensity_array(image, center, radius * radius_factor)
-    return inten_array.std() / image_inten_array.mean()
+    diff_stats = session.statistics(diff_array, radius*radius_factor,
+                                    fiber_shape, fiber_angle)
+    image_stats = session.statistics(None, radius*radius_factor, fiber_shape,
+                                     fiber_angle)
+    return diff_stats.std / image_stats.mean
 
 def _modal_noise_gaussian(image_obj, show_image=False, radius_factor=None, **kwargs):
     """Finds modal noise of image using a gaussian fit
@@ -423,7 +1073,7 @@ def _modal_noise_gaussian(image_obj, show_image=False, radius_factor=None, **kwa
 
     Args
     ----
-    image_obj : FiberImage
+    image_obj : FiberImage or ModalNoiseSession
         image object to analyze
     show_image : bool, optional
         whether or not to show images of the modal noise analysis
@@ -436,11 +1086,12 @@ def _modal_noise_gaussian(image_obj, show_image=False, radius_factor=None, **kwa
         STDEV for the difference between the fiber image and gauss_fit
         divided by the mean of the fiber image intensities
     """
-    image, center, radius = _get_image_data(image_obj, **kwargs)
+    session = _get_session(image_obj, **kwargs)
+    image, center, radius = session.image, session.center, session.radius
     if radius_factor is None:
         radius_factor = _get_radius_factor(radius)
 
-    gauss_fit = image_obj.get_gaussian_fit()
+    gauss_fit = session.gaussian_fit()
 
     if show_image:
         plot_overlaid_cross_sections(image, gauss_fit, center)
@@ -448,16 +1099,17 @@ def _modal_noise_gaussian(image_obj, show_image=False, radius_factor=None, **kwa
         show_plots()
 
     diff_array = image - gauss_fit
-    inten_array = intensity_array(diff_array, center, radius*np.sqrt(2))
-    image_inten_array = intensity_array(image, center, radius*np.sqrt(2))
-    return np.std(inten_array) / np.mean(image_inten_array)
+    diff_stats = session.statistics(diff_array, radius*np.sqrt(2))
+    image_stats = session.statistics(None, radius*np.sqrt(2))
+    return diff_stats.std / image_stats.mean
 
-def _modal_noise_gini(image_obj, show_image=False, radius_factor=None, **kwargs):
+def _modal_noise_gini(image_obj, show_image=False, radius_factor=None,
+                      fiber_shape='circle', fiber_angle=0.0, **kwargs):
     """Find modal noise of image using Gini coefficient
 
     Args
     ----
-    image_obj : FiberImage
+    image_obj : FiberImage or ModalNoiseSession
         image object to analyze
     show_image : bool, optional
         whether or not to show images of the modal noise analysis
@@ -465,17 +1117,23 @@ def _modal_noise_gini(image_obj, show_image=False, radius_factor=None, **kwargs)
         fraction of the radius inside which the modal noise is calculated
     fiber_method : str, optional
         method to use when calculating center and radius of fiber face
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
 
     Returns
     -------
     parameter : float
         Gini coefficient for intensities inside the fiber face
     """
-    image, center, radius = _get_image_data(image_obj, **kwargs)
+    session = _get_session(image_obj, **kwargs)
+    radius = session.radius
     if radius_factor is None:
         radius_factor = _get_radius_factor(radius)
 
-    return _gini_coefficient(intensity_array(image, center, radius*radius_factor))
+    return session.statistics(None, radius*radius_factor, fiber_shape,
+                              fiber_angle, gini=True).gini
 
 def _gini_coefficient(test_array):
     """Finds gini coefficient for intensities in given array
@@ -490,38 +1148,87 @@ def _gini_coefficient(test_array):
     gini_coefficient : float
         Sum( |I_i - I_j| {(i,j), n} ) / ( 2 * n * Sum( I_i, {i, n} ) )
     """
-    test_array = test_array.ravel()
-    gini_coeff = 0.0
-    for i in xrange(test_array.size):
-        gini_coeff += np.abs(test_array[i] - test_array).sum()
-    norm = 2.0 * test_array.sum() * test_array.size
+    return intensity_statistics(test_array.ravel(), gini=True).gini
 
-    return gini_coeff / norm
-
-def _modal_noise_entropy(image_obj, show_image=False, radius_factor=None, **kwargs):
+def _modal_noise_entropy(image_obj, show_image=False, radius_factor=None,
+                         fiber_shape='circle', fiber_angle=0.0, **kwargs):
     """Find modal noise of image using hartley entropy
 
     Args
     ----
-    image_obj : FiberImage
+    image_obj : FiberImage or ModalNoiseSession
         image object to analyze
     show_image : bool, optional
         whether or not to show images of the modal noise analysis
     radius_factor : float, optional
         fraction of the radius inside which the modal noise is calculated
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
 
     Returns
     -------
     parameter : float
         hartley entropy for intensities inside fiber face
     """
-    image, center, radius = _get_image_data(image_obj, **kwargs)
+    session = _get_session(image_obj, **kwargs)
+    radius = session.radius
     if radius_factor is None:
         radius_factor = _get_radius_factor(radius)
 
-    inten_array = intensity_array(image, center, radius*radius_factor)
-    inten_array = inten_array / np.sum(inten_array)
-    return np.sum(-inten_array * np.log10(inten_array))
+    return session.statistics(None, radius*radius_factor, fiber_shape,
+                              fiber_angle).entropy
+
+def _modal_noise_multiscale(image_obj, levels=None, pyramid='gaussian',
+                            show_image=False, radius_factor=None,
+                            fiber_shape='circle', fiber_angle=0.0, **kwargs):
+    """Finds modal noise of image at each spatial scale using a pyramid
+
+    The fiber face is split into octave wide band-pass images in a single
+    pass and the contrast of each band is found. This replaces running the
+    filter method at several kernel sizes. Stacks of frames can be analyzed
+    with numpy_array_handler.multiscale_contrast()
+
+    Args
+    ----
+    image_obj : FiberImage or ModalNoiseSession
+        image object to analyze
+    levels : int, optional
+        number of octaves. See numpy_array_handler.multiscale_contrast()
+    pyramid : {'gaussian', 'box'}, optional
+        See numpy_array_handler.laplacian_pyramid()
+    show_image : bool, optional
+        whether or not to show images of the modal noise analysis
+    radius_factor : float, optional
+        fraction of the radius inside which the modal noise is calculated
+    fiber_shape : str or int, optional
+        shape of the fiber face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a polygonal fiber face
+
+    Returns
+    -------
+    parameters : 1D numpy.ndarray
+        STDEV of each band-pass image divided by the mean of the fiber
+        image intensities. Index k covers structure of about 2**k to
+        2**(k+1) pixels
+    """
+    session = _get_session(image_obj, **kwargs)
+    image, center, radius = session.image, session.center, session.radius
+    if radius_factor is None:
+        radius_factor = _get_radius_factor(radius)
+
+    contrast, bands = multiscale_contrast(image, center, radius*radius_factor,
+                                          levels, pyramid, fiber_shape,
+                                          fiber_angle, full_output=True)
+
+    if show_image:
+        for band in bands:
+            plot_image(band)
+        show_plots()
+
+    return contrast
 
 #=============================================================================#
 #==== Modal Noise Test =======================================================#
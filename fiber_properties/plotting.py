@@ -4,26 +4,104 @@ characterization on the EXtreme PREcision Spectrograph
 The functions in this module are used to plot graphs and images relevant to
 the FiberProperties package
 """
-import matplotlib.pyplot as plt
 from collections import Iterable
+import os
+import sys
 import numpy as np
 from .numpy_array_handler import sum_rows, sum_columns
 from .input_output import create_directory
-plt.rc('figure', figsize=[3.39, 3.0])
-plt.rc('text', usetex=True)
 
-plt.rc('font', size=10, family='serif', serif=['Computer Modern Roman'])
-plt.rc('axes', labelsize=10, linewidth=1)
-plt.rc('legend', frameon=True, fontsize=8, labelspacing=0.3, numpoints=1)
-plt.rc('lines', linewidth=1)
-
-plt.rc('xtick', labelsize=10)
-plt.rc('xtick.major', size=4, width=1)
-plt.rc('xtick.minor', visible=True, size=2, width=1)
+#=============================================================================#
+#===== Matplotlib Loading ====================================================#
+#=============================================================================#
 
-plt.rc('ytick', labelsize=10)
-plt.rc('ytick.major', size=4, width=1)
-plt.rc('ytick.minor', visible=True, size=2, width=1)
+def set_headless(headless=True):
+    """Sets whether matplotlib may be imported
+
+    Headless processes (e.g. pool workers) never import matplotlib, and
+    plotting raises a RuntimeError instead. Also set by the
+    FIBER_PROPERTIES_HEADLESS environment variable, which is inherited by
+    worker processes
+
+    Raises
+    ------
+    RuntimeError
+        if matplotlib was already loaded by this module
+    """
+    global _HEADLESS
+    if headless and _PYPLOT:
+        raise RuntimeError('matplotlib is already loaded')
+    _HEADLESS = headless
+
+def is_headless():
+    """Whether matplotlib is disabled"""
+    return _HEADLESS
+
+def get_pyplot():
+    """Returns matplotlib.pyplot, importing it and setting the styles once
+
+    Raises
+    ------
+    RuntimeError
+        in headless mode
+    """
+    if not _PYPLOT:
+        if _HEADLESS:
+            raise RuntimeError('Plotting is disabled in headless mode')
+        import matplotlib.pyplot as pyplot
+        _set_style(pyplot)
+        _PYPLOT.append(pyplot)
+    return _PYPLOT[0]
+
+def _set_style(plt):
+    """Sets the package styles that are still at their defaults
+
+    Settings a script made with plt.rc() before the first package plot are
+    kept, as they were when the styles were set on import
+    """
+    from matplotlib import rcParamsOrig
+    for key, value in _STYLE:
+        if plt.rcParams[key] == rcParamsOrig[key]:
+            plt.rcParams[key] = value
+
+_STYLE = [('figure.figsize', [3.39, 3.0]),
+          ('text.usetex', True),
+          ('font.size', 10),
+          ('font.family', ['serif']),
+          ('font.serif', ['Computer Modern Roman']),
+          ('axes.labelsize', 10),
+          ('axes.linewidth', 1),
+          ('legend.frameon', True),
+          ('legend.fontsize', 8),
+          ('legend.labelspacing', 0.3),
+          ('legend.numpoints', 1),
+          ('lines.linewidth', 1),
+          ('xtick.labelsize', 10),
+          ('xtick.major.size', 4),
+          ('xtick.major.width', 1),
+          ('xtick.minor.visible', True),
+          ('xtick.minor.size', 2),
+          ('xtick.minor.width', 1),
+          ('ytick.labelsize', 10),
+          ('ytick.major.size', 4),
+          ('ytick.major.width', 1),
+          ('ytick.minor.visible', True),
+          ('ytick.minor.size', 2),
+          ('ytick.minor.width', 1)]
+
+class _LazyPyplot(object):
+    """Stands in for matplotlib.pyplot until a plot is made"""
+    def __getattr__(self, name):
+        return getattr(get_pyplot(), name)
+
+_HEADLESS = os.environ.get('FIBER_PROPERTIES_HEADLESS', '') not in ('', '0')
+_PYPLOT = []
+plt = _LazyPyplot()
+
+# Scripts that imported pyplot first get the styles now, as they did before
+# pyplot was loaded lazily
+if 'matplotlib.pyplot' in sys.modules and not _HEADLESS:
+    get_pyplot()
 
 #=============================================================================#
 #===== General Use Functions =================================================#
@@ -117,7 +195,7 @@ def show_image(image):
 #===== FCS Stability Plotting ================================================#
 #=============================================================================#
 
-def plot_stability(data, cam):
+def plot_stability(data, cam, quantity='drift'):
     sigma = np.sqrt(np.std(data.x_diff)**2 + np.std(data.y_diff)**2)
     max_sg = np.median(data.diameter) / sigma
 
@@ -125,13 +203,13 @@ def plot_stability(data, cam):
 
     plt.subplot(311)
     plt.plot(data.time, data.x_diff)
-    plt.ylabel('x drift ($\mu m$)', fontsize='small')
+    plt.ylabel('x %s ($\mu m$)' % quantity, fontsize='small')
     plt.title(r'$\sigma_{%s}= %.3f um, SG_{max} = %d$' % (cam, sigma, max_sg))
     plt.xlim(min(data.time), max(data.time))
 
     plt.subplot(312)
     plt.plot(data.time, data.y_diff)
-    plt.ylabel('y drift ($\mu m$)', fontsize='small')
+    plt.ylabel('y %s ($\mu m$)' % quantity, fontsize='small')
     plt.xlim(min(data.time), max(data.time))
 
     plt.subplot(313)
@@ -140,8 +218,8 @@ def plot_stability(data, cam):
     plt.ylabel('diameter ($\mu m$)', fontsize='small')
     plt.xlim(min(data.time), max(data.time))
 
-def plot_stability_binned(data, cam, bin_size):
-    plot_stability(data, cam)
+def plot_stability_binned(data, cam, bin_size, quantity='drift'):
+    plot_stability(data, cam, quantity)
 
     half_bin = bin_size / 2
     time = data.time[half_bin:len(data.time)-half_bin]
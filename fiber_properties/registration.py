@@ -0,0 +1,295 @@
+"""registration.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+This module contains functions that measure the sub-pixel translation of
+FCS images relative to a reference image using FFT phase correlation. Only
+a few FFTs are needed per frame, so the drift of a long series of frames can
+be found without running the centering search on every frame
+"""
+from collections import Iterable, OrderedDict
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+import hashlib
+import numpy as np
+from .fiber_image import FiberImage
+from .numpy_array_handler import circumscribed_radius
+from .containers import RegistrationInfo
+from .instrumentation import record_array
+
+# Reference spectra keyed by reference contents, ROI, and window. Bounded
+# by count since the spectra are small compared to the images
+_REFERENCE_CACHE = OrderedDict()
+_REFERENCE_CACHE_SIZE = 16
+
+#=============================================================================#
+#===== Image Registration ====================================================#
+#=============================================================================#
+
+def register_images(reference, images, roi=None, upsample_factor=20,
+                    window=True, threads=None, batch_size=8):
+    """Measures the translation of each image relative to the reference
+
+    Phase correlation is calculated for the region of interest of every
+    image and the integer peak is refined to 1/upsample_factor pixels with a
+    matrix-multiply DFT evaluated only around the peak. Images are handled
+    in batches (one stacked FFT per batch) spread over a thread pool
+
+    Args
+    ----
+    reference : 2D numpy.ndarray
+        image the translations are measured against
+    images : iterable(2D numpy.ndarray)
+        images with the same shape as the reference. May be a generator so
+        that only a few batches are held in memory at once
+    roi : (int, int, int, int), optional
+        (top, bottom, left, right) of the region used for the correlation.
+        The full image is used if None. Translations must be much smaller
+        than the region
+    upsample_factor : int, optional
+        shifts are measured to 1/upsample_factor pixels
+    window : bool, optional
+        whether to apply a Hann window to the region before transforming
+    threads : int, optional
+        number of threads used. If None, uses the number of CPUs
+    batch_size : int, optional
+        number of images transformed together in each task
+
+    Returns
+    -------
+    info : RegistrationInfo
+        shifts (pixels) of each image such that image(x, y) is approximately
+        reference(x - x_shift, y - y_shift). See containers.py for specifics
+    """
+    if roi is None:
+        roi = (0, reference.shape[0], 0, reference.shape[1])
+    ref_spectrum = reference_spectrum(reference, roi, window)
+
+    if threads is None:
+        threads = cpu_count()
+    batches = _batches(images, batch_size)
+
+    info = RegistrationInfo()
+    if threads > 1:
+        pool = ThreadPool(processes=threads)
+        try:
+            results = pool.imap(lambda batch: _register_batch(ref_spectrum, batch,
+                                                              roi, upsample_factor,
+                                                              window),
+                                batches)
+            for result in results:
+                _append_results(info, result)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for batch in batches:
+            _append_results(info, _register_batch(ref_spectrum, batch, roi,
+                                                  upsample_factor, window))
+    return info
+
+def phase_correlation(reference, image, roi=None, upsample_factor=20,
+                      window=True):
+    """Measures the translation of a single image relative to the reference
+
+    Args
+    ----
+    reference : 2D numpy.ndarray
+    image : 2D numpy.ndarray
+    roi, upsample_factor, window :
+        see register_images()
+
+    Returns
+    -------
+    x_shift : float
+    y_shift : float
+    correlation : float
+        height of the normalized phase correlation peak (1 for a perfect
+        translation, near 0 for unrelated images)
+    """
+    info = register_images(reference, [image], roi, upsample_factor, window,
+                           threads=1)
+    return info.x_shift[0], info.y_shift[0], info.correlation[0]
+
+def reference_spectrum(reference, roi, window=True):
+    """Returns the (cached) conjugate spectrum of the reference region
+
+    Args
+    ----
+    reference : 2D numpy.ndarray
+    roi : (int, int, int, int)
+        (top, bottom, left, right) of the region
+    window : bool, optional
+        whether to apply a Hann window to the region before transforming
+
+    Returns
+    -------
+    spectrum : 2D numpy.ndarray (complex)
+    """
+    top, bottom, left, right = roi
+    region = np.ascontiguousarray(reference[top:bottom, left:right],
+                                  dtype='float64')
+    key = (hashlib.sha1(region).hexdigest(), region.shape, tuple(roi),
+           bool(window))
+    if key in _REFERENCE_CACHE:
+        _REFERENCE_CACHE[key] = _REFERENCE_CACHE.pop(key)
+        return _REFERENCE_CACHE[key]
+
+    spectrum = np.conj(np.fft.fft2(_prepare_regions(region, window)))
+    spectrum.flags.writeable = False
+
+    _REFERENCE_CACHE[key] = spectrum
+    while len(_REFERENCE_CACHE) > _REFERENCE_CACHE_SIZE:
+        _REFERENCE_CACHE.popitem(last=False)
+    return spectrum
+
+def clear_reference_cache():
+    """Empties the cache of reference spectra used by register_images()"""
+    _REFERENCE_CACHE.clear()
+
+def _batches(images, batch_size):
+    """Yields lists of at most batch_size images"""
+    batch = []
+    for image in images:
+        batch.append(image)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _prepare_regions(regions, window):
+    """Removes the mean and applies a Hann window over the last two axes"""
+    regions = regions - regions.mean(axis=(-2, -1), keepdims=True)
+    if window:
+        regions *= np.outer(np.hanning(regions.shape[-2]),
+                            np.hanning(regions.shape[-1]))
+    return regions
+
+def _register_batch(ref_spectrum, batch, roi, upsample_factor, window):
+    """Returns a list of (x_shift, y_shift, correlation) for a batch"""
+    top, bottom, left, right = roi
+    regions = np.array([image[top:bottom, left:right] for image in batch],
+                       dtype='float64')
+    spectra = np.fft.fft2(_prepare_regions(regions, window))
+    record_array(spectra)
+    spectra *= ref_spectrum
+    spectra /= np.maximum(np.abs(spectra), np.finfo(float).tiny)
+    correlations = np.fft.ifft2(spectra).real
+
+    height, width = ref_spectrum.shape
+    results = []
+    for spectrum, correlation in zip(spectra, correlations):
+        y_peak, x_peak = np.unravel_index(np.argmax(correlation),
+                                          correlation.shape)
+        # Peaks past the midpoint correspond to negative shifts
+        if y_peak > height // 2:
+            y_peak -= height
+        if x_peak > width // 2:
+            x_peak -= width
+        peak = correlation.max()
+
+        if upsample_factor > 1:
+            y_peak, x_peak, peak = _refine_peak(spectrum, float(y_peak),
+                                                float(x_peak), upsample_factor)
+        results.append((x_peak, y_peak, peak))
+    return results
+
+def _refine_peak(spectrum, y_peak, x_peak, upsample_factor):
+    """Refines the correlation peak using a local upsampled DFT
+
+    The inverse DFT is evaluated directly on a grid of 1/upsample_factor
+    pixels spanning 1.5 pixels around the integer peak
+    """
+    size = int(np.ceil(1.5 * upsample_factor))
+    offsets = (np.arange(size) - size // 2) / float(upsample_factor)
+
+    height, width = spectrum.shape
+    y_kernel = np.exp(2j * np.pi * np.outer(y_peak + offsets,
+                                            np.fft.fftfreq(height)))
+    x_kernel = np.exp(2j * np.pi * np.outer(np.fft.fftfreq(width),
+                                            x_peak + offsets))
+    upsampled = np.dot(np.dot(y_kernel, spectrum), x_kernel).real
+
+    i, j = np.unravel_index(np.argmax(upsampled), upsampled.shape)
+    return (y_peak + offsets[i], x_peak + offsets[j],
+            upsampled[i, j] / (height * width))
+
+def _append_results(info, results):
+    for x_shift, y_shift, correlation in results:
+        info.x_shift.append(x_shift)
+        info.y_shift.append(y_shift)
+        info.correlation.append(correlation)
+
+#=============================================================================#
+#===== Fiber Drift ===========================================================#
+#=============================================================================#
+
+def fiber_drift(image_objs, reference=0, method=None, radius_factor=1.2,
+                units='pixels', fiber_shape='circle', **kwargs):
+    """Measures the drift of the fiber image in a series of frames
+
+    The fiber center is found once in the reference frame to define the
+    region of interest. Every frame (including the reference) is then
+    registered against the reference with register_images()
+
+    Args
+    ----
+    image_objs : list(FiberImage) or list(str)
+        list of the FiberImage objects or saved object file names
+    reference : int, optional
+        index of the reference frame in image_objs
+    method : str, optional
+        centering method used to locate the fiber in the reference frame
+    radius_factor : float, optional
+        half-width of the region of interest in units of the fiber radius
+    units : {'pixels', 'microns'}, optional
+        units of the returned shifts
+    fiber_shape : str, optional
+        shape of the fiber face. The region of interest covers its
+        circumscribed circle
+    **kwargs :
+        keyworded arguments passed to register_images()
+
+    Returns
+    -------
+    info : RegistrationInfo
+        Object containing the shift and time of every frame relative to the
+        reference. See containers.py for specifics
+    """
+    if not isinstance(image_objs, Iterable) or isinstance(image_objs, basestring):
+        image_objs = [image_objs]
+    if reference < 0:
+        reference += len(image_objs)
+
+    ref_obj = image_objs[reference]
+    if isinstance(ref_obj, basestring):
+        ref_obj = FiberImage(ref_obj)
+    ref_image = ref_obj.get_image()
+    center = ref_obj.get_fiber_center(method=method)
+    radius = circumscribed_radius(ref_obj.get_fiber_radius(method=method),
+                                  fiber_shape) * radius_factor
+
+    roi = (max(0, int(center.y - radius)),
+           min(ref_image.shape[0], int(center.y + radius) + 1),
+           max(0, int(center.x - radius)),
+           min(ref_image.shape[1], int(center.x + radius) + 1))
+
+    # Each frame is read once, for both its image and its time
+    times = []
+    def load_images():
+        for i, obj in enumerate(image_objs):
+            if i == reference:
+                obj = ref_obj
+            elif isinstance(obj, basestring):
+                obj = FiberImage(obj)
+            times.append(obj.date_time)
+            yield obj.get_image()
+
+    info = register_images(ref_image, load_images(), roi=roi, **kwargs)
+    info.time = times
+
+    info.x_shift = [ref_obj.convert_pixels_to_units(shift, units)
+                    for shift in info.x_shift]
+    info.y_shift = [ref_obj.convert_pixels_to_units(shift, units)
+                    for shift in info.y_shift]
+    return info
@@ -0,0 +1,148 @@
+"""result_graph.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+This module contains the dependency graph used by FiberImage to keep track
+of which results are up to date. Each node is an input (e.g. the dark
+images) or a result (e.g. the radius method center). Changing a node
+invalidates exactly the nodes downstream of it. Large intermediate arrays
+(the corrected and filtered images) are held in a shared cache with a
+memory limit
+"""
+from collections import OrderedDict
+from itertools import count
+import threading
+
+class ResultGraph(object):
+    """Dependency graph of the inputs and results of an image object
+
+    Args
+    ----
+    dependencies : list((str, list(str)))
+        every node with the nodes it directly depends on, in an order where
+        each node comes after its dependencies
+
+    Attributes
+    ----------
+    dependencies : OrderedDict
+        node -> list of the nodes it directly depends on
+    """
+    def __init__(self, dependencies):
+        self.dependencies = OrderedDict(dependencies)
+        self._versions = dict.fromkeys(self.dependencies, 0)
+        self._computed = set()
+        self._token = next(_GRAPH_TOKENS)
+
+    def __getstate__(self):
+        # Versions only identify cached arrays, which are never stored
+        return {'dependencies': [[node, list(parents)] for node, parents
+                                 in self.dependencies.items()],
+                'computed': sorted(self._computed)}
+
+    def __setstate__(self, state):
+        self.__init__(state['dependencies'])
+        self._computed = set(state['computed'])
+
+    def nodes(self):
+        """Return the nodes in dependency order"""
+        return list(self.dependencies)
+
+    def dependents(self, node):
+        """Return every node downstream of node in dependency order"""
+        downstream = set([node])
+        result = []
+        for other, parents in self.dependencies.items():
+            if any(parent in downstream for parent in parents):
+                downstream.add(other)
+                result.append(other)
+        return result
+
+    def upstream(self, node):
+        """Return every node node depends on in dependency order"""
+        upstream = set(self.dependencies[node])
+        for other in reversed(self.dependencies):
+            if other in upstream:
+                upstream.update(self.dependencies[other])
+        return [other for other in self.dependencies if other in upstream]
+
+    def is_computed(self, node):
+        """Whether the result at node is up to date"""
+        return node in self._computed
+
+    def version(self, node):
+        """Return a number that changes whenever node is invalidated"""
+        return self._versions[node]
+
+    def mark_computed(self, node):
+        """Record that the result at node has been calculated"""
+        self._computed.add(node)
+
+    def invalidate(self, node, include_node=True):
+        """Mark node (optionally) and every node downstream as out of date
+
+        Returns
+        -------
+        invalidated : list(str)
+            nodes whose stored results must be cleared, in dependency order
+        """
+        nodes = self.dependents(node)
+        if include_node:
+            nodes.insert(0, node)
+        for other in nodes:
+            self._versions[other] += 1
+            self._computed.discard(other)
+        return nodes
+
+    def status(self):
+        """Return an OrderedDict of node -> whether it is up to date"""
+        return OrderedDict((node, node in self._computed)
+                           for node in self.dependencies)
+
+    def describe(self):
+        """Return a readable summary of the graph and its state"""
+        lines = []
+        for node, parents in self.dependencies.items():
+            lines.append('%-20s %-8s <- %s' % (node,
+                                               'done' if node in self._computed
+                                               else '-',
+                                               ', '.join(parents) or '(input)'))
+        return '\n'.join(lines)
+
+    def get_array(self, node, func):
+        """Return the array at node, calculating it with func if needed
+
+        The array is shared and read-only. It stays in a cache shared by
+        every graph (limited to CACHE_BYTES) until node is invalidated
+        """
+        key = (self._token, node, self._versions[node])
+        with _ARRAY_LOCK:
+            if key in _ARRAY_CACHE:
+                _ARRAY_CACHE[key] = _ARRAY_CACHE.pop(key)
+                return _ARRAY_CACHE[key]
+
+        array = func()
+        if array is None:
+            return None
+        array.flags.writeable = False
+        self.mark_computed(node)
+
+        with _ARRAY_LOCK:
+            # Drop older versions of this node
+            for other in [other for other in _ARRAY_CACHE
+                          if other[:2] == key[:2]]:
+                del _ARRAY_CACHE[other]
+            _ARRAY_CACHE[key] = array
+            total = sum(value.nbytes for value in _ARRAY_CACHE.values())
+            while total > CACHE_BYTES and len(_ARRAY_CACHE) > 1:
+                total -= _ARRAY_CACHE.popitem(last=False)[1].nbytes
+        return array
+
+def clear_array_cache():
+    """Empties the cache of images shared by every ResultGraph"""
+    with _ARRAY_LOCK:
+        _ARRAY_CACHE.clear()
+
+_GRAPH_TOKENS = count()
+_ARRAY_CACHE = OrderedDict()
+_ARRAY_LOCK = threading.Lock()
+# Memory limit of the cached images. At least the latest array is kept
+CACHE_BYTES = 2**29
@@ -0,0 +1,324 @@
+"""results_index.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+This module contains a SQLite backed index of analysis results. Centers,
+diameters, centroids, modal noise, FRD, and scrambling gain results are
+recorded with their test, camera, method, parameters, and source files so
+they can be compared across tests without loading any images or objects
+"""
+from io import BytesIO
+from datetime import datetime
+import json
+import sqlite3
+import numpy as np
+from .containers import FFTInfo
+
+# Methods of the FiberInfo containers in a FiberImage
+_FIBER_METHODS = ['edge', 'radius', 'circle', 'gaussian', 'rectangle',
+                  'polygon', 'full']
+
+class ResultsIndex(object):
+    """Index of analysis results stored in a SQLite database
+
+    Each result is a scalar value or a 1D array identified by its test,
+    camera, quantity, method, and parameters. Recording the same result
+    again replaces the earlier entry
+
+    Args
+    ----
+    db_file : str, optional
+        location of the database file. Created if it does not exist. Use
+        ':memory:' for a temporary index
+
+    Attributes
+    ----------
+    db_file : str
+    """
+    def __init__(self, db_file='results.db'):
+        self.db_file = db_file
+        self._connection = sqlite3.connect(db_file)
+        self._connection.executescript(_CREATE_TABLES)
+
+    def close(self):
+        """Close the database connection"""
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    #=========================================================================#
+    #==== Recording Results ==================================================#
+    #=========================================================================#
+
+    def record(self, test, camera, quantity, value, method=None,
+               parameters=None, source=None, units='pixels'):
+        """Record a single result
+
+        Args
+        ----
+        test : str
+            name of the test (e.g. folder or FITS OBJECT keyword)
+        camera : str
+            'in', 'nf', or 'ff'
+        quantity : str
+            name of the result (e.g. 'center_x', 'modal_noise')
+        value : number or array_like
+            scalar value or 1D array
+        method : str, optional
+            method used to calculate the result
+        parameters : dict, optional
+            keyworded arguments used to calculate the result
+        source : str or list(str), optional
+            files the result was calculated from
+        units : str, optional
+            units of the value
+        """
+        self.record_many([(test, camera, quantity, value, method, parameters,
+                           source, units)])
+
+    def record_many(self, results):
+        """Record a list of (test, camera, quantity, value, method,
+        parameters, source, units) tuples in a single transaction"""
+        rows = []
+        for test, camera, quantity, value, method, parameters, source, units in results:
+            if value is None:
+                continue
+            if isinstance(source, basestring):
+                source = [source]
+            if np.ndim(value) == 0:
+                scalar, array = float(value), None
+            else:
+                scalar, array = None, sqlite3.Binary(_array_to_bytes(value))
+            rows.append((test, camera, quantity, _method_key(method),
+                         _parameters_key(parameters), units, scalar, array,
+                         json.dumps(source), datetime.now().isoformat()))
+        with self._connection:
+            self._connection.executemany(_INSERT_RESULT, rows)
+
+    def record_image(self, image_obj, test=None, parameters=None,
+                     units='pixels'):
+        """Record every result already calculated for a FiberImage
+
+        Nothing is recalculated. Centers, diameters, and centroids of every
+        method that has been run, the modal noise results, and the FRD
+        results are recorded
+
+        Args
+        ----
+        image_obj : FiberImage
+        test : str, optional
+            name of the test. If None, uses image_obj.test or its folder
+        parameters : dict, optional
+            keyworded arguments used for the analysis
+        units : {'pixels', 'microns'}, optional
+            units of the recorded centers, diameters, and centroids
+        """
+        if test is None:
+            test = image_obj.test if image_obj.test is not None else image_obj.folder
+        camera = image_obj.camera
+        source = image_obj.image_input
+        if not isinstance(source, (basestring, list, tuple)):
+            source = image_obj.object_file
+        elif isinstance(source, (list, tuple)):
+            source = [item for item in source if isinstance(item, basestring)]
+
+        results = []
+        def add(quantity, value, method=None, result_units=units):
+            results.append((test, camera, quantity, value, method, parameters,
+                            source, result_units))
+
+        for method in _FIBER_METHODS:
+            for quantity, info in [('center', image_obj._center),
+                                   ('centroid', image_obj._centroid)]:
+                pixel = getattr(info, method, None)
+                if pixel is not None and pixel.x is not None:
+                    add(quantity + '_x',
+                        image_obj.convert_pixels_to_units(pixel.x, units), method)
+                    add(quantity + '_y',
+                        image_obj.convert_pixels_to_units(pixel.y, units), method)
+            diameter = getattr(image_obj._diameter, method, None)
+            if diameter is not None:
+                add('diameter', image_obj.convert_pixels_to_units(diameter, units),
+                    method)
+
+        for method, value in vars(image_obj._modal_noise_info).items():
+            if isinstance(value, FFTInfo):
+                add('modal_noise_power', value.power, method, None)
+                add('modal_noise_freq', value.freq, method, '1/microns')
+            else:
+                add('modal_noise', value, method, None)
+
+        frd_info = image_obj._frd_info
+        if np.ndim(frd_info.input_fnum) == 0 and frd_info.encircled_energy:
+            add('frd_output_fnum', frd_info.output_fnum, None, None)
+            add('frd_energy_loss', frd_info.energy_loss, None, 'percent')
+            add('frd_encircled_energy', frd_info.encircled_energy, None, None)
+            add('frd_encircled_energy_fnum', frd_info.encircled_energy_fnum,
+                None, None)
+
+        self.record_many(results)
+
+    def record_scrambling_gain(self, info, test, camera='nf', parameters=None,
+                               source=None):
+        """Record the results of scrambling_gain.scrambling_gain()
+
+        Args
+        ----
+        info : ScramblingInfo
+        test : str
+        camera : str, optional
+        parameters : dict, optional
+        source : list(str), optional
+            See record()
+        """
+        self.record_many([(test, camera, 'scrambling_' + quantity,
+                           getattr(info, quantity), None, parameters, source,
+                           None)
+                          for quantity in ['in_x', 'in_y', 'out_x', 'out_y',
+                                           'scrambling_gain', 'in_d', 'out_d']
+                          if len(getattr(info, quantity))])
+
+    #=========================================================================#
+    #==== Querying Results ===================================================#
+    #=========================================================================#
+
+    def query(self, quantity, method=None, test=None, camera=None,
+              parameters=None):
+        """Return the matching results as a numpy record array
+
+        Args
+        ----
+        quantity : str
+            name of the result
+        method : str, optional
+        test : str, optional
+            May include SQL LIKE wildcards (e.g. '2017-03-%')
+        camera : str, optional
+        parameters : dict, optional
+            exact keyworded arguments the result was recorded with
+
+        Returns
+        -------
+        results : numpy.recarray
+            fields test, camera, method, parameters, source, and value, ordered
+            by test. value is float for scalar results and an object array of
+            1D arrays otherwise
+        """
+        clauses = ['quantity = ?']
+        values = [quantity]
+        if method is not None:
+            clauses.append('method = ?')
+            values.append(_method_key(method))
+        if test is not None:
+            clauses.append('test LIKE ?' if '%' in test else 'test = ?')
+            values.append(test)
+        if camera is not None:
+            clauses.append('camera = ?')
+            values.append(camera)
+        if parameters is not None:
+            clauses.append('parameters = ?')
+            values.append(_parameters_key(parameters))
+
+        rows = self._connection.execute(
+            'SELECT test, camera, method, parameters, source, value, array '
+            'FROM results WHERE ' + ' AND '.join(clauses)
+            + ' ORDER BY test, camera, method, id', values).fetchall()
+
+        scalar = all(row[6] is None for row in rows)
+        results = np.recarray(len(rows), dtype=[('test', object),
+                                                ('camera', object),
+                                                ('method', object),
+                                                ('parameters', object),
+                                                ('source', object),
+                                                ('value', float if scalar
+                                                 else object)])
+        for i, row in enumerate(rows):
+            results[i] = (row[0], row[1], row[2] or None, json.loads(row[3]),
+                          json.loads(row[4]),
+                          row[5] if row[6] is None
+                          else _bytes_to_array(row[6]))
+        return results
+
+    def values(self, quantity, method=None, test=None, camera=None,
+               parameters=None):
+        """Return only the values of query()
+
+        Returns
+        -------
+        values : 1D numpy.ndarray, or 2D if every result is an equally long
+            array
+        """
+        values = self.query(quantity, method, test, camera, parameters).value
+        if values.dtype == object and len(values) and len(set(
+                len(value) for value in values)) == 1:
+            return np.vstack(values)
+        return np.asarray(values)
+
+    def tests(self, quantity=None):
+        """Return the names of the recorded tests (with quantity if given)"""
+        if quantity is None:
+            rows = self._connection.execute('SELECT DISTINCT test FROM results '
+                                            'ORDER BY test')
+        else:
+            rows = self._connection.execute('SELECT DISTINCT test FROM results '
+                                            'WHERE quantity = ? ORDER BY test',
+                                            (quantity,))
+        return [row[0] for row in rows]
+
+    def remove(self, test, camera=None):
+        """Remove every result of a test (and camera)"""
+        with self._connection:
+            if camera is None:
+                self._connection.execute('DELETE FROM results WHERE test = ?',
+                                         (test,))
+            else:
+                self._connection.execute('DELETE FROM results WHERE test = ? '
+                                         'AND camera = ?', (test, camera))
+
+def _method_key(method):
+    """NULL never matches in a UNIQUE constraint, so store '' instead"""
+    if method is None:
+        return ''
+    return method
+
+def _parameters_key(parameters):
+    if parameters is None:
+        parameters = {}
+    return json.dumps(parameters, sort_keys=True)
+
+def _array_to_bytes(value):
+    stream = BytesIO()
+    np.save(stream, np.asarray(value, dtype='float64'))
+    return stream.getvalue()
+
+def _bytes_to_array(data):
+    return np.load(BytesIO(bytes(data)))
+
+_CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    test TEXT,
+    camera TEXT,
+    quantity TEXT NOT NULL,
+    method TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    units TEXT,
+    value REAL,
+    array BLOB,
+    source TEXT,
+    recorded TEXT,
+    UNIQUE (test, camera, quantity, method, parameters)
+);
+CREATE INDEX IF NOT EXISTS results_quantity
+    ON results (quantity, method, test, camera);
+"""
+
+_INSERT_RESULT = """
+INSERT OR REPLACE INTO results
+    (test, camera, quantity, method, parameters, units, value, array, source,
+     recorded)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
@@ -8,8 +8,10 @@ from collections import Iterable
 import numpy as np
 from .fiber_image import FiberImage
 from .containers import ScramblingInfo
+from .shared_arrays import map_image_objects
 
-def scrambling_gain(in_objs, out_objs, input_method=None, output_method=None, **kwargs):
+def scrambling_gain(in_objs, out_objs, input_method=None, output_method=None,
+                    processes=1, **kwargs):
     """Calculates the scrambling gain for fiber input and output images
 
     Args
@@ -22,6 +24,10 @@ def scrambling_gain(in_objs, out_objs, input_method=None, output_method=None, **
         method used to find the diameter of the input fiber face
     output_method : str {'edge','radius','gaussian'}, optional
         method used to find the diameter of the output fiber image
+    processes : int, optional
+        number of worker processes. With more than 1, the calibration
+        images are read once and shared with the workers (see
+        shared_arrays.map_image_objects())
 
     Returns
     -------
@@ -39,39 +45,25 @@ def scrambling_gain(in_objs, out_objs, input_method=None, output_method=None, **
 
     info = ScramblingInfo()
 
-    for in_obj in in_objs:
-        if isinstance(in_obj, basestring):
-            in_obj = FiberImage(in_obj)
-        in_centroid = in_obj.get_fiber_centroid(radius_factor=1.05,
-                                                method='gaussian',
-                                                units='microns',
-                                                **kwargs)
-        in_center = in_obj.get_fiber_center(method=input_method,
-                                            units='microns',
-                                            **kwargs)
-        in_diameter = in_obj.get_fiber_diameter(method=input_method,
-                                                units='microns',
-                                                **kwargs)
-        in_obj.save()
-        info.in_x.append((in_centroid[1] - in_center[1]) / in_diameter)
-        info.in_y.append((in_centroid[0] - in_center[0]) / in_diameter)
+    in_args = (1.05, 'gaussian', input_method, kwargs)
+    out_args = (1.0, output_method, output_method, kwargs)
+    if processes > 1:
+        in_offsets = map_image_objects(_centroid_offset, in_objs, in_args,
+                                       processes, 'all')
+        out_offsets = map_image_objects(_centroid_offset, out_objs, out_args,
+                                        processes, 'all')
+    else:
+        in_offsets = [_save_after(_centroid_offset, in_obj, in_args)
+                      for in_obj in in_objs]
+        out_offsets = [_save_after(_centroid_offset, out_obj, out_args)
+                       for out_obj in out_objs]
 
-    for out_obj in out_objs:
-        if isinstance(out_obj, basestring):
-            out_obj = FiberImage(out_obj)
-        out_centroid = out_obj.get_fiber_centroid(radius_factor=1.0,
-                                                  method=output_method,
-                                                  units='microns',
-                                                  **kwargs)
-        out_center = out_obj.get_fiber_center(method=output_method,
-                                              units='microns',
-                                              **kwargs)
-        out_diameter = out_obj.get_fiber_diameter(method=output_method,
-                                                  units='microns',
-                                                  **kwargs)
-        out_obj.save()
-        info.out_x.append((out_centroid[1] - out_center[1]) / out_diameter)
-        info.out_y.append((out_centroid[0] - out_center[0]) / out_diameter)
+    for in_x, in_y in in_offsets:
+        info.in_x.append(in_x)
+        info.in_y.append(in_y)
+    for out_x, out_y in out_offsets:
+        info.out_x.append(out_x)
+        info.out_y.append(out_y)
 
     list_len = len(info.in_x)
     for i in xrange(list_len):
@@ -87,3 +79,24 @@ def scrambling_gain(in_objs, out_objs, input_method=None, output_method=None, **
     #     scrambling_gain.append(d_in / d_out)
 
     return info
+
+def _centroid_offset(image_obj, radius_factor, centroid_method, method, kwargs):
+    """Returns the (x, y) offset of the centroid from the center in
+    fractions of the fiber diameter"""
+    centroid = image_obj.get_fiber_centroid(radius_factor=radius_factor,
+                                            method=centroid_method,
+                                            units='microns',
+                                            **kwargs)
+    center = image_obj.get_fiber_center(method=method, units='microns',
+                                        **kwargs)
+    diameter = image_obj.get_fiber_diameter(method=method, units='microns',
+                                            **kwargs)
+    return ((centroid.x - center.x) / diameter,
+            (centroid.y - center.y) / diameter)
+
+def _save_after(func, image_obj, args):
+    if isinstance(image_obj, basestring):
+        image_obj = FiberImage(image_obj)
+    result = func(image_obj, *args)
+    image_obj.save()
+    return result
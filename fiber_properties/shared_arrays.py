@@ -0,0 +1,397 @@
+"""shared_arrays.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+This module contains the shared memory transport of images between worker
+processes. Master calibration frames and corrected images are published
+once as .npy files in shared memory (/dev/shm, or the temporary folder if
+it does not exist). Their SharedArray descriptors hold the file, shape,
+dtype, and header information and pickle cheaply, and workers attach them
+as read-only memory maps without copying. A registry removes its arrays
+when it is closed, when its process exits, or (if the process was killed)
+when the next registry is created
+"""
+from collections import Iterable
+from copy import copy
+from multiprocessing import Pool
+import atexit
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from .input_output import load_object
+
+SHARED_MEMORY_DIR = '/dev/shm'
+
+# BaseImage attributes kept with published calibration frames
+_HEADER_ATTRIBUTES = ['pixel_size', 'camera', 'height',
+                      'width', 'subframe_x', 'subframe_y', 'exp_time',
+                      'bit_depth', 'date_time', 'temp', 'num_images',
+                      'folder', 'test']
+
+#=============================================================================#
+#===== Shared Arrays =========================================================#
+#=============================================================================#
+
+class SharedArray(object):
+    """Descriptor of an array published in shared memory
+
+    Args
+    ----
+    file_name : str
+        .npy file holding the array
+    shape : tuple(int)
+    dtype : str
+    info : dict, optional
+        image header attributes (e.g. exp_time) of a calibration frame
+
+    Attributes
+    ----------
+    file_name, shape, dtype, info
+    """
+    def __init__(self, file_name, shape, dtype, info=None):
+        self.file_name = file_name
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.info = info if info is not None else {}
+
+    def __repr__(self):
+        return 'SharedArray(%s, %s, %s)' % (self.file_name, self.shape,
+                                            self.dtype)
+
+    def attach(self):
+        """Return the array as a read-only memory map (no copy is made)
+
+        Raises
+        ------
+        RuntimeError
+            if the array has been removed
+        """
+        try:
+            array = np.load(self.file_name, mmap_mode='r')
+        except IOError:
+            raise RuntimeError('Shared array ' + self.file_name
+                               + ' no longer exists')
+        if array.shape != self.shape or array.dtype.str != self.dtype:
+            raise RuntimeError('Shared array ' + self.file_name
+                               + ' does not match its descriptor')
+        # A plain ndarray view so that results of arithmetic are not memmaps
+        return array.view(np.ndarray)
+
+    def exists(self):
+        return os.path.exists(self.file_name)
+
+def publish_array(array, directory, name, info=None):
+    """Writes array to shared memory and returns its SharedArray
+
+    The file is written under a temporary name and renamed, so a worker
+    never attaches a partially written array
+
+    Args
+    ----
+    array : numpy.ndarray
+    directory : str
+        folder of a SharedArrayRegistry
+    name : str
+        name of the array (unique within the directory)
+    info : dict, optional
+        See SharedArray
+    """
+    array = np.ascontiguousarray(array)
+    file_name = os.path.join(directory, name + '.npy')
+    temp_file = file_name + '.tmp'
+    output = np.lib.format.open_memmap(temp_file, mode='w+', dtype=array.dtype,
+                                       shape=array.shape)
+    output[...] = array
+    output.flush()
+    del output
+    os.rename(temp_file, file_name)
+    return SharedArray(file_name, array.shape, array.dtype.str, info)
+
+def find_shared_array(directory, name):
+    """Return the SharedArray published under name, or None"""
+    file_name = os.path.join(directory, name + '.npy')
+    if not os.path.exists(file_name):
+        return None
+    array = np.load(file_name, mmap_mode='r')
+    return SharedArray(file_name, array.shape, array.dtype.str)
+
+#=============================================================================#
+#===== Registry ==============================================================#
+#=============================================================================#
+
+class SharedArrayRegistry(object):
+    """Set of arrays published in shared memory by this process
+
+    Use as a context manager (or call close()) to remove the arrays.
+    Arrays of registries that were never closed are removed when the
+    process exits
+
+    Args
+    ----
+    directory : str, optional
+        folder in which the registry folder is made. Uses
+        SHARED_MEMORY_DIR if it exists, otherwise the temporary folder
+
+    Attributes
+    ----------
+    directory : str
+        folder holding the arrays, which workers may also publish to
+    """
+    def __init__(self, directory=None):
+        if directory is None and os.path.isdir(SHARED_MEMORY_DIR):
+            directory = SHARED_MEMORY_DIR
+        remove_stale_registries(directory)
+        self.directory = tempfile.mkdtemp(prefix='%s%d_' % (_PREFIX,
+                                                            os.getpid()),
+                                          dir=directory)
+        self._owner = os.getpid()
+        self._arrays = {}
+        _OPEN_REGISTRIES.add(self.directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Remove every array (only in the process that made the registry)"""
+        if os.getpid() != self._owner:
+            return
+        shutil.rmtree(self.directory, ignore_errors=True)
+        _OPEN_REGISTRIES.discard(self.directory)
+        self._arrays.clear()
+
+    def publish(self, array, name=None, info=None):
+        """Publish an array and return its SharedArray
+
+        Args
+        ----
+        array : numpy.ndarray
+        name : str, optional
+            If None, a new name is chosen
+        info : dict, optional
+            See SharedArray
+        """
+        if name is None:
+            name = 'array_%d' % len(self._arrays)
+        shared = publish_array(array, self.directory, name, info)
+        self._arrays[name] = shared
+        return shared
+
+    def get(self, name):
+        """Return the SharedArray published under name, or None"""
+        return self._arrays.get(name)
+
+    def publish_image_input(self, image_input):
+        """Publish the image of a BaseImage input (e.g. a list of darks)
+
+        The files are read and co-added once. Publishing the same input
+        again returns the same SharedArray
+
+        Args
+        ----
+        image_input : str, list(str), array_like, SharedArray, or None
+            See BaseImage.convert_image_to_array()
+
+        Returns
+        -------
+        shared : SharedArray or None
+        """
+        if image_input is None or isinstance(image_input, SharedArray):
+            return image_input
+        key = _input_key(image_input)
+        name = None
+        if key is not None:
+            name = 'input_' + hashlib.sha1(key).hexdigest()
+            if name in self._arrays:
+                return self._arrays[name]
+
+        from .base_image import BaseImage # base_image imports this module
+        image_obj = BaseImage(None)
+        image = image_obj.convert_image_to_array(image_input,
+                                                 set_attributes=True)
+        info = dict((attribute, getattr(image_obj, attribute))
+                    for attribute in _HEADER_ATTRIBUTES
+                    if getattr(image_obj, attribute, None) is not None)
+        return self.publish(image, name, info)
+
+    def share_image_object(self, image_obj, publish_image=False):
+        """Return a copy of an image object that reads shared images
+
+        The dark, ambient, and flat inputs of the copy are published master
+        frames. The corrected image is also published if it has already
+        been calculated (or if publish_image). Call
+        restore_image_object() on the copy in the worker before saving it
+
+        Args
+        ----
+        image_obj : CalibratedImage
+        publish_image : bool, optional
+            whether to correct the image here if it was not calculated yet
+
+        Returns
+        -------
+        shared_obj : CalibratedImage
+        """
+        shared_obj = copy(image_obj)
+        # Objects with a saved corrected image never read their calibration
+        if (getattr(image_obj, 'image_file', None) is None
+                or getattr(image_obj, 'new_calibration', True)):
+            use_shared_inputs(shared_obj, **dict(
+                (attribute, self.publish_image_input(getattr(image_obj,
+                                                             attribute, None)))
+                for attribute in ['dark', 'ambient', 'flat']))
+
+        graph = getattr(image_obj, 'get_result_graph', None)
+        if publish_image or (graph is not None and graph().is_computed('image')):
+            if graph is not None:
+                image = image_obj._get_image()
+            else:
+                image = image_obj.get_image()
+            use_shared_image(shared_obj, self.publish(image))
+        return shared_obj
+
+def use_shared_inputs(image_obj, **inputs):
+    """Replaces image object inputs (e.g. dark=SharedArray) for a worker
+
+    The replaced inputs are restored by restore_image_object(), so that
+    descriptors of temporary shared arrays are never saved with the object
+    """
+    if not hasattr(image_obj, '_shared_inputs'):
+        image_obj._shared_inputs = {}
+    for attribute, value in inputs.items():
+        # Only the original value is kept if an input is replaced twice
+        image_obj._shared_inputs.setdefault(attribute,
+                                            getattr(image_obj, attribute, None))
+        setattr(image_obj, attribute, value)
+
+def use_shared_image(image_obj, shared):
+    """Makes an image object read its corrected image from a SharedArray"""
+    use_shared_inputs(image_obj, image_file=shared, new_calibration=False)
+
+def restore_image_object(image_obj):
+    """Restores the inputs replaced by share_image_object() or
+    use_shared_inputs() so the object can be saved
+
+    Results calculated from the shared images are kept
+    """
+    shared_inputs = getattr(image_obj, '_shared_inputs', None)
+    if shared_inputs is None:
+        return image_obj
+    for attribute, value in shared_inputs.items():
+        setattr(image_obj, attribute, value)
+    del image_obj._shared_inputs
+    return image_obj
+
+def remove_stale_registries(directory=None):
+    """Remove the registry folders of processes that no longer exist"""
+    if directory is None:
+        directory = tempfile.gettempdir()
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith(_PREFIX):
+            continue
+        try:
+            pid = int(name[len(_PREFIX):].split('_')[0])
+        except ValueError:
+            continue
+        if not _process_exists(pid):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno != errno.ESRCH
+    return True
+
+def _input_key(image_input):
+    """Returns a hashable key of a file input, or None for arrays"""
+    if isinstance(image_input, basestring):
+        return os.path.abspath(image_input)
+    if (isinstance(image_input, Iterable) and len(image_input)
+            and all(isinstance(item, basestring) for item in image_input)):
+        return json.dumps([os.path.abspath(item) for item in image_input])
+    return None
+
+@atexit.register
+def _close_registries():
+    for directory in list(_OPEN_REGISTRIES):
+        if directory.split(os.sep)[-1].startswith('%s%d_' % (_PREFIX,
+                                                             os.getpid())):
+            shutil.rmtree(directory, ignore_errors=True)
+    _OPEN_REGISTRIES.clear()
+
+_PREFIX = 'fiber_properties_'
+_OPEN_REGISTRIES = set()
+
+#=============================================================================#
+#===== Parallel Map ==========================================================#
+#=============================================================================#
+
+def map_image_objects(func, image_objs, args=(), processes=2, save=None):
+    """Calls func(image_obj, *args) for every image object on a process pool
+
+    The calibration frames of every object are read once and shared with
+    the workers (see SharedArrayRegistry.share_image_object()). FiberImage
+    objects passed in are updated with the results calculated by the
+    workers
+
+    Args
+    ----
+    func : function
+        module level function (so it can be pickled)
+    image_objs : list(FiberImage) or list(str)
+        objects or saved object file names
+    args : tuple, optional
+        other arguments of func
+    processes : int, optional
+    save : {None, 'object', 'all'}, optional
+        whether the workers call save_object() or save() after func
+
+    Returns
+    -------
+    results : list
+        return values of func
+    """
+    objects = [load_object(image_obj) for image_obj in image_objs]
+    with SharedArrayRegistry() as registry:
+        tasks = [(func, registry.share_image_object(image_obj), args, save)
+                 for image_obj in objects]
+        pool = Pool(processes, initializer=_init_worker)
+        try:
+            outputs = pool.map(_call_shared, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    results = []
+    for image_obj, (worker_obj, result) in zip(image_objs, outputs):
+        if not isinstance(image_obj, basestring):
+            vars(image_obj).update(vars(worker_obj))
+        results.append(result)
+    return results
+
+def _init_worker():
+    from .plotting import set_headless
+    try:
+        set_headless()
+    except RuntimeError:
+        pass
+
+def _call_shared(task):
+    func, image_obj, args, save = task
+    result = func(image_obj, *args)
+    restore_image_object(image_obj)
+    if save == 'object':
+        image_obj.save_object()
+    elif save == 'all':
+        image_obj.save()
+    return image_obj, result
@@ -0,0 +1,251 @@
+"""synthetic.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+This module contains functions that generate synthetic FCS images with a
+known fiber center and size. Near field (tophat) and far field (gaussian)
+profiles can be combined with circular, rectangular, or polygonal fiber
+faces, speckle, shot noise, dark current, read noise, hot pixels, and camera
+subframes. Every function is vectorized so that full size frames can be
+generated for benchmarks and accuracy tests
+"""
+import numpy as np
+from .numpy_array_handler import (gaussian_array, polygon_array,
+                                  rectangle_array, polygon_sides,
+                                  circumscribed_radius)
+from .input_output import create_directory
+
+#=============================================================================#
+#===== Synthetic Images ======================================================#
+#=============================================================================#
+
+def synthetic_image(shape=(1000, 1000), center=None, radius=None,
+                    profile='tophat', fiber_shape='circle', fiber_angle=0.0,
+                    aspect=1.0, amp=10000.0, speckle_contrast=0.0,
+                    speckle_size=10.0, shot_noise=False, dark_level=0.0,
+                    read_noise=0.0, hot_pixels=0, hot_value=65535.0,
+                    subframe=None, seed=None, sensor_seed=0):
+    """Creates a synthetic fiber image
+
+    Args
+    ----
+    shape : (int, int), optional
+        (height, width) of the full camera sensor
+    center : Pixel or (float, float), optional
+        (x, y) of the fiber face on the full sensor. If None, uses the
+        center of the sensor
+    radius : number (pixels), optional
+        radius of a circular face, inscribed radius of a polygonal face,
+        half the width of a rectangular face, or the 2-sigma radius of a
+        gaussian profile. If None, uses a quarter of the smaller sensor side
+    profile : {'tophat', 'gaussian'}, optional
+        'tophat' for an evenly illuminated (near field) face, 'gaussian'
+        for a far field image
+    fiber_shape : {'circle', 'rectangle', 'octagon', ...} or int, optional
+        shape of a tophat face. See numpy_array_handler.polygon_sides()
+    fiber_angle : number (degrees), optional
+        rotation of a rectangular or polygonal face
+    aspect : number, optional
+        height / width of a rectangular face
+    amp : number, optional
+        peak signal (counts) above the dark level
+    speckle_contrast : number, optional
+        STDEV / MEAN of the speckle multiplying the profile (0 for none,
+        1 for fully developed speckle)
+    speckle_size : number (pixels), optional
+        approximate diameter of a speckle grain
+    shot_noise : bool, optional
+        whether to draw the signal from a Poisson distribution
+    dark_level, read_noise, hot_pixels, hot_value, sensor_seed :
+        see synthetic_dark()
+    subframe : (int, int, int, int), optional
+        (x, y, width, height) of the returned region of the sensor. The
+        full sensor is returned if None
+    seed : int or numpy.random.RandomState, optional
+        seed of the speckle and noise
+
+    Returns
+    -------
+    image : 2D numpy.ndarray
+    """
+    random_state = _random_state(seed)
+    height, width = shape
+    if center is None:
+        center = ((width - 1) / 2.0, (height - 1) / 2.0)
+    elif hasattr(center, 'as_tuple'):
+        center = center.as_tuple()
+    x0, y0 = center
+    if radius is None:
+        radius = min(height, width) / 4.0
+    if subframe is None:
+        subframe = (0, 0, width, height)
+    left, top, sub_width, sub_height = subframe
+
+    mesh_grid = np.meshgrid(np.arange(left, left + sub_width, dtype='float64'),
+                            np.arange(top, top + sub_height, dtype='float64'))
+    image = amp * fiber_profile(mesh_grid, x0, y0, radius, profile,
+                                fiber_shape, fiber_angle, aspect)
+
+    if speckle_contrast:
+        image *= speckle_pattern((sub_height, sub_width), speckle_size,
+                                 speckle_contrast, random_state)
+    if shot_noise:
+        image = random_state.poisson(np.maximum(image, 0.0)).astype('float64')
+
+    image += synthetic_dark(shape, dark_level, read_noise, hot_pixels,
+                            hot_value, subframe, random_state, sensor_seed)
+    return image
+
+def synthetic_dark(shape=(1000, 1000), dark_level=0.0, read_noise=0.0,
+                   hot_pixels=0, hot_value=65535.0, subframe=None, seed=None,
+                   sensor_seed=0):
+    """Creates a synthetic dark image
+
+    Args
+    ----
+    shape : (int, int), optional
+        (height, width) of the full camera sensor
+    dark_level : number, optional
+        mean dark signal (counts)
+    read_noise : number, optional
+        STDEV of the gaussian noise added to every pixel (counts)
+    hot_pixels : int, optional
+        number of pixels on the full sensor set to hot_value
+    hot_value : number, optional
+        value of the hot pixels
+    subframe : (int, int, int, int), optional
+        (x, y, width, height) of the returned region of the sensor
+    seed : int or numpy.random.RandomState, optional
+        seed of the read noise
+    sensor_seed : int, optional
+        seed of the hot pixel locations. Images and darks made with the
+        same sensor_seed share their hot pixels, as with a real camera
+
+    Returns
+    -------
+    dark : 2D numpy.ndarray
+    """
+    random_state = _random_state(seed)
+    height, width = shape
+    if subframe is None:
+        subframe = (0, 0, width, height)
+    left, top, sub_width, sub_height = subframe
+
+    dark = np.full((sub_height, sub_width), float(dark_level))
+    if read_noise:
+        dark += read_noise * random_state.standard_normal(dark.shape)
+
+    if hot_pixels:
+        hot_index = np.random.RandomState(sensor_seed).choice(height * width,
+                                                              hot_pixels,
+                                                              replace=False)
+        hot_y, hot_x = np.unravel_index(hot_index, shape)
+        inside = ((hot_x >= left) & (hot_x < left + sub_width)
+                  & (hot_y >= top) & (hot_y < top + sub_height))
+        dark[hot_y[inside] - top, hot_x[inside] - left] = hot_value
+    return dark
+
+def fiber_profile(mesh_grid, x0, y0, radius, profile='tophat',
+                  fiber_shape='circle', fiber_angle=0.0, aspect=1.0):
+    """Creates a fiber face profile of amplitude 1.0
+
+    Pixels along the edge of a tophat face are weighted by their
+    approximate area inside the face. See synthetic_image() for the
+    arguments
+
+    Returns
+    -------
+    profile : 2D numpy.ndarray
+
+    Raises
+    ------
+    ValueError
+        if the profile or fiber shape is not recognized
+    """
+    if profile == 'gaussian':
+        return gaussian_array(mesh_grid, x0, y0, radius, 1.0,
+                              0.0).reshape(mesh_grid[0].shape)
+    if profile != 'tophat':
+        raise ValueError('Incorrect string for fiber profile')
+
+    if isinstance(fiber_shape, basestring) and 'rect' in fiber_shape:
+        return rectangle_array(mesh_grid, x0, y0, 2.0 * radius,
+                               2.0 * radius * aspect, fiber_angle)
+    sides = polygon_sides(fiber_shape)
+    if sides is not None:
+        return polygon_array(mesh_grid, x0, y0,
+                             circumscribed_radius(radius, fiber_shape),
+                             sides, fiber_angle)
+    distance = np.sqrt((mesh_grid[0] - x0)**2 + (mesh_grid[1] - y0)**2)
+    return np.clip(radius - distance + 0.5, 0.0, 1.0)
+
+def speckle_pattern(shape, speckle_size=10.0, contrast=1.0, seed=None):
+    """Creates a speckle intensity pattern with a mean of 1.0
+
+    The pattern is the intensity of a random complex field low-pass
+    filtered by a circular pupil, so the fully developed speckle follows
+    negative exponential statistics
+
+    Args
+    ----
+    shape : (int, int)
+    speckle_size : number (pixels), optional
+        approximate diameter of a speckle grain
+    contrast : number, optional
+        STDEV / MEAN of the returned pattern
+    seed : int or numpy.random.RandomState, optional
+
+    Returns
+    -------
+    speckle : 2D numpy.ndarray
+    """
+    random_state = _random_state(seed)
+    freq_y = np.fft.fftfreq(shape[0])[:, np.newaxis]
+    freq_x = np.fft.fftfreq(shape[1])[np.newaxis, :]
+    pupil = freq_x**2 + freq_y**2 <= (1.0 / speckle_size)**2
+
+    field = np.zeros(shape, dtype='complex128')
+    num_modes = pupil.sum()
+    field[pupil] = (random_state.standard_normal(num_modes)
+                    + 1j * random_state.standard_normal(num_modes))
+    intensity = np.abs(np.fft.ifft2(field))**2
+    intensity /= intensity.mean()
+    return 1.0 + contrast * (intensity - 1.0)
+
+def save_synthetic_image(image, file_name, subframe=None, exp_time=None,
+                         pixel_size=None, camera=None, test=None):
+    """Saves a synthetic image as FITS with the FCS camera header keywords
+
+    Args
+    ----
+    image : 2D numpy.ndarray
+    file_name : str
+        .fit file name
+    subframe : (int, int, int, int), optional
+        (x, y, width, height) used to make the image
+    exp_time : number (seconds), optional
+    pixel_size : number (microns), optional
+    camera : {'in', 'nf', 'ff'}, optional
+    test : str, optional
+        stored as the OBJECT keyword
+    """
+    from astropy.io import fits
+    header = fits.Header()
+    if subframe is not None:
+        header['XORGSUBF'] = subframe[0]
+        header['YORGSUBF'] = subframe[1]
+    if exp_time is not None:
+        header['EXPTIME'] = exp_time
+    if pixel_size is not None:
+        header['XPIXSZ'] = pixel_size
+    if camera is not None:
+        header['TELESCOP'] = camera
+    if test is not None:
+        header['OBJECT'] = test
+    create_directory(file_name)
+    fits.PrimaryHDU(np.asarray(image, dtype='float32'),
+                    header=header).writeto(file_name, overwrite=True)
+
+def _random_state(seed):
+    if isinstance(seed, np.random.RandomState):
+        return seed
+    return np.random.RandomState(seed)
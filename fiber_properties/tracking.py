@@ -0,0 +1,182 @@
+"""tracking.py was written by Ryan Petersburg for use with fiber
+characterization for the EXtreme PRecision Spectrograph
+
+This module contains functions that follow the fiber center through an
+ordered series of FCS images contained in FiberImage objects. Each frame's
+centering search is seeded by the previous frame's solution so that only a
+small window around the previous center needs to be searched
+"""
+from collections import Iterable
+from .fiber_image import FiberImage
+from .containers import TrackingInfo, Pixel
+
+def track_fiber(image_objs, method='radius', search_range=4.0,
+                max_range=64.0, tol=.03, objective_tol=.05,
+                units='pixels', fiber_shape='circle', **kwargs):
+    """Finds the fiber center, diameter, and centroid in a series of frames
+
+    The first frame is centered over the full max_range window. Every
+    following frame is seeded with the previous frame's center (and
+    diameter) and searched over a window of search_range pixels. If the
+    solution lands on the edge of the window or its objective is worse than
+    the previous frame's by more than objective_tol, the window is widened
+    by a factor of 4 (up to max_range) and the frame is centered again
+
+    Args
+    ----
+    image_objs : list(FiberImage) or list(str)
+        ordered list of FiberImage objects or saved object file names
+    method : {'radius', 'circle', 'gaussian'}, optional
+        centering method used for every frame
+    search_range : number (pixels), optional
+        width of the center and radius search windows for seeded frames
+    max_range : number (pixels), optional
+        widest search window used (and the window for the first frame)
+    tol : number (pixels), optional
+        center and radius tolerance passed to the centering method
+    objective_tol : float, optional
+        allowed fractional increase of the objective between frames before
+        the search window is widened
+    units : {'pixels', 'microns'}, optional
+        units of the returned centers, diameters, and centroids
+    fiber_shape : str, optional
+        fiber shape used when calculating the centroid. See
+        FiberImage.set_fiber_centroid()
+    **kwargs :
+        keyworded arguments passed to the centering method
+
+    Returns
+    -------
+    info : TrackingInfo
+        Object containing tracking information. See containers.py for
+        specifics
+
+    Raises
+    ------
+    RuntimeError
+        if the method does not support seeded searches
+    """
+    if method not in ['radius', 'circle', 'gaussian']:
+        raise RuntimeError('Tracking requires the radius, circle, or gaussian method')
+    if not isinstance(image_objs, Iterable) or isinstance(image_objs, basestring):
+        image_objs = [image_objs]
+
+    info = TrackingInfo()
+    seed = None
+
+    for obj in image_objs:
+        if isinstance(obj, basestring):
+            obj = FiberImage(obj)
+
+        if method == 'gaussian':
+            window, objective, seed = _track_gaussian(obj, seed, search_range,
+                                                      **kwargs)
+        else:
+            window, objective, seed = _track_array_sum(obj, method, seed,
+                                                       search_range, max_range,
+                                                       tol, objective_tol,
+                                                       **kwargs)
+
+        obj.set_fiber_centroid(method=method, fiber_shape=fiber_shape)
+        center = obj.get_fiber_center(method=method, units=units)
+        centroid = obj.get_fiber_centroid(method=method, units=units)
+
+        info.center_x.append(center.x)
+        info.center_y.append(center.y)
+        info.diameter.append(obj.get_fiber_diameter(method=method, units=units))
+        info.centroid_x.append(centroid.x)
+        info.centroid_y.append(centroid.y)
+        info.search_range.append(window)
+        info.objective.append(objective)
+
+    return info
+
+def _track_array_sum(obj, method, seed, search_range, max_range, tol,
+                     objective_tol, **kwargs):
+    """Centers a single frame with the radius or circle method
+
+    Returns
+    -------
+    window : float
+        search window of the accepted solution
+    objective : float
+        array sum of the accepted solution
+    seed : tuple
+        (center, radius, objective) used to seed the next frame
+    """
+    if seed is None:
+        window = max_range
+    else:
+        window = min(search_range, max_range)
+
+    while True:
+        if seed is None:
+            _set_array_sum_center(obj, method, None, None, window, tol,
+                                  **kwargs)
+        else:
+            _set_array_sum_center(obj, method, seed[0], seed[1], window, tol,
+                                  **kwargs)
+
+        center = obj.get_fiber_center(method=method)
+        radius = obj.get_fiber_radius(method=method)
+        objective = getattr(obj._array_sum, method)
+
+        if window >= max_range or seed is None:
+            break
+
+        # Solutions within 10% of the window edge may be clipped by it
+        limit = 0.9 * window / 2.0
+        shift = max(abs(center.x - seed[0].x), abs(center.y - seed[0].y))
+        if method == 'radius':
+            shift = max(shift, abs(radius - seed[1]))
+        if (shift < limit
+                and objective <= seed[2] + objective_tol * abs(seed[2])):
+            break
+
+        window = min(4 * window, max_range)
+
+    return window, objective, (Pixel(center.x, center.y), radius, objective)
+
+def _set_array_sum_center(obj, method, approx_center, approx_radius, window,
+                          tol, **kwargs):
+    """Runs the radius or circle method over the given search window"""
+    if method == 'radius':
+        obj.set_fiber_center(method='radius', radius_tol=tol,
+                             radius_range=window, approx_radius=approx_radius,
+                             center_tol=tol, center_range=window,
+                             approx_center=approx_center, **kwargs)
+    else:
+        obj.set_fiber_center(method='circle', radius=approx_radius,
+                             center_tol=tol, center_range=window,
+                             approx_center=approx_center, **kwargs)
+
+def _track_gaussian(obj, seed, search_range, **kwargs):
+    """Centers a single frame with the gaussian method
+
+    The fit is seeded with the previous frame's gaussian parameters. If the
+    center moves farther than the search range the frame is fit again from
+    the default (edge method) starting point
+
+    Returns
+    -------
+    window : float or None
+        search window of the accepted solution (None for an unseeded fit)
+    objective : None
+        the gaussian method has no array sum objective
+    seed : tuple
+        (x0, y0, radius, amplitude, offset) used to seed the next frame
+    """
+    window = None
+    if seed is not None:
+        obj.set_fiber_center(method='gaussian', initial_guess=seed, **kwargs)
+        center = obj.get_fiber_center(method='gaussian')
+        window = search_range
+        if max(abs(center.x - seed[0]), abs(center.y - seed[1])) > search_range / 2.0:
+            window = None
+    if window is None:
+        obj.set_fiber_center(method='gaussian', **kwargs)
+
+    center = obj.get_fiber_center(method='gaussian')
+    seed = (center.x, center.y, obj.get_fiber_radius(method='gaussian'),
+            obj._gaussian_amp, obj._gaussian_offset)
+    return window, None, seed
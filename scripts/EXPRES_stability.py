@@ -1,7 +1,8 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import os
-from fiber_properties import FiberImage, image_list, plot_stability, plot_stability_binned
+from fiber_properties import (FiberImage, image_list, plot_stability,
+                              plot_stability_binned, fiber_drift)
 from functools import partial
 from multiprocessing import Pool
 
@@ -23,6 +24,11 @@ FOLDER = '../data/EXPRES/bare_octagonal/stability/'
 # FOLDER = '../data/scrambling/2016-08-05 Prototype Core Extension 1/Shift_30/'
 NF_METHOD = 'radius'
 FF_METHOD = 'edge'
+FIBER_SHAPE = 'octagon'
+# 'center' differences each frame's centroid and center, 'registration'
+# measures the drift of each frame's image from the first frame with phase
+# correlation (without centering every frame)
+DRIFT_METHOD = 'center'
 BIN_SIZE = 10
 
 class StabilityInfo(object):
@@ -43,7 +49,7 @@ def save_objects(i, cam, method):
         obj.set_fiber_center(method=method, 
                              radius_tol=.03, radius_range=64,
                              center_tol=.03, center_range=64)
-        obj.set_fiber_centroid(method=method)
+        obj.set_fiber_centroid(method=method, fiber_shape=FIBER_SHAPE)
         obj.save_object(FOLDER + obj_file)
 
 if __name__ == "__main__":
@@ -57,6 +63,24 @@ if __name__ == "__main__":
         else:
             method = FF_METHOD
 
+        if DRIFT_METHOD == 'registration':
+            # The drift is measured from the images themselves, so only the
+            # first frame is centered and every frame is read once
+            im_files = [FOLDER + cam + '_' + str(i).zfill(3) + '.fit'
+                        for i in xrange(NUM_IMAGES)]
+            ref_obj = FiberImage(im_files[0], threshold=1000)
+            ref_obj.set_fiber_center(method=method,
+                                     radius_tol=.03, radius_range=64,
+                                     center_tol=.03, center_range=64)
+            drift = fiber_drift([ref_obj] + im_files[1:], method=method,
+                                units='microns', fiber_shape=FIBER_SHAPE)
+            data[cam].x_diff = drift.x_shift
+            data[cam].y_diff = drift.y_shift
+            data[cam].time = drift.time
+            diameter = ref_obj.get_fiber_diameter(method=method, units='microns')
+            data[cam].diameter = [diameter] * NUM_IMAGES
+            continue
+
         if NEW_DATA:
             if PARALLELIZE:
                 pool = Pool(processes=PROCESSES)
@@ -87,9 +111,15 @@ if __name__ == "__main__":
                 data['spot'].time.append(obj.date_time)
                 obj.save_object(FOLDER + obj_file)
 
-    if 'in' in CAMS:
+    # The spot is only located in 'center' mode
+    if 'in' in CAMS and DRIFT_METHOD == 'center':
         CAMS += ['spot']
 
+    if DRIFT_METHOD == 'registration':
+        QUANTITY = 'frame drift'
+    else:
+        QUANTITY = 'drift'
+
     for cam in CAMS:
         init_x_diff = np.copy(data[cam].x_diff[0])
         init_y_diff = np.copy(data[cam].y_diff[0])
@@ -99,7 +129,7 @@ if __name__ == "__main__":
             data[cam].y_diff[i] -= init_y_diff
             data[cam].time[i] -= init_time
             data[cam].time[i] = data[cam].time[i].total_seconds() / 60.0
-        plot_stability(data[cam], cam)
+        plot_stability(data[cam], cam, QUANTITY)
         plt.savefig(FOLDER + cam + '_stability.png')
-        plot_stability_binned(data[cam], cam, BIN_SIZE)
+        plot_stability_binned(data[cam], cam, BIN_SIZE, QUANTITY)
         plt.savefig(FOLDER + cam + '_stability_binned.png')
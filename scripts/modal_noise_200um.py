@@ -140,6 +140,11 @@ if __name__ == '__main__':
     print
     for cam in CAMERAS:
         methods = deepcopy(METHODS)
+        # The FFT spectra of all tests are found together in save_fft_plot,
+        # which saves them with the objects
+        fft = 'fft' in methods
+        if fft:
+            methods.remove('fft')
         if cam == 'nf' and 'gaussian' in METHODS:
             methods.remove('gaussian')
         elif cam == 'ff' and 'tophat' in METHODS:
@@ -173,8 +178,8 @@ if __name__ == '__main__':
 
             if NEW_DATA or new_baseline:
                 set_new_data(FOLDER, TESTS[base_i], cam, FIBER_METHOD, KERNEL)
-        if 'fft' in methods:
-            methods.remove('fft')
-            save_fft_plot(FOLDER, TESTS, cam, LABELS, TITLE)
+        if fft:
+            save_fft_plot(FOLDER, TESTS, cam, LABELS, TITLE, batch=True,
+                          fiber_method=FIBER_METHOD, new=NEW_DATA)
 
         save_modal_noise_data(FOLDER, TESTS, cam, methods, TITLE)
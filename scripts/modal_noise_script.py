@@ -1,4 +1,4 @@
-from fiber_properties import (image_list, baseline_image,
+from fiber_properties import (image_list, baseline_image, modal_noise_fft_batch,
                               FiberImage, plot_fft, save_plot)
 import csv
 
@@ -33,23 +33,36 @@ def set_new_data(folder, test, cam, methods, fiber_method='edge', kernel=None):
     im_obj.save_object(object_file(folder, test, cam))
     print
 
-def save_baseline_object(folder, test, cam, best_test, fiber_method='edge', kernel=None):
+def save_baseline_object(folder, test, cam, best_test, fiber_method='edge',
+                         kernel=None, seed=0):
     print 'saving new baseline object'
     im_obj = FiberImage(object_file(folder, best_test, cam))
     baseline = baseline_image(im_obj, stdev=im_obj.get_dark_image().std(),
-                              fiber_method=fiber_method, kernel_size=kernel)
+                              fiber_method=fiber_method, kernel_size=kernel,
+                              seed=seed)
 
     baseline_obj = FiberImage(baseline, camera=cam,
                               pixel_size=im_obj.pixel_size)
     baseline_obj.save_image(image_file(folder, test, cam))
     baseline_obj.save_object(object_file(folder, test, cam))
 
-def save_fft_plot(folder, tests, cam, labels, title):
+def save_fft_plot(folder, tests, cam, labels, title, batch=False,
+                  fiber_method='edge', threads=1, new=False):
     print 'saving fft plot'
-    fft_info_list = []
-    for test in tests:
-        im_obj = FiberImage(object_file(folder, test, cam))
-        fft_info_list.append(im_obj.get_modal_noise(method='fft'))
+    if batch:
+        # Spectra saved with the objects are reused unless new
+        object_files = [object_file(folder, test, cam) for test in tests]
+        radius_factor = [0.3 if 'rectang' in test else None for test in tests]
+        fft_info_list = modal_noise_fft_batch(object_files, radius_factor=radius_factor,
+                                              fiber_method=fiber_method,
+                                              threads=threads, new=new,
+                                              save_objs=True)
+        im_obj = FiberImage(object_files[-1])
+    else:
+        fft_info_list = []
+        for test in tests:
+            im_obj = FiberImage(object_file(folder, test, cam))
+            fft_info_list.append(im_obj.get_modal_noise(method='fft'))
     min_wavelength = im_obj.pixel_size / im_obj.magnification * 2.0
     max_wavelength = im_obj.get_fiber_radius(method='edge', units='microns')
     plot_fft(fft_info_list,